@@ -0,0 +1,136 @@
+"""
+ABI encoding and decoding without web3 contract objects.
+
+Multicall3 `aggregate3` hands back the raw return bytes of every subcall, so
+results can be decoded locally instead of repeating each call through a
+web3 contract object. Calldata is produced by FunctionEncoder, whose selector
+and argument types are resolved once from the ABI.
+"""
+
+from eth_abi import decode as abi_decode
+from eth_abi import encode as abi_encode
+from eth_utils import function_signature_to_4byte_selector
+from web3 import Web3
+
+from tracing import cpu_timed
+
+
+def _param_type(param):
+    """Canonical ABI type string for a function input/output entry"""
+    param_type = param["type"]
+    if param_type.startswith("tuple"):
+        inner = ",".join(_param_type(c) for c in param["components"])
+        return f"({inner}){param_type[len('tuple') :]}"
+    return param_type
+
+
+def _find_function(contract_abi, fn_name):
+    for entry in contract_abi:
+        if entry.get("type") == "function" and entry.get("name") == fn_name:
+            return entry
+    raise KeyError(f"Function {fn_name} not found in ABI")
+
+
+class FunctionEncoder:
+    """
+    Precompiled calldata encoder for one contract function.
+
+    Produces the same hex string as web3's
+    contract.functions.<fn>(*args)._encode_transaction_data().
+    """
+
+    def __init__(self, fn_name, input_types):
+        self.fn_name = fn_name
+        self.input_types = input_types
+        self.signature = f"{fn_name}({','.join(input_types)})"
+        self.selector = function_signature_to_4byte_selector(self.signature)
+        # Argument-less calls always encode to the bare selector
+        self._static = "0x" + self.selector.hex() if not input_types else None
+
+    @classmethod
+    def from_abi(cls, contract_abi, fn_name):
+        entry = _find_function(contract_abi, fn_name)
+        return cls(fn_name, [_param_type(i) for i in entry.get("inputs", [])])
+
+    @cpu_timed("abi_encode")
+    def encode(self, *args):
+        """Calldata as a 0x-prefixed hex string"""
+        if self._static:
+            return self._static
+        return "0x" + (self.selector + abi_encode(self.input_types, args)).hex()
+
+
+def output_types(contract_abi, fn_name):
+    """
+    Resolve the return types of a function from a contract ABI.
+
+    Args:
+        contract_abi: Parsed ABI (list of entries)
+        fn_name: Function name
+
+    Returns:
+        List of canonical type strings, e.g. ["(address,uint256)[]", "uint256", "bool"]
+    """
+    entry = _find_function(contract_abi, fn_name)
+    return [_param_type(o) for o in entry.get("outputs", [])]
+
+
+@cpu_timed("abi_decode")
+def decode_outputs(types, data):
+    """Decode raw return data into a tuple of Python values"""
+    return abi_decode(types, bytes(data))
+
+
+@cpu_timed("abi_decode")
+def decode_string(data):
+    """Decode ABI-encoded string from bytes"""
+    if len(data) < 64:
+        return ""
+    try:
+        # First 32 bytes is offset (typically 32), we skip it
+        length = int.from_bytes(data[32:64], "big")
+        return data[64 : 64 + length].decode("utf-8")
+    except (UnicodeDecodeError, IndexError):
+        return ""
+
+
+@cpu_timed("abi_decode")
+def decode_uint(data):
+    """Decode ABI-encoded uint256 from bytes"""
+    if len(data) < 32:
+        return 0
+    return int.from_bytes(data[:32], "big")
+
+
+@cpu_timed("abi_decode")
+def decode_address(data):
+    """Decode ABI-encoded address from bytes"""
+    (address,) = abi_decode(["address"], bytes(data))
+    return Web3.to_checksum_address(address)
+
+
+@cpu_timed("abi_decode")
+def decode_uint_array(data):
+    """Decode ABI-encoded uint256[] from bytes"""
+    (values,) = abi_decode(["uint256[]"], bytes(data))
+    return list(values)
+
+
+@cpu_timed("abi_decode")
+def decode_lock_details(types, data):
+    """
+    Decode getLockDetails return data.
+
+    Args:
+        types: Output types of getLockDetails (see output_types)
+        data: Raw return bytes
+
+    Returns:
+        Tuple (tokens_data, unlock_time, claimed) where tokens_data is a list
+        of (checksum_address, amount) tuples, matching web3's .call() output
+    """
+    tokens_data, unlock_time, claimed = abi_decode(types, bytes(data))
+    tokens_data = [
+        (Web3.to_checksum_address(token), amount) for token, amount in tokens_data
+    ]
+    return tokens_data, unlock_time, claimed
@@ -0,0 +1,177 @@
+"""
+Fingerprinted, precompressed static assets.
+
+build_assets() copies every file under static/ to an output directory under
+a content-hashed name (app.js -> app.3f2a9c1b7d4e.js) and writes gzip and
+brotli variants of text assets next to it. Templates link assets through
+asset_url(), so a changed file gets a new URL and every asset URL can be
+cached by browsers forever (Cache-Control: immutable). asset_response()
+serves the smallest variant the client accepts.
+
+Run as a script to build ahead of deployment; the app also builds at
+startup, skipping files that are already up to date.
+
+Usage:
+    python assets.py [--out cache/assets]
+"""
+
+import argparse
+import gzip
+import hashlib
+import mimetypes
+import os
+import sys
+
+from flask import abort, request, send_from_directory
+
+try:
+    import brotlicffi as brotli
+except ImportError:
+    brotli = None
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Types worth compressing; images are compressed already
+COMPRESSIBLE_EXTENSIONS = {".js", ".css", ".svg", ".json", ".html", ".txt", ".map"}
+
+
+def _compressors():
+    """(Content-Encoding, file suffix, compress function), preferred first"""
+    compressors = []
+    if brotli is not None:
+        compressors.append(
+            ("br", ".br", lambda data: brotli.compress(data, quality=11))
+        )
+    # mtime=0 keeps the output identical across builds
+    compressors.append(("gzip", ".gz", lambda data: gzip.compress(data, 9, mtime=0)))
+    return compressors
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class AssetManifest:
+    """Mapping of static file names to their fingerprinted variants"""
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self._by_name = {}
+        self._by_path = {}
+
+    def add(self, name, path, mimetype, encodings):
+        entry = {"path": path, "mimetype": mimetype, "encodings": encodings}
+        self._by_name[name] = entry
+        self._by_path[path] = entry
+
+    def url(self, name):
+        """Fingerprinted URL of a static file (its /static/ URL if unknown)"""
+        entry = self._by_name.get(name)
+        if entry is None:
+            return f"/static/{name}"
+        return f"/assets/{entry['path']}"
+
+    def lookup(self, path):
+        """Entry for a fingerprinted path, or None"""
+        return self._by_path.get(path)
+
+    def items(self):
+        return list(self._by_name.items())
+
+
+def build_assets(static_dir, out_dir):
+    """
+    Fingerprint and compress every file under static_dir.
+
+    Args:
+        static_dir: Source directory (the app's static folder)
+        out_dir: Directory for fingerprinted files and their variants
+
+    Returns:
+        AssetManifest of the build
+    """
+    manifest = AssetManifest(out_dir)
+    for root, _, filenames in os.walk(static_dir):
+        for filename in sorted(filenames):
+            source = os.path.join(root, filename)
+            name = os.path.relpath(source, static_dir).replace(os.sep, "/")
+            with open(source, "rb") as f:
+                data = f.read()
+
+            stem, extension = os.path.splitext(name)
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            path = f"{stem}.{digest}{extension}"
+            target = os.path.join(out_dir, path)
+            if not os.path.exists(target):
+                _write(target, data)
+
+            encodings = {}
+            if extension.lower() in COMPRESSIBLE_EXTENSIONS:
+                for encoding, suffix, compress in _compressors():
+                    # A variant is only ever written if it is smaller
+                    if not os.path.exists(target + suffix):
+                        compressed = compress(data)
+                        if len(compressed) >= len(data):
+                            continue
+                        _write(target + suffix, compressed)
+                    encodings[encoding] = path + suffix
+
+            mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            manifest.add(name, path, mimetype, encodings)
+    return manifest
+
+
+def asset_response(manifest, path):
+    """
+    Serve a fingerprinted asset in the best encoding the client accepts.
+
+    Args:
+        manifest: AssetManifest from build_assets
+        path: Fingerprinted path from the URL
+    """
+    entry = manifest.lookup(path)
+    if entry is None:
+        abort(404)
+
+    # Highest client quality wins; ties go to the smaller, preferred encoding
+    encoding = None
+    filename = entry["path"]
+    best_quality = 0
+    for candidate, variant in entry["encodings"].items():
+        quality = request.accept_encodings.quality(candidate)
+        if quality > best_quality:
+            best_quality, encoding, filename = quality, candidate, variant
+
+    response = send_from_directory(
+        os.path.abspath(manifest.out_dir), filename, mimetype=entry["mimetype"]
+    )
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    if entry["encodings"]:
+        response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--static", default="static", help="Source directory")
+    parser.add_argument("--out", default="cache/assets", help="Output directory")
+    args = parser.parse_args()
+
+    manifest = build_assets(args.static, args.out)
+    for name, entry in manifest.items():
+        sizes = [f"{os.path.getsize(os.path.join(args.out, entry['path']))} B"]
+        for encoding, variant in entry["encodings"].items():
+            size = os.path.getsize(os.path.join(args.out, variant))
+            sizes.append(f"{encoding} {size} B")
+        print(f"{name} -> {entry['path']} ({', '.join(sizes)})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
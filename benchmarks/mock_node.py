@@ -0,0 +1,234 @@
+"""
+Local stand-in JSON-RPC node for benchmarks.
+
+Emulates just enough of a chain for the API routes: eth_blockNumber,
+eth_chainId and eth_call against Multicall3 (aggregate3), HodlMonsterNFT
+(getOwnerLocks, getOwnerLocksDetails, getLockDetails, ownerOf, nextTokenId) and ERC20
+tokens (symbol, decimals, name, balanceOf, allowance). JSON-RPC batch arrays
+are supported. Every HTTP request can be delayed by a fixed latency, and the
+block number advances on a timer so the API's per-block caches turn over.
+
+Wallets are created up front with a given number of locks each, so one node
+serves several wallet sizes at once.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from eth_abi import decode, encode
+from eth_utils import function_signature_to_4byte_selector
+
+NFT_ADDRESS = "0x244f47999ceba2e81d63e220d57dcda6892bbb9c"
+MULTICALL3_ADDRESS = "0xca11bde05977b3631167028862be2a173976ca11"
+CHAIN_ID = 84532
+
+SELECTORS = {
+    function_signature_to_4byte_selector(signature): name
+    for name, signature in {
+        "aggregate3": "aggregate3((address,bool,bytes)[])",
+        "getOwnerLocks": "getOwnerLocks(address)",
+        "getOwnerLocksDetails": "getOwnerLocksDetails(address)",
+        "getLockDetails": "getLockDetails(uint256)",
+        "ownerOf": "ownerOf(uint256)",
+        "nextTokenId": "nextTokenId()",
+        "symbol": "symbol()",
+        "decimals": "decimals()",
+        "name": "name()",
+        "balanceOf": "balanceOf(address)",
+        "allowance": "allowance(address,address)",
+    }.items()
+}
+
+
+class Revert(Exception):
+    """eth_call reverted"""
+
+
+def wallet_address(lock_count):
+    """Deterministic address of the benchmark wallet holding lock_count locks"""
+    return f"0x{0xB0000000 + lock_count:040x}"
+
+
+def token_address(index):
+    return f"0x{0xA0 + index:040x}"
+
+
+class MockChain:
+    """In-memory lock contract, tokens and block clock"""
+
+    def __init__(
+        self, wallet_sizes, tokens_per_lock=3, token_count=20, block_interval=1.0
+    ):
+        self.tokens = [token_address(i) for i in range(token_count)]
+        self.block_interval = block_interval
+        self.started = time.time()
+        self.locks = {}
+        self.owner_locks = {}
+
+        next_id = 1
+        for size in wallet_sizes:
+            owner = wallet_address(size)
+            ids = []
+            for _ in range(size):
+                self.locks[next_id] = {
+                    "owner": owner,
+                    "tokens": [
+                        (self.tokens[(next_id + j) % token_count], 10**18 * (j + 1))
+                        for j in range(tokens_per_lock)
+                    ],
+                    "unlock": 1_700_000_000 + next_id * 3600,
+                }
+                ids.append(next_id)
+                next_id += 1
+            self.owner_locks[owner] = ids
+
+    @property
+    def block_number(self):
+        if not self.block_interval:
+            return 100
+        return 100 + int((time.time() - self.started) / self.block_interval)
+
+    def call(self, to, data):
+        """Execute one eth_call, returning raw return data or raising Revert"""
+        to = to.lower()
+        name = SELECTORS.get(bytes(data[:4]))
+        args = bytes(data[4:])
+
+        if to == MULTICALL3_ADDRESS and name == "aggregate3":
+            (calls,) = decode(["(address,bool,bytes)[]"], args)
+            results = []
+            for target, allow_failure, call_data in calls:
+                try:
+                    results.append((True, self.call(target, call_data)))
+                except Revert:
+                    if not allow_failure:
+                        raise
+                    results.append((False, b""))
+            return encode(["(bool,bytes)[]"], [results])
+
+        if to == NFT_ADDRESS:
+            if name in ("getOwnerLocks", "getOwnerLocksDetails"):
+                (owner,) = decode(["address"], args)
+                ids = self.owner_locks.get(owner.lower(), [])
+                if name == "getOwnerLocks":
+                    return encode(["uint256[]"], [ids])
+                return encode(
+                    ["uint256[]", "uint256[]", "uint256[]"],
+                    [
+                        ids,
+                        [self.locks[i]["unlock"] for i in ids],
+                        [len(self.locks[i]["tokens"]) for i in ids],
+                    ],
+                )
+            if name == "getLockDetails":
+                (token_id,) = decode(["uint256"], args)
+                lock = self.locks.get(token_id, {"tokens": [], "unlock": 0})
+                return encode(
+                    ["(address,uint256)[]", "uint256", "bool"],
+                    [lock["tokens"], lock["unlock"], lock.get("claimed", False)],
+                )
+            if name == "ownerOf":
+                (token_id,) = decode(["uint256"], args)
+                # Claiming burns the lock NFT
+                if token_id not in self.locks or self.locks[token_id].get("claimed"):
+                    raise Revert("ERC721NonexistentToken")
+                return encode(["address"], [self.locks[token_id]["owner"]])
+            if name == "nextTokenId":
+                return encode(["uint256"], [max(self.locks, default=0) + 1])
+
+        if to in self.tokens:
+            index = self.tokens.index(to)
+            if name == "symbol":
+                return encode(["string"], [f"TK{index}"])
+            if name == "name":
+                return encode(["string"], [f"Token {index}"])
+            if name == "decimals":
+                return encode(["uint8"], [18])
+            if name == "balanceOf":
+                return encode(["uint256"], [10**21])
+            if name == "allowance":
+                return encode(["uint256"], [10**18])
+
+        raise Revert("execution reverted")
+
+
+class MockNode:
+    """Threaded HTTP JSON-RPC server in front of a MockChain"""
+
+    def __init__(self, chain, port=0, latency=0.0):
+        self.chain = chain
+        self.latency = latency
+        self.http_requests = 0
+        self.rpc_messages = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def counters(self):
+        with self._lock:
+            return self.http_requests, self.rpc_messages
+
+    def handle(self, message):
+        method = message.get("method")
+        params = message.get("params", [])
+        reply = {"jsonrpc": "2.0", "id": message.get("id")}
+        try:
+            if method == "eth_blockNumber":
+                reply["result"] = hex(self.chain.block_number)
+            elif method == "eth_chainId":
+                reply["result"] = hex(CHAIN_ID)
+            elif method == "eth_call":
+                call = params[0]
+                data = bytes.fromhex(call["data"][2:])
+                reply["result"] = "0x" + self.chain.call(call["to"], data).hex()
+            else:
+                reply["error"] = {
+                    "code": -32601,
+                    "message": f"Method {method} not found",
+                }
+        except Revert as e:
+            reply["error"] = {"code": 3, "message": f"execution reverted: {e}"}
+        return reply
+
+    def _handler(self):
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with node._lock:
+                    node.http_requests += 1
+                    node.rpc_messages += len(body) if isinstance(body, list) else 1
+                if node.latency:
+                    time.sleep(node.latency)
+
+                if isinstance(body, list):
+                    reply = [node.handle(message) for message in body]
+                else:
+                    reply = node.handle(body)
+
+                raw = json.dumps(reply).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        return Handler
@@ -0,0 +1,339 @@
+"""
+End-to-end load benchmark for the Flask API.
+
+Starts a mock JSON-RPC node (benchmarks/mock_node.py) and the app on a local
+HTTP server, then drives the lock, token and encode routes at several wallet
+sizes and concurrency levels. For every scenario it reports requests per
+second, p50/p99 latency and upstream RPC round trips per request.
+
+The per-block response cache is disabled by default so every request does
+its real RPC work (pass --response-cache to measure cache hits instead).
+Results are compared against benchmarks/baseline.json; any regression beyond
+the tolerances makes the run exit with status 1.
+
+Usage:
+    python benchmarks/run.py                  # run and compare to baseline
+    python benchmarks/run.py --save-baseline  # record a new baseline
+    python benchmarks/run.py --quick          # smaller run for a smoke check
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import aiohttp
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_node import (  # noqa: E402
+    MULTICALL3_ADDRESS,
+    NFT_ADDRESS,
+    CHAIN_ID,
+    MockChain,
+    MockNode,
+    token_address,
+    wallet_address,
+)
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def write_config(rpc_url, block_interval, cache_dir, response_cache):
+    """Config with a single chain pointing at the mock node"""
+    bench_config = {
+        "default": "bench",
+        "chains": {
+            "bench": {
+                "route": "bench",
+                "chainId": CHAIN_ID,
+                "chainName": "Benchmark Chain",
+                "deployment": NFT_ADDRESS,
+                "multicall3": MULTICALL3_ADDRESS,
+                "rpc": rpc_url,
+                "blockTime": block_interval,
+            }
+        },
+        "tokenCache": {"path": os.path.join(cache_dir, "tokens.sqlite3")},
+        "responseCache": {"maxEntries": 2000 if response_cache else 0},
+    }
+    path = os.path.join(cache_dir, "config.json")
+    with open(path, "w") as f:
+        json.dump(bench_config, f)
+    return path
+
+
+def scenarios(wallet_sizes):
+    """(name, method, path, body) for every benchmarked request"""
+    beneficiary = wallet_address(wallet_sizes[0])
+    tokens = [token_address(i) for i in range(10)]
+    out = []
+    for size in wallet_sizes:
+        path = f"/api/bench/all-locks/{wallet_address(size)}"
+        out.append((f"all-locks/{size}", "GET", path, None))
+    out.append(("lock", "GET", "/api/bench/lock/1", None))
+    out.append(
+        (
+            "tokens-batch/10",
+            "POST",
+            "/api/bench/tokens-batch",
+            {"tokens": tokens, "user": beneficiary},
+        )
+    )
+    out.append(
+        (
+            "encode/approve",
+            "POST",
+            "/api/bench/encode/approve",
+            {"token": tokens[0], "amount": str(10**18)},
+        )
+    )
+    out.append(
+        (
+            "encode/lock",
+            "POST",
+            "/api/bench/encode/lock",
+            {
+                "tokenAddresses": tokens[:3],
+                "amounts": [str(10**18)] * 3,
+                "lockPeriod": 86400,
+                "beneficiary": beneficiary,
+            },
+        )
+    )
+    out.append(
+        (
+            "encode/lock-plan",
+            "POST",
+            "/api/bench/encode/lock-plan",
+            {
+                "tokenAddresses": tokens[:3],
+                "amounts": [str(10**18)] * 3,
+                "lockPeriod": 86400,
+                "beneficiary": beneficiary,
+                "owner": beneficiary,
+            },
+        )
+    )
+    return out
+
+
+async def drive(base_url, method, path, body, requests, concurrency):
+    """
+    Send requests with at most concurrency in flight.
+
+    Returns:
+        Tuple (latencies, errors, elapsed)
+    """
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession() as session:
+
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                url = base_url + path
+                async with session.request(method, url, json=body) as response:
+                    await response.read()
+                    if response.status >= 400:
+                        errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    return latencies, errors, elapsed
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(args):
+    wallet_sizes = [int(size) for size in args.wallet_sizes.split(",")]
+    concurrency_levels = [int(level) for level in args.concurrency.split(",")]
+
+    chain = MockChain(wallet_sizes, block_interval=args.block_interval)
+    node = MockNode(chain, latency=args.latency / 1000).start()
+
+    cache_dir = tempfile.mkdtemp(prefix="hodl-bench-")
+    os.environ["HODL_CONFIG"] = write_config(
+        node.url, args.block_interval, cache_dir, args.response_cache
+    )
+    os.chdir(ROOT)
+    import main
+
+    server = make_server(
+        "127.0.0.1", 0, main.app, threaded=True, request_handler=QuietRequestHandler
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    results = {}
+    print(
+        f"{'scenario':<22}{'conc':>5}{'req/s':>10}{'p50 ms':>9}"
+        f"{'p99 ms':>9}{'rpc/req':>9}{'errors':>8}"
+    )
+    for name, method, path, body in scenarios(wallet_sizes):
+        # Warm-up request so one-off work (chain build, metadata cache) is excluded
+        asyncio.run(drive(base_url, method, path, body, 1, 1))
+        for concurrency in concurrency_levels:
+            before, _ = node.counters()
+            latencies, errors, elapsed = asyncio.run(
+                drive(base_url, method, path, body, args.requests, concurrency)
+            )
+            after, _ = node.counters()
+
+            result = {
+                "rps": round(args.requests / elapsed, 1),
+                "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+                "rpc_per_request": round((after - before) / args.requests, 3),
+                "errors": errors,
+            }
+            results[f"{name}@c{concurrency}"] = result
+            print(
+                f"{name:<22}{concurrency:>5}{result['rps']:>10}{result['p50_ms']:>9}"
+                f"{result['p99_ms']:>9}{result['rpc_per_request']:>9}{errors:>8}"
+            )
+
+    server.shutdown()
+    node.stop()
+    return results
+
+
+def compare(
+    results, baseline, latency_tolerance, rpc_tolerance, latency_slack_ms
+):
+    """
+    Returns:
+        List of human-readable regressions against the baseline
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if result["errors"] > base.get("errors", 0):
+            regressions.append(
+                f"{key}: {result['errors']} errors (baseline {base['errors']})"
+            )
+        rpc_limit = base["rpc_per_request"] * (1 + rpc_tolerance) + 0.05
+        if result["rpc_per_request"] > rpc_limit:
+            regressions.append(
+                f"{key}: {result['rpc_per_request']} RPC calls/request "
+                f"(baseline {base['rpc_per_request']})"
+            )
+        # Absolute slack keeps sub-millisecond jitter on cheap routes from failing
+        p99_limit = base["p99_ms"] * (1 + latency_tolerance) + latency_slack_ms
+        if result["p99_ms"] > p99_limit:
+            regressions.append(
+                f"{key}: p99 {result['p99_ms']} ms (baseline {base['p99_ms']} ms)"
+            )
+        if result["rps"] < base["rps"] * (1 - latency_tolerance):
+            regressions.append(f"{key}: {result['rps']} req/s (baseline {base['rps']})")
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--wallet-sizes", default="1,20,200", help="Locks per benchmarked wallet"
+    )
+    parser.add_argument("--concurrency", default="1,16", help="Concurrency levels")
+    parser.add_argument(
+        "--requests", type=int, default=200, help="Requests per scenario"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=20, help="Mock node latency (ms)"
+    )
+    parser.add_argument(
+        "--block-interval", type=float, default=1.0, help="Seconds per mock block"
+    )
+    parser.add_argument(
+        "--response-cache", action="store_true", help="Keep the per-block cache on"
+    )
+    parser.add_argument(
+        "--baseline", default=DEFAULT_BASELINE, help="Baseline results file"
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Write results as the baseline"
+    )
+    parser.add_argument(
+        "--latency-tolerance",
+        type=float,
+        default=0.5,
+        help="Allowed relative p99/throughput drift",
+    )
+    parser.add_argument(
+        "--latency-slack-ms",
+        type=float,
+        default=5,
+        help="Absolute p99 slack (ms) on top of the relative tolerance",
+    )
+    parser.add_argument(
+        "--rpc-tolerance",
+        type=float,
+        default=0.1,
+        help="Allowed relative drift of RPC calls per request",
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="Small run (wallets 1,20; 50 requests)"
+    )
+    args = parser.parse_args()
+
+    if args.quick:
+        args.wallet_sizes = "1,20"
+        args.requests = 50
+
+    results = run(args)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found; run with --save-baseline to record one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compare(
+        results,
+        baseline,
+        args.latency_tolerance,
+        args.rpc_tolerance,
+        args.latency_slack_ms,
+    )
+    if regressions:
+        print("\nREGRESSIONS:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
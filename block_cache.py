@@ -0,0 +1,139 @@
+"""
+Chain head tracking and a block-keyed response cache.
+
+HeadTracker polls eth_blockNumber for one chain on the shared RPC loop.
+Requests pin every call to the tracked head block, so all reads in a
+response come from the same state, and responses can be cached by
+(chain, block, endpoint args) until the next block arrives. With a
+SharedCache (serve.py workers), the head and cached responses are shared
+across processes, so one worker's poll or response serves all of them.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import record_cache_lookups
+from rpc import get_rpc_loop
+
+
+class HeadTracker:
+    """Cheap eth_blockNumber poller for one chain (started on first use)"""
+
+    def __init__(self, rpc, poll_interval=12, shared=None):
+        self.rpc = rpc
+        self.poll_interval = poll_interval
+        self.shared = shared
+        self.block_number = None
+        self.updated_at = 0
+        self._listeners = []
+        self._task = None
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        """Call listener(block_number) whenever a new head is seen"""
+        self._listeners.append(listener)
+
+    def ensure_started(self):
+        with self._lock:
+            if self._task is None:
+                self._task = asyncio.run_coroutine_threadsafe(self._run(), get_rpc_loop())
+
+    def is_fresh(self):
+        """True if the head was confirmed within two poll intervals"""
+        return (
+            self.block_number is not None
+            and time.time() - self.updated_at <= 2 * self.poll_interval
+        )
+
+    async def current_block(self):
+        """Head block to pin a request to (polls the node only if stale)"""
+        self.ensure_started()
+        if self.is_fresh():
+            return self.block_number
+        return await self.refresh()
+
+    async def refresh(self):
+        if self.shared is not None:
+            # Another worker may have polled within this interval already
+            entry = self.shared.get(("head", self.rpc.name))
+            if entry and time.time() - entry[1] < self.poll_interval:
+                self._update(*entry)
+                return self.block_number
+
+        block_number = await self.rpc.block_number()
+        self._update(block_number)
+        if self.shared is not None:
+            self.shared.put(
+                ("head", self.rpc.name), (self.block_number, self.updated_at)
+            )
+        return self.block_number
+
+    def _update(self, block_number, updated_at=None):
+        self.updated_at = updated_at or time.time()
+        # Ignore load-balanced nodes that are a block or two behind
+        if self.block_number is not None and block_number <= self.block_number:
+            return
+        self.block_number = block_number
+        for listener in self._listeners:
+            listener(block_number)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Head poll failed for {self.rpc.url}: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+
+class BlockResponseCache:
+    """
+    Response payloads keyed by (chain, block, endpoint args).
+
+    Entries for older blocks are dropped as soon as a chain's head moves.
+    Local misses fall through to the optional SharedCache, whose entries for
+    old blocks are never read again and age out of its ring.
+    """
+
+    def __init__(self, max_entries=2000, shared=None):
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chain_key, block_number, key):
+        with self._lock:
+            entry = self._entries.get((chain_key, block_number, key))
+            if entry is not None:
+                self._entries.move_to_end((chain_key, block_number, key))
+        if entry is None and self.shared is not None:
+            entry = self.shared.get(("response", chain_key, block_number, key))
+            if entry is not None:
+                self._store(chain_key, block_number, key, entry)
+        record_cache_lookups("response", entry is not None, entry is None)
+        return entry
+
+    def put(self, chain_key, block_number, key, payload):
+        self._store(chain_key, block_number, key, payload)
+        if self.shared is not None:
+            self.shared.put(("response", chain_key, block_number, key), payload)
+
+    def _store(self, chain_key, block_number, key, payload):
+        with self._lock:
+            self._entries[(chain_key, block_number, key)] = payload
+            self._entries.move_to_end((chain_key, block_number, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_before(self, chain_key, block_number):
+        """Drop a chain's entries for blocks older than block_number"""
+        with self._lock:
+            stale = [
+                entry_key
+                for entry_key in self._entries
+                if entry_key[0] == chain_key and entry_key[1] < block_number
+            ]
+            for entry_key in stale:
+                del self._entries[entry_key]
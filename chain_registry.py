@@ -0,0 +1,144 @@
+"""
+Lazy registry of configured chains.
+
+Chains are indexed by key, route and chainId when the registry is created,
+which only reads config.json. The per-chain objects (web3 provider, contracts,
+RPC client, head tracker) are built on first use, so startup cost does not
+grow with the number of configured chains. An optional background warm-up
+builds every chain ahead of traffic and can health-check each RPC endpoint.
+"""
+
+import threading
+import time
+
+from rpc import run_sync
+
+
+class ChainRegistry:
+    """Chain configs indexed by key, route and chainId, built on first use"""
+
+    def __init__(self, chain_configs, builder):
+        """
+        Args:
+            chain_configs: Mapping of chain key -> chain config (config.json "chains")
+            builder: Callable(chain_key, chain_config) returning the chain data dict
+        """
+        self._configs = dict(chain_configs)
+        self._builder = builder
+        self._by_route = {}
+        self._by_chain_id = {}
+        for chain_key, chain_config in self._configs.items():
+            self._by_route[chain_config["route"]] = chain_key
+            self._by_chain_id[int(chain_config["chainId"])] = chain_key
+        self._built = {}
+        self._lock = threading.Lock()
+        self.health = {}
+
+    def keys(self):
+        return list(self._configs)
+
+    def config(self, chain_key):
+        return self._configs[chain_key]
+
+    def configs(self):
+        """(chain_key, chain_config) pairs, without building any chain"""
+        return list(self._configs.items())
+
+    def is_built(self, chain_key):
+        return chain_key in self._built
+
+    def get(self, chain_key):
+        """Chain data dict for a key, building it on first use"""
+        chain_data = self._built.get(chain_key)
+        if chain_data is not None:
+            return chain_data
+        with self._lock:
+            chain_data = self._built.get(chain_key)
+            if chain_data is None:
+                chain_data = self._builder(chain_key, self._configs[chain_key])
+                self._built[chain_key] = chain_data
+        return chain_data
+
+    def __getitem__(self, chain_key):
+        return self.get(chain_key)
+
+    def __contains__(self, chain_key):
+        return chain_key in self._configs
+
+    def key_for_route(self, route):
+        """Chain key for a route without building the chain (None if unknown)"""
+        return self._by_route.get(route)
+
+    def by_route(self, route):
+        """
+        Returns:
+            Tuple (chain_key, chain_data), or (None, None) for unknown routes
+        """
+        chain_key = self._by_route.get(route)
+        if chain_key is None:
+            return None, None
+        return chain_key, self.get(chain_key)
+
+    def by_chain_id(self, chain_id):
+        """
+        Returns:
+            Tuple (chain_key, chain_data), or (None, None) for unknown chain IDs
+        """
+        chain_key = self._by_chain_id.get(int(chain_id))
+        if chain_key is None:
+            return None, None
+        return chain_key, self.get(chain_key)
+
+    def items(self):
+        """(chain_key, chain_data) pairs, building every chain"""
+        return [(chain_key, self.get(chain_key)) for chain_key in self._configs]
+
+    def reset(self):
+        """
+        Drop all built chain objects.
+
+        Call in a freshly forked worker so it does not reuse the parent's
+        connections; chains are rebuilt lazily on the next request.
+        """
+        with self._lock:
+            self._built = {}
+            self.health = {}
+
+    def warm_up(self, health_check=False):
+        """Build every chain (and optionally check its RPC) in a daemon thread"""
+        thread = threading.Thread(
+            target=self._warm_up, args=(health_check,), name="chain-warm-up", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _warm_up(self, health_check):
+        for chain_key in self._configs:
+            try:
+                chain_data = self.get(chain_key)
+                if health_check:
+                    self.health[chain_key] = self.check_health(chain_key, chain_data)
+            except Exception as e:
+                print(f"Warm-up failed for chain {chain_key}: {e}")
+
+    def check_health(self, chain_key, chain_data):
+        """
+        Verify a chain's RPC answers with the configured chainId.
+
+        Returns:
+            Dict with 'healthy', 'latencyMs' and 'error'
+        """
+        started = time.time()
+        try:
+            chain_id = int(run_sync(chain_data["rpc"].request("eth_chainId", [])), 16)
+        except Exception as e:
+            print(f"Health check failed for chain {chain_key}: {e}")
+            return {"healthy": False, "latencyMs": None, "error": str(e)}
+
+        latency_ms = round((time.time() - started) * 1000, 1)
+        expected = int(self._configs[chain_key]["chainId"])
+        if chain_id != expected:
+            error = f"RPC reports chainId {chain_id}, expected {expected}"
+            print(f"Health check failed for chain {chain_key}: {error}")
+            return {"healthy": False, "latencyMs": latency_ms, "error": error}
+        return {"healthy": True, "latencyMs": latency_ms, "error": None}
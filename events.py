@@ -0,0 +1,189 @@
+"""
+Server-sent event hub per chain.
+
+ChainEvents hangs off the chain's HeadTracker. On every new head it sends
+one JSON-RPC batch upstream: eth_getLogs over the new blocks for the lock
+contract (only if a client watches an address) and eth_getTransactionReceipt
+for every transaction any client is waiting on. The results are fanned out
+to the subscribers' queues, so N clients watching a chain cost the same
+upstream calls as one.
+
+Events:
+    newHead: {"blockNumber"}
+    receipt: {"txHash", "status" ("success"/"reverted"), "blockNumber"}
+    locks: {"address", "blockNumber", "tokenIds"} when a watched address
+        locked, claimed, sent or received a lock NFT
+"""
+
+import asyncio
+import queue
+import threading
+
+from web3 import Web3
+
+from indexer import TOKENS_CLAIMED_TOPIC, TOKENS_LOCKED_TOPIC, TRANSFER_TOPIC
+from rpc import RpcError, get_rpc_loop
+
+LOCK_TOPICS = [
+    Web3.to_hex(topic)
+    for topic in (TOKENS_LOCKED_TOPIC, TOKENS_CLAIMED_TOPIC, TRANSFER_TOPIC)
+]
+
+# Events a slow client may fall behind by before new ones are dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Open streams per process, across all chains. Each stream holds a request
+# thread for as long as it is open, so this must stay well below the
+# server's thread count or streams starve the API.
+DEFAULT_MAX_SUBSCRIBERS = 8
+
+
+def _topic_address(topic):
+    return "0x" + topic[-40:].lower()
+
+
+def _log_addresses(log):
+    """(addresses involved, token ID) of a lock contract log"""
+    topics = log["topics"]
+    if topics[0] == LOCK_TOPICS[2]:
+        # Transfer(from, to, tokenId): mints and burns involve the zero address
+        return [_topic_address(topics[1]), _topic_address(topics[2])], int(topics[3], 16)
+    # TokensLocked(beneficiary, tokenId, ...) / TokensClaimed(claimer, tokenId, ...)
+    return [_topic_address(topics[1])], int(topics[2], 16)
+
+
+class Subscription:
+    """One connected client: what it watches and its pending events"""
+
+    def __init__(self, address=None, tx_hashes=()):
+        self.address = address.lower() if address else None
+        self.tx_hashes = {tx_hash.lower() for tx_hash in tx_hashes}
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def push(self, event, data):
+        try:
+            self.queue.put_nowait((event, data))
+        except queue.Full:
+            # Never block the shared poller on one slow client
+            pass
+
+
+class ChainEvents:
+    """New-head, receipt and lock-change events for one chain"""
+
+    def __init__(self, rpc, head, contract_address=None):
+        self.rpc = rpc
+        self.head = head
+        self.contract_address = contract_address
+        self.last_block = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._publish_lock = None
+        head.add_listener(self._on_head)
+
+    def subscribe(self, address=None, tx_hashes=()):
+        """Register a client and return its Subscription"""
+        subscription = Subscription(address, tx_hashes)
+        with self._lock:
+            self._subscribers.add(subscription)
+        self.head.ensure_started()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _on_head(self, block_number):
+        # HeadTracker listeners run on whichever loop refreshed the head
+        asyncio.run_coroutine_threadsafe(self._publish(block_number), get_rpc_loop())
+
+    async def _publish(self, block_number):
+        if self._publish_lock is None:
+            self._publish_lock = asyncio.Lock()
+
+        async with self._publish_lock:
+            with self._lock:
+                subscribers = list(self._subscribers)
+            if not subscribers:
+                # Nobody listening: start from the head when someone connects
+                self.last_block = None
+                return
+            if self.last_block is not None and block_number <= self.last_block:
+                return
+
+            for subscription in subscribers:
+                subscription.push("newHead", {"blockNumber": block_number})
+
+            try:
+                await self._publish_changes(subscribers, block_number)
+            except Exception as e:
+                # last_block stays put, so the next head retries this range
+                print(f"Event poll failed for {self.rpc.name}: {e}")
+                return
+            self.last_block = block_number
+
+    async def _publish_changes(self, subscribers, block_number):
+        watched = {s.address for s in subscribers if s.address}
+        tx_hashes = sorted({h for s in subscribers for h in s.tx_hashes})
+
+        calls = [("eth_getTransactionReceipt", [tx_hash]) for tx_hash in tx_hashes]
+        if watched and self.contract_address:
+            from_block = block_number if self.last_block is None else self.last_block + 1
+            calls.append(
+                (
+                    "eth_getLogs",
+                    [
+                        {
+                            "fromBlock": hex(from_block),
+                            "toBlock": hex(block_number),
+                            "address": self.contract_address,
+                            "topics": [LOCK_TOPICS],
+                        }
+                    ],
+                )
+            )
+        if not calls:
+            return
+
+        try:
+            results = await self.rpc.batch(calls)
+        except RpcError:
+            # Node without batch support
+            results = await asyncio.gather(
+                *(self.rpc.request(method, params) for method, params in calls),
+                return_exceptions=True,
+            )
+
+        for tx_hash, receipt in zip(tx_hashes, results):
+            if not receipt or isinstance(receipt, Exception):
+                continue
+            event = {
+                "txHash": tx_hash,
+                "status": "success" if receipt.get("status") == "0x1" else "reverted",
+                "blockNumber": int(receipt["blockNumber"], 16),
+            }
+            for subscription in subscribers:
+                if tx_hash in subscription.tx_hashes:
+                    subscription.tx_hashes.discard(tx_hash)
+                    subscription.push("receipt", event)
+
+        if len(results) > len(tx_hashes):
+            logs = results[-1]
+            if isinstance(logs, Exception):
+                raise logs
+            changed = {}
+            for log in logs:
+                addresses, token_id = _log_addresses(log)
+                for address in addresses:
+                    if address in watched:
+                        changed.setdefault(address, set()).add(token_id)
+            for subscription in subscribers:
+                if subscription.address in changed:
+                    subscription.push(
+                        "locks",
+                        {
+                            "address": Web3.to_checksum_address(subscription.address),
+                            "blockNumber": block_number,
+                            "tokenIds": sorted(changed[subscription.address]),
+                        },
+                    )
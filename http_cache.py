@@ -0,0 +1,80 @@
+"""
+Conditional HTTP caching for JSON responses.
+
+Payloads that only change on redeploy (OpenAPI spec, chain list, chain
+config) are serialized once and served with a strong ETag and Cache-Control,
+so browsers and CDNs can revalidate with If-None-Match and get a 304 instead
+of the full body. A MessagePack variant (with its own ETag) is built on first
+request from clients that prefer it.
+"""
+
+import hashlib
+
+from flask import Response, request
+
+from metrics import record_cache_lookups
+from serialization import (
+    MSGPACK_MIMETYPE,
+    dumps_bytes,
+    dumps_msgpack,
+    msgpack,
+    wants_msgpack,
+)
+
+
+def _etag(body):
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+def conditional_response(body, etag, cache_control, mimetype="application/json"):
+    """
+    Serve body with ETag/Cache-Control, or 304 if the client has it already.
+
+    Args:
+        body: Encoded response body
+        etag: Strong ETag (unquoted)
+        cache_control: Cache-Control header value
+        mimetype: Response content type
+    """
+    if request.if_none_match.contains(etag):
+        record_cache_lookups("etag", 1)
+        response = Response(status=304)
+    else:
+        record_cache_lookups("etag", 0, 1)
+        response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+class CachedJson:
+    """JSON payload serialized once and served with a strong ETag"""
+
+    def __init__(self, payload, cache_control):
+        self.payload = payload
+        self.body = dumps_bytes(payload)
+        self.etag = _etag(self.body)
+        self.cache_control = cache_control
+        self._msgpack = None
+
+    def response(self):
+        if wants_msgpack():
+            if self._msgpack is None:
+                body = dumps_msgpack(self.payload)
+                self._msgpack = (body, _etag(body)) if body is not None else ()
+            if self._msgpack:
+                response = conditional_response(
+                    *self._msgpack, self.cache_control, mimetype=MSGPACK_MIMETYPE
+                )
+                response.vary.add("Accept")
+                return response
+
+        response = conditional_response(self.body, self.etag, self.cache_control)
+        if msgpack is not None:
+            response.vary.add("Accept")
+        return response
+
+
+def json_response(payload, cache_control):
+    """One-off conditional JSON response (ETag computed from the payload)"""
+    return CachedJson(payload, cache_control).response()
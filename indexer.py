@@ -0,0 +1,534 @@
+"""
+Incremental TokensLocked / TokensClaimed / Transfer event indexer.
+
+One LockIndexer thread per chain pulls HodlMonsterNFT logs in block-range
+chunks and stores locks, owners and claims in a local SQLite database
+(LockIndex). The block cursor is persisted, so indexing resumes after a
+restart. Reorgs are detected by re-checking the hash of the cursor block; on
+a mismatch everything above (cursor - confirmations) is rewound and re-read.
+The indexer syncs on every new head, and the index only counts as fresh
+while its cursor is within max_lag_blocks of the chain head. Under serve.py
+one worker runs the indexers and the others read the same database.
+"""
+
+import os
+import sqlite3
+import threading
+
+from web3 import Web3
+
+from abi_codec import decode_lock_details, decode_uint, output_types
+
+TOKENS_LOCKED_TOPIC = Web3.keccak(text="TokensLocked(address,uint256,uint256,uint256)")
+TOKENS_CLAIMED_TOPIC = Web3.keccak(text="TokensClaimed(address,uint256,uint256)")
+TRANSFER_TOPIC = Web3.keccak(text="Transfer(address,address,uint256)")
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+# Lock details fetched per aggregate3 call while back-filling token amounts
+DETAILS_BATCH_SIZE = 200
+
+
+def _topic_address(topic):
+    return Web3.to_checksum_address(bytes(topic)[12:32])
+
+
+def _topic_uint(topic):
+    return int.from_bytes(bytes(topic), "big")
+
+
+class LockIndex:
+    """SQLite store for indexed locks, token amounts, transfers and claims"""
+
+    def __init__(self, db_path):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        # Workers keep reading while the indexer's worker writes
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS cursors (
+                chain_id INTEGER PRIMARY KEY,
+                block_number INTEGER NOT NULL,
+                block_hash TEXT
+            );
+            CREATE TABLE IF NOT EXISTS locks (
+                chain_id INTEGER NOT NULL,
+                token_id INTEGER NOT NULL,
+                beneficiary TEXT NOT NULL,
+                owner TEXT,
+                unlock_time INTEGER NOT NULL,
+                token_count INTEGER NOT NULL,
+                block_number INTEGER NOT NULL,
+                claimed INTEGER NOT NULL DEFAULT 0,
+                claimed_block INTEGER,
+                details_loaded INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (chain_id, token_id)
+            );
+            CREATE INDEX IF NOT EXISTS locks_owner ON locks (chain_id, owner, claimed);
+            CREATE TABLE IF NOT EXISTS lock_tokens (
+                chain_id INTEGER NOT NULL,
+                token_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                token TEXT NOT NULL,
+                amount TEXT NOT NULL,
+                PRIMARY KEY (chain_id, token_id, position)
+            );
+            CREATE TABLE IF NOT EXISTS transfers (
+                chain_id INTEGER NOT NULL,
+                token_id INTEGER NOT NULL,
+                from_address TEXT NOT NULL,
+                to_address TEXT NOT NULL,
+                block_number INTEGER NOT NULL,
+                log_index INTEGER NOT NULL,
+                PRIMARY KEY (chain_id, block_number, log_index)
+            );
+            CREATE INDEX IF NOT EXISTS transfers_token ON transfers (chain_id, token_id);
+            CREATE TABLE IF NOT EXISTS claims (
+                chain_id INTEGER NOT NULL,
+                token_id INTEGER NOT NULL,
+                claimer TEXT NOT NULL,
+                token_count INTEGER NOT NULL,
+                block_number INTEGER NOT NULL,
+                tx_hash TEXT,
+                PRIMARY KEY (chain_id, token_id)
+            );
+            """
+        )
+        self._db.commit()
+
+    # ----- cursor -----
+
+    def get_cursor(self, chain_id):
+        """Return (block_number, block_hash) of the last indexed block, or None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT block_number, block_hash FROM cursors WHERE chain_id = ?",
+                (chain_id,),
+            ).fetchone()
+        return row
+
+    def is_caught_up(self, chain_id, head_block, max_lag_blocks=0):
+        """
+        True if every block up to head_block (less max_lag_blocks) is indexed,
+        so the index has every lock a request pinned to head_block could see
+        """
+        cursor = self.get_cursor(chain_id)
+        return cursor is not None and cursor[0] >= head_block - max_lag_blocks
+
+    # ----- writes -----
+
+    def apply_logs(self, chain_id, logs, block_number, block_hash):
+        """
+        Apply decoded logs of one block range and advance the cursor.
+
+        Args:
+            chain_id: Chain ID
+            logs: Raw web3 logs, any order
+            block_number: Last block covered by the range
+            block_hash: Hash of that block
+        """
+        logs = sorted(logs, key=lambda log: (log["blockNumber"], log["logIndex"]))
+
+        with self._lock:
+            db = self._db
+            for log in logs:
+                topic0 = bytes(log["topics"][0])
+                data = bytes(log["data"])
+
+                if topic0 == TRANSFER_TOPIC:
+                    token_id = _topic_uint(log["topics"][3])
+                    new_owner = _topic_address(log["topics"][2])
+                    db.execute(
+                        """
+                        INSERT OR REPLACE INTO transfers
+                            (chain_id, token_id, from_address, to_address, block_number, log_index)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        """,
+                        (
+                            chain_id,
+                            token_id,
+                            _topic_address(log["topics"][1]),
+                            new_owner,
+                            log["blockNumber"],
+                            log["logIndex"],
+                        ),
+                    )
+                    db.execute(
+                        "UPDATE locks SET owner = ? WHERE chain_id = ? AND token_id = ?",
+                        (new_owner, chain_id, token_id),
+                    )
+
+                elif topic0 == TOKENS_LOCKED_TOPIC:
+                    beneficiary = _topic_address(log["topics"][1])
+                    token_id = _topic_uint(log["topics"][2])
+                    owner_row = db.execute(
+                        """
+                        SELECT to_address FROM transfers
+                        WHERE chain_id = ? AND token_id = ?
+                        ORDER BY block_number DESC, log_index DESC LIMIT 1
+                        """,
+                        (chain_id, token_id),
+                    ).fetchone()
+                    db.execute(
+                        """
+                        INSERT OR REPLACE INTO locks
+                            (chain_id, token_id, beneficiary, owner, unlock_time,
+                             token_count, block_number, claimed, details_loaded)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, 0, 0)
+                        """,
+                        (
+                            chain_id,
+                            token_id,
+                            beneficiary,
+                            owner_row[0] if owner_row else beneficiary,
+                            decode_uint(data[0:32]),
+                            decode_uint(data[32:64]),
+                            log["blockNumber"],
+                        ),
+                    )
+
+                elif topic0 == TOKENS_CLAIMED_TOPIC:
+                    token_id = _topic_uint(log["topics"][2])
+                    db.execute(
+                        """
+                        INSERT OR REPLACE INTO claims
+                            (chain_id, token_id, claimer, token_count, block_number, tx_hash)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        """,
+                        (
+                            chain_id,
+                            token_id,
+                            _topic_address(log["topics"][1]),
+                            decode_uint(data[0:32]),
+                            log["blockNumber"],
+                            Web3.to_hex(log["transactionHash"]),
+                        ),
+                    )
+                    db.execute(
+                        """
+                        UPDATE locks SET claimed = 1, claimed_block = ?
+                        WHERE chain_id = ? AND token_id = ?
+                        """,
+                        (log["blockNumber"], chain_id, token_id),
+                    )
+
+            db.execute(
+                "INSERT OR REPLACE INTO cursors (chain_id, block_number, block_hash) VALUES (?, ?, ?)",
+                (chain_id, block_number, block_hash),
+            )
+            db.commit()
+
+    def rewind(self, chain_id, block_number):
+        """Drop everything indexed above block_number and move the cursor back"""
+        with self._lock:
+            db = self._db
+            db.execute(
+                """
+                DELETE FROM lock_tokens WHERE chain_id = ? AND token_id IN (
+                    SELECT token_id FROM locks WHERE chain_id = ? AND block_number > ?
+                )
+                """,
+                (chain_id, chain_id, block_number),
+            )
+            db.execute(
+                "DELETE FROM locks WHERE chain_id = ? AND block_number > ?",
+                (chain_id, block_number),
+            )
+            db.execute(
+                "DELETE FROM claims WHERE chain_id = ? AND block_number > ?",
+                (chain_id, block_number),
+            )
+            db.execute(
+                """
+                UPDATE locks SET claimed = 0, claimed_block = NULL
+                WHERE chain_id = ? AND claimed_block > ?
+                """,
+                (chain_id, block_number),
+            )
+            db.execute(
+                "DELETE FROM transfers WHERE chain_id = ? AND block_number > ?",
+                (chain_id, block_number),
+            )
+            # Owners are derived from the surviving transfer history
+            db.execute(
+                """
+                UPDATE locks SET owner = COALESCE(
+                    (
+                        SELECT to_address FROM transfers
+                        WHERE transfers.chain_id = locks.chain_id
+                          AND transfers.token_id = locks.token_id
+                        ORDER BY block_number DESC, log_index DESC LIMIT 1
+                    ),
+                    beneficiary
+                )
+                WHERE chain_id = ?
+                """,
+                (chain_id,),
+            )
+            db.execute(
+                "INSERT OR REPLACE INTO cursors (chain_id, block_number, block_hash) VALUES (?, ?, NULL)",
+                (chain_id, block_number),
+            )
+            db.commit()
+
+    def pending_details(self, chain_id, limit):
+        """Token IDs of indexed locks whose token amounts are not loaded yet"""
+        with self._lock:
+            rows = self._db.execute(
+                """
+                SELECT token_id FROM locks
+                WHERE chain_id = ? AND details_loaded = 0
+                ORDER BY token_id LIMIT ?
+                """,
+                (chain_id, limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def store_details(self, chain_id, details):
+        """
+        Store token amounts for locks.
+
+        Args:
+            chain_id: Chain ID
+            details: Dict token_id -> list of (token_address, amount)
+        """
+        with self._lock:
+            for token_id, tokens_data in details.items():
+                self._db.execute(
+                    "DELETE FROM lock_tokens WHERE chain_id = ? AND token_id = ?",
+                    (chain_id, token_id),
+                )
+                self._db.executemany(
+                    """
+                    INSERT INTO lock_tokens (chain_id, token_id, position, token, amount)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (chain_id, token_id, i, token, str(amount))
+                        for i, (token, amount) in enumerate(tokens_data)
+                    ],
+                )
+                self._db.execute(
+                    "UPDATE locks SET details_loaded = 1 WHERE chain_id = ? AND token_id = ?",
+                    (chain_id, token_id),
+                )
+            self._db.commit()
+
+    # ----- reads -----
+
+    def _lock_tokens(self, chain_id, token_ids):
+        tokens = {token_id: [] for token_id in token_ids}
+        if not token_ids:
+            return tokens
+        placeholders = ",".join("?" for _ in token_ids)
+        rows = self._db.execute(
+            f"""
+            SELECT token_id, token, amount FROM lock_tokens
+            WHERE chain_id = ? AND token_id IN ({placeholders})
+            ORDER BY token_id, position
+            """,
+            [chain_id] + list(token_ids),
+        ).fetchall()
+        for token_id, token, amount in rows:
+            tokens[token_id].append((token, int(amount)))
+        return tokens
+
+    def get_owner_locks(self, chain_id, owner):
+        """
+        Unclaimed locks currently owned by an address.
+
+        Returns:
+            List of dicts {"token_id", "tokens_data", "unlock_time"}, or None
+            if some of the owner's locks are not fully indexed yet
+        """
+        with self._lock:
+            rows = self._db.execute(
+                """
+                SELECT token_id, unlock_time, details_loaded FROM locks
+                WHERE chain_id = ? AND owner = ? AND claimed = 0
+                """,
+                (chain_id, Web3.to_checksum_address(owner)),
+            ).fetchall()
+            if any(not details_loaded for _, _, details_loaded in rows):
+                return None
+            tokens = self._lock_tokens(chain_id, [row[0] for row in rows])
+
+        return [
+            {
+                "token_id": token_id,
+                "tokens_data": tokens[token_id],
+                "unlock_time": unlock_time,
+            }
+            for token_id, unlock_time, _ in rows
+        ]
+
+    def get_lock(self, chain_id, token_id):
+        """
+        A single indexed lock.
+
+        Returns:
+            Dict {"tokens_data", "unlock_time", "claimed", "owner"}, or None
+            if the lock is not (fully) indexed
+        """
+        with self._lock:
+            row = self._db.execute(
+                """
+                SELECT unlock_time, claimed, owner, details_loaded FROM locks
+                WHERE chain_id = ? AND token_id = ?
+                """,
+                (chain_id, token_id),
+            ).fetchone()
+            if not row or not row[3]:
+                return None
+            tokens = self._lock_tokens(chain_id, [token_id])
+
+        unlock_time, claimed, owner, _ = row
+        return {
+            "tokens_data": tokens[token_id],
+            "unlock_time": unlock_time,
+            "claimed": bool(claimed),
+            "owner": None if owner == ZERO_ADDRESS else owner,
+        }
+
+
+class LockIndexer(threading.Thread):
+    """Background thread that keeps a LockIndex in sync for one chain"""
+
+    def __init__(
+        self,
+        chain_data,
+        index,
+        start_block=0,
+        chunk_size=2000,
+        confirmations=12,
+        poll_interval=5,
+        max_lag_blocks=0,
+    ):
+        super().__init__(daemon=True, name=f"lock-indexer-{chain_data['config']['route']}")
+        self.chain_data = chain_data
+        self.chain_id = chain_data["config"]["chainId"]
+        self.index = index
+        self.start_block = start_block
+        self.chunk_size = chunk_size
+        self.confirmations = confirmations
+        self.poll_interval = poll_interval
+        self.max_lag_blocks = max_lag_blocks
+        self.lock_details_types = output_types(chain_data["contract"].abi, "getLockDetails")
+        self._stop_event = threading.Event()
+        self._wake = threading.Event()
+
+    def is_fresh(self):
+        """True if the index is caught up with the tracked chain head"""
+        head = self.chain_data["head"]
+        return head.is_fresh() and self.index.is_caught_up(
+            self.chain_id, head.block_number, self.max_lag_blocks
+        )
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def run(self):
+        # Sync as soon as a new head is seen instead of waiting for the poll
+        head = self.chain_data["head"]
+        head.add_listener(lambda block_number: self._wake.set())
+        head.ensure_started()
+
+        while not self._stop_event.is_set():
+            self._wake.clear()
+            try:
+                self.sync_once()
+            except Exception as e:
+                print(f"Lock indexer ({self.chain_id}) sync failed: {e}")
+            self._wake.wait(self.poll_interval)
+
+    def sync_once(self):
+        """Index every block up to the current head"""
+        w3 = self.chain_data["w3"]
+        head = w3.eth.block_number
+
+        cursor = self.index.get_cursor(self.chain_id)
+        if cursor is None:
+            next_block = self.start_block
+        else:
+            cursor_block, cursor_hash = cursor
+            if cursor_hash and self._block_hash(cursor_block) != cursor_hash:
+                rewind_to = max(cursor_block - self.confirmations, self.start_block - 1)
+                print(f"Lock indexer ({self.chain_id}) reorg detected, rewinding to {rewind_to}")
+                self.index.rewind(self.chain_id, rewind_to)
+                cursor_block = rewind_to
+            next_block = cursor_block + 1
+
+        while next_block <= head and not self._stop_event.is_set():
+            to_block = min(next_block + self.chunk_size - 1, head)
+            try:
+                logs = self._get_logs(next_block, to_block)
+            except Exception as e:
+                if to_block == next_block:
+                    raise
+                # Node rejected the range (too many results / range limit)
+                self.chunk_size = max(1, (to_block - next_block + 1) // 2)
+                print(f"Lock indexer ({self.chain_id}) shrinking chunk to {self.chunk_size}: {e}")
+                continue
+
+            self.index.apply_logs(
+                self.chain_id, logs, to_block, self._block_hash(to_block)
+            )
+            next_block = to_block + 1
+
+        self._load_pending_details()
+
+    def _block_hash(self, block_number):
+        block = self.chain_data["w3"].eth.get_block(block_number)
+        return Web3.to_hex(block["hash"])
+
+    def _get_logs(self, from_block, to_block):
+        return self.chain_data["w3"].eth.get_logs(
+            {
+                "fromBlock": from_block,
+                "toBlock": to_block,
+                "address": self.chain_data["contract"].address,
+                "topics": [[TOKENS_LOCKED_TOPIC, TOKENS_CLAIMED_TOPIC, TRANSFER_TOPIC]],
+            }
+        )
+
+    def _load_pending_details(self):
+        """Fetch token amounts for newly indexed locks (not part of the events)"""
+        contract = self.chain_data["contract"]
+        multicall = self.chain_data.get("multicall")
+
+        while True:
+            token_ids = self.index.pending_details(self.chain_id, DETAILS_BATCH_SIZE)
+            if not token_ids:
+                return
+
+            details = {}
+            if multicall:
+                results = multicall.functions.aggregate3(
+                    [
+                        (
+                            contract.address,
+                            True,
+                            contract.functions.getLockDetails(token_id)._encode_transaction_data(),
+                        )
+                        for token_id in token_ids
+                    ]
+                ).call()
+                for token_id, (success, return_data) in zip(token_ids, results):
+                    if success:
+                        tokens_data, _, _ = decode_lock_details(
+                            self.lock_details_types, return_data
+                        )
+                        details[token_id] = tokens_data
+            else:
+                for token_id in token_ids:
+                    tokens_data, _, _ = contract.functions.getLockDetails(token_id).call()
+                    details[token_id] = tokens_data
+
+            if not details:
+                return
+            self.index.store_details(self.chain_id, details)
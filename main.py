@@ -1,15 +1,102 @@
-from flask import Flask, render_template, jsonify, request, redirect
+from flask import Flask, Response, g, render_template, jsonify, request, redirect
 from flask_cors import CORS
 from flask_swagger_ui import get_swaggerui_blueprint
 from web3 import Web3
+from web3.exceptions import BadFunctionCallOutput
+from abi_codec import (
+    FunctionEncoder,
+    decode_address,
+    decode_lock_details,
+    decode_outputs,
+    decode_string,
+    decode_uint,
+    decode_uint_array,
+    output_types,
+)
+from token_cache import TokenMetadataCache, is_erc20
+from indexer import LockIndex, LockIndexer
+from unlock_schedule import UnlockSchedule, UnlockScanner
+from rpc import AsyncRpcClient, RpcError, RpcPool, local_loop, run_local
+from multicall import MulticallExecutor, RpcBatchExecutor
+from block_cache import BlockResponseCache, HeadTracker
+from chain_registry import ChainRegistry
+from events import DEFAULT_MAX_SUBSCRIBERS, ChainEvents
+from http_cache import CachedJson, conditional_response, json_response
+from assets import asset_response, build_assets
+from serialization import FastJSONProvider, dumps_bytes
+from shared_cache import SharedCache
+from metrics import REQUEST_LATENCY, SEQUENTIAL_FALLBACKS, record_cache_lookups
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
+from tracing import TRACE_HEADER, finish_trace, span, start_trace
+import asyncio
+import base64
+import bisect
+import fcntl
+import hashlib
+import hmac
 import json
 import os
+import queue
+import random
+import re
+import threading
+import time
 import yaml
 
+# Served over WSGI: views are sync and drive their RPC coroutines with
+# run_local(), so only the calls of one request run concurrently
 app = Flask(__name__, static_folder="static", template_folder="templates")
+# orjson-backed jsonify() that can also answer in MessagePack (see serialization.py)
+app.json = FastJSONProvider(app)
 
 CORS(app)
 
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        # Route template, not the raw path, keeps label cardinality bounded
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        REQUEST_LATENCY.labels(route, request.method, response.status_code).observe(
+            time.perf_counter() - started
+        )
+    return response
+
+
+@app.before_request
+def start_request_trace():
+    # Opt in with the trace header carrying the configured secret, or by
+    # sampling API requests; without a secret the header is ignored
+    header = request.headers.get(TRACE_HEADER, "")
+    opt_in = bool(TRACE_SECRET and header) and hmac.compare_digest(
+        header.encode(), TRACE_SECRET.encode()
+    )
+    sampled = request.path.startswith("/api/") and random.random() < TRACE_SAMPLE_RATE
+    if opt_in or sampled:
+        g.trace_token = start_trace(f"{request.method} {request.path}")
+
+
+@app.after_request
+def finish_request_trace(response):
+    token = g.pop("trace_token", None)
+    if token is not None:
+        trace = finish_trace(token, TRACE_DIR, TRACE_MAX_FILES)
+        response.headers["Server-Timing"] = trace.server_timing()
+        response.headers["X-Trace-Id"] = trace.id
+    return response
+
+
 # Swagger UI configuration
 SWAGGER_URL = "/api/docs"
 API_URL = "/api/openapi.json"
@@ -27,9 +114,14 @@ swaggerui_blueprint = get_swaggerui_blueprint(
 
 app.register_blueprint(swaggerui_blueprint, url_prefix=SWAGGER_URL)
 
-with open("config.json", "r") as f:
+# HODL_CONFIG points at an alternative config file (e.g. for benchmarks)
+with open(os.environ.get("HODL_CONFIG", "config.json"), "r") as f:
     config = json.load(f)
 
+# Set by serve.py before import: the master only preloads, and background
+# threads start in each forked worker (init_worker) instead of at import
+PREFORK = os.environ.get("HODL_PREFORK") == "1"
+
 with open("ABIs/ERC20_ABI.json", "r") as f:
     ERC20_ABI = json.load(f)
 
@@ -39,9 +131,97 @@ with open("ABIs/HODLMONSTERNFT_ABI.json", "r") as f:
 with open("ABIs/MULTICALL3_ABI.json", "r") as f:
     MULTICALL3_ABI = json.load(f)
 
-chains = {}
-for chain_key, chain_config in config["chains"].items():
-    w3 = Web3(Web3.HTTPProvider(chain_config["rpc"]))
+with open("ABIs/HODLMONSTERTOKEN_ABI.json", "r") as f:
+    HODLMONSTERTOKEN_ABI = json.load(f)
+
+# Return types of batched contract calls, resolved once for local decoding
+LOCK_DETAILS_TYPES = output_types(abi, "getLockDetails")
+OWNER_LOCKS_DETAILS_TYPES = output_types(abi, "getOwnerLocksDetails")
+
+# Page size limits for the paginated all-locks API
+ALL_LOCKS_PAGE_SIZE = 50
+ALL_LOCKS_MAX_PAGE_SIZE = 200
+
+# Per-chain time budget of the cross-chain portfolio endpoint
+PORTFOLIO_CHAIN_TIMEOUT = config.get("portfolio", {}).get("chainTimeout", 10)
+
+# Maximum lock IDs per locks-batch request
+LOCKS_BATCH_MAX = 500
+
+# Maximum token addresses per tokens-batch request
+TOKENS_BATCH_MAX = 500
+
+# Default window and page size limits of the upcoming-unlocks API
+UPCOMING_UNLOCKS_WINDOW = 86400
+UPCOMING_UNLOCKS_LIMIT = 100
+UPCOMING_UNLOCKS_MAX_LIMIT = 1000
+
+# Server-sent events: per-chain subscriber cap and keep-alive interval
+events_config = config.get("events", {})
+EVENTS_KEEPALIVE = events_config.get("keepAlive", 15)
+# Shared by the streams of every chain; each open stream holds a thread
+event_stream_slots = threading.BoundedSemaphore(
+    events_config.get("maxSubscribers", DEFAULT_MAX_SUBSCRIBERS)
+)
+
+# Locks per chunk and chunks in flight for streamed (NDJSON) all-locks
+STREAM_CHUNK_SIZE = 50
+STREAM_WINDOW = 4
+
+# Calldata encoders, resolved once so requests never build web3 contract objects
+ERC20_SYMBOL = FunctionEncoder.from_abi(ERC20_ABI, "symbol")
+ERC20_DECIMALS = FunctionEncoder.from_abi(ERC20_ABI, "decimals")
+ERC20_NAME = FunctionEncoder.from_abi(ERC20_ABI, "name")
+ERC20_BALANCE_OF = FunctionEncoder.from_abi(ERC20_ABI, "balanceOf")
+ERC20_APPROVE = FunctionEncoder.from_abi(ERC20_ABI, "approve")
+ERC20_ALLOWANCE = FunctionEncoder.from_abi(ERC20_ABI, "allowance")
+LOCK_GET_DETAILS = FunctionEncoder.from_abi(abi, "getLockDetails")
+LOCK_GET_OWNER_LOCKS = FunctionEncoder.from_abi(abi, "getOwnerLocks")
+LOCK_GET_OWNER_LOCKS_DETAILS = FunctionEncoder.from_abi(abi, "getOwnerLocksDetails")
+LOCK_OWNER_OF = FunctionEncoder.from_abi(abi, "ownerOf")
+LOCK_LOCK_TOKENS = FunctionEncoder.from_abi(abi, "lockTokens")
+LOCK_CLAIM_TOKENS = FunctionEncoder.from_abi(abi, "claimTokens")
+TOKEN_MINT = FunctionEncoder.from_abi(HODLMONSTERTOKEN_ABI, "mint")
+
+# Cross-process cache of the serve.py workers, mapped before they are forked
+shared_cache_config = config.get("sharedCache", {})
+shared_cache = None
+if PREFORK and shared_cache_config.get("sizeMb", 64) > 0:
+    shared_cache = SharedCache(
+        shared_cache_config.get("sizeMb", 64) * 1024 * 1024,
+        slots=shared_cache_config.get("slots", 65536),
+    )
+
+# Shared ERC20 metadata cache (in-process LRU in front of SQLite)
+token_cache_config = config.get("tokenCache", {})
+token_cache = TokenMetadataCache(
+    token_cache_config.get("path", "cache/tokens.sqlite3"),
+    max_entries=token_cache_config.get("maxEntries", 10000),
+    negative_ttl=token_cache_config.get("negativeTtl", 3600),
+    shared=shared_cache,
+)
+
+# Pooled async JSON-RPC client settings (one client per chain)
+rpc_client_config = config.get("rpcClient", {})
+
+# Responses cached per (chain, block, endpoint args); dropped on every new head
+response_cache = BlockResponseCache(
+    max_entries=config.get("responseCache", {}).get("maxEntries", 2000),
+    shared=shared_cache,
+)
+
+
+def rpc_urls(chain_config):
+    """A chain's RPC endpoints ("rpc" may be one URL or a list)"""
+    urls = chain_config["rpc"]
+    return [urls] if isinstance(urls, str) else list(urls)
+
+
+def _build_chain(chain_key, chain_config):
+    """Create the provider, contracts, RPC client and head tracker for one chain"""
+    urls = rpc_urls(chain_config)
+    # The sync provider only encodes calldata and feeds the indexer
+    w3 = Web3(Web3.HTTPProvider(urls[0]))
     contract = None
     multicall = None
 
@@ -49,108 +229,458 @@ for chain_key, chain_config in config["chains"].items():
         contract_address = Web3.to_checksum_address(chain_config["deployment"])
         contract = w3.eth.contract(address=contract_address, abi=abi)
 
+    if len(urls) > 1:
+        rpc_client = RpcPool(
+            urls,
+            pool_size=rpc_client_config.get("poolSize", 100),
+            timeout=rpc_client_config.get("timeout", 20),
+            hedge=rpc_client_config.get("hedge", False),
+            cooldown=rpc_client_config.get("cooldown", 30),
+            name=chain_key,
+        )
+    else:
+        rpc_client = AsyncRpcClient(
+            urls[0],
+            pool_size=rpc_client_config.get("poolSize", 100),
+            timeout=rpc_client_config.get("timeout", 20),
+            name=chain_key,
+        )
+    multicall_executor = None
+
     # Initialize Multicall3 contract if configured
     multicall_addr = chain_config.get("multicall3")
     if multicall_addr:
         multicall = w3.eth.contract(
             address=Web3.to_checksum_address(multicall_addr), abi=MULTICALL3_ABI
         )
+        # Chunk budget for aggregate3 batches on this chain
+        limits = chain_config.get("multicallLimits", {})
+        multicall_executor = MulticallExecutor(
+            rpc_client,
+            multicall.address,
+            max_calls=limits.get("maxCalls", 300),
+            max_calldata_bytes=limits.get("maxCalldataBytes", 64_000),
+            max_gas=limits.get("maxGas", 30_000_000),
+            gas_per_call=limits.get("gasPerCall", 60_000),
+            max_parallel=limits.get("maxParallel", 8),
+        )
+
+    # Batched plain eth_calls for the paths that cannot use Multicall3
+    batch_limits = chain_config.get("rpcBatchLimits", {})
+    batch_executor = RpcBatchExecutor(
+        rpc_client,
+        max_calls=batch_limits.get("maxCalls", 50),
+        max_parallel=batch_limits.get("maxParallel", 8),
+        batch_cooldown=batch_limits.get("batchCooldown", 300),
+    )
+
+    # Head tracker used to pin each request to one block
+    head_tracker = HeadTracker(
+        rpc_client, poll_interval=chain_config.get("blockTime", 12), shared=shared_cache
+    )
+    head_tracker.add_listener(
+        lambda block_number: response_cache.invalidate_before(chain_key, block_number)
+    )
 
-    chains[chain_key] = {
+    # Server-sent events fed by the same head tracker
+    chain_events = ChainEvents(rpc_client, head_tracker, chain_config.get("deployment"))
+
+    return {
+        "key": chain_key,
         "config": chain_config,
         "w3": w3,
         "contract": contract,
         "contract_address": chain_config.get("deployment", ""),
         "multicall": multicall,
+        "multicall_executor": multicall_executor,
+        "batch_executor": batch_executor,
+        "rpc": rpc_client,
+        "head": head_tracker,
+        "events": chain_events,
     }
 
 
-def multicall3_batch(chain_data, calls):
+# Opt-in request tracing (see tracing.py)
+tracing_config = config.get("tracing", {})
+TRACE_SAMPLE_RATE = tracing_config.get("sampleRate", 0.0)
+TRACE_DIR = tracing_config.get("path", "cache/traces")
+TRACE_MAX_FILES = tracing_config.get("maxFiles", 1000)
+# Trace files cost disk and CPU, so clients may only opt in with the secret
+TRACE_SECRET = tracing_config.get("secret")
+
+# Cache-Control lifetimes for conditional (ETag) responses
+http_cache_config = config.get("httpCache", {})
+STATIC_CACHE_CONTROL = f"public, max-age={http_cache_config.get('staticMaxAge', 300)}"
+TOKEN_INFO_CACHE_CONTROL = (
+    f"public, max-age={http_cache_config.get('tokenInfoMaxAge', 86400)}, immutable"
+)
+
+# Fingerprinted, precompressed copies of static/ linked from the templates
+assets = build_assets(
+    app.static_folder, config.get("assets", {}).get("path", "cache/assets")
+)
+
+
+@app.template_global()
+def asset_url(name):
+    """URL of a static file; fingerprinted unless debugging (edits show on reload)"""
+    if app.debug:
+        return f"/static/{name}"
+    return assets.url(name)
+
+
+# Serialized payloads of the static API routes, built on first request
+static_responses = {}
+
+
+def static_json(key, build):
+    """Precomputed CachedJson for key, created from build() on first use"""
+    cached = static_responses.get(key)
+    if cached is None:
+        cached = CachedJson(build(), STATIC_CACHE_CONTROL)
+        static_responses[key] = cached
+    return cached
+
+
+# Chains are indexed up front but only built when first requested
+chains = ChainRegistry(config["chains"], _build_chain)
+registry_config = config.get("chainRegistry", {})
+
+# Optional background event indexer serving the lock endpoints from SQLite
+indexer_config = config.get("indexer", {})
+lock_indexers = {}
+lock_index = None
+
+
+def get_lock_index():
+    """This process's connection to the lock index database"""
+    global lock_index
+    if lock_index is None:
+        lock_index = LockIndex(indexer_config.get("path", "cache/locks.sqlite3"))
+    return lock_index
+
+
+def start_lock_indexers():
+    """Start one indexer thread per deployed chain"""
+    for chain_key, chain_config in chains.configs():
+        if not chain_config.get("deployment"):
+            continue
+        chain_info = chains.get(chain_key)
+        lock_indexers[chain_key] = LockIndexer(
+            chain_info,
+            get_lock_index(),
+            start_block=chain_info["config"].get("deploymentBlock", 0),
+            chunk_size=indexer_config.get("chunkSize", 2000),
+            confirmations=indexer_config.get("confirmations", 12),
+            poll_interval=indexer_config.get("pollInterval", 5),
+            max_lag_blocks=indexer_config.get("maxLagBlocks", 0),
+        )
+        lock_indexers[chain_key].start()
+
+
+def get_fresh_lock_index(chain_key, chain_data):
+    """
+    Lock index, if enabled for a chain and caught up with its head.
+
+    The indexers run in one serve.py worker; every worker compares the
+    shared database's cursor with its own view of the head.
+    """
+    if not indexer_config.get("enabled") or not chain_data["contract_address"]:
+        return None
+    head = chain_data["head"]
+    fresh = head.is_fresh() and get_lock_index().is_caught_up(
+        chain_data["config"]["chainId"],
+        head.block_number,
+        indexer_config.get("maxLagBlocks", 0),
+    )
+    record_cache_lookups("lock_index", fresh, not fresh)
+    return lock_index if fresh else None
+
+
+async def multicall3_batch(chain_data, calls, block="latest"):
     """
     Execute batched calls using Multicall3.
 
+    Calls are split into chunks that fit the chain's multicall budget and
+    dispatched in parallel (see MulticallExecutor); allowFailure is set on
+    every call for graceful handling.
+
     Args:
-        chain_data: Chain info dict with 'multicall' and 'w3'
+        chain_data: Chain info dict with 'multicall_executor'
         calls: List of tuples (target_address, encoded_call_data)
+        block: Block tag or number every chunk is executed against
 
     Returns:
-        List of decoded bytes results, or None if multicall not available
+        List of (success, returnData) tuples in call order, or None if
+        multicall not available
+
+    Raises:
+        RpcError or aiohttp.ClientError if a chunk fails and cannot be split
     """
-    multicall = chain_data.get("multicall")
-    if not multicall or not calls:
+    executor = chain_data.get("multicall_executor")
+    if not executor or not calls:
         return None
 
-    try:
-        # Build Call3 structs: (target, allowFailure, callData)
-        call3_structs = [
-            (target, True, call_data)  # allowFailure=True for graceful handling
-            for target, call_data in calls
-        ]
+    return await executor.aggregate3(calls, block)
 
-        results = multicall.functions.aggregate3(call3_structs).call()
-        return results  # List of (success, returnData) tuples
-    except Exception as e:
-        print(f"Multicall3 batch failed: {e}")
-        return None
 
+async def contract_call(chain_data, target, call_data, block="latest"):
+    """
+    Single eth_call returning raw bytes.
 
-def decode_string(data):
-    """Decode ABI-encoded string from bytes"""
-    if len(data) < 64:
-        return ""
-    try:
-        # First 32 bytes is offset (typically 32), we skip it
-        length = int.from_bytes(data[32:64], "big")
-        return data[64 : 64 + length].decode("utf-8")
-    except (UnicodeDecodeError, IndexError):
-        return ""
+    Raises like web3's .call(): RpcError on reverts, BadFunctionCallOutput
+    when the target returned nothing (no contract code).
+    """
+    return_data = await chain_data["rpc"].eth_call(target, call_data, block)
+    if not return_data:
+        raise BadFunctionCallOutput(f"Call to {target} returned no data")
+    return return_data
+
+
+async def contract_calls(chain_data, calls, block="latest"):
+    """
+    Independent eth_calls sent as JSON-RPC batch requests (no Multicall3 needed).
+
+    Args:
+        chain_data: Chain info dict with 'batch_executor'
+        calls: List of tuples (target_address, encoded_call_data)
+        block: Block tag or number every call is executed against
+
+    Returns:
+        List with, per call, the raw return bytes or the exception
+        contract_call would have raised
+    """
+    results = await chain_data["batch_executor"].eth_calls(calls, block)
+    return [
+        BadFunctionCallOutput(f"Call to {target} returned no data")
+        if result == b""
+        else result
+        for (target, _), result in zip(calls, results)
+    ]
+
+
+async def _try_eth_calls(chain_data, calls, block="latest"):
+    """
+    Batched eth_calls as Multicall3-style (success, returnData) results.
+
+    Reverts become (False, b""); transport and node errors are returned as
+    exceptions in their call's place.
+    """
+    results = await chain_data["batch_executor"].eth_calls(calls, block)
+    return [
+        (False, b"")
+        if isinstance(result, RpcError) and result.is_revert
+        else result
+        if isinstance(result, Exception)
+        else (True, result)
+        for result in results
+    ]
 
 
-def decode_uint(data):
-    """Decode ABI-encoded uint256 from bytes"""
-    if len(data) < 32:
-        return 0
-    return int.from_bytes(data[:32], "big")
+async def pin_block(chain_data):
+    """Block number every call of the current request is pinned to"""
+    return await chain_data["head"].current_block()
 
 
 def get_chain_data(chain_route):
     """Get chain data by route name"""
-    for chain_key, chain_info in chains.items():
-        if chain_info["config"]["route"] == chain_route:
-            return chain_key, chain_info
-    return None, None
+    return chains.by_route(chain_route)
+
+
+def _token_metadata_calls(token_addr):
+    """symbol(), decimals(), name() calls for one token"""
+    return [
+        (token_addr, ERC20_SYMBOL.encode()),
+        (token_addr, ERC20_DECIMALS.encode()),
+        (token_addr, ERC20_NAME.encode()),
+    ]
+
+
+def _parse_token_metadata(results):
+    """Decode the three aggregate3 results produced by _token_metadata_calls"""
+
+    def decoded(result, decoder):
+        success, data = result
+        # A call to an address without code "succeeds" with empty return data
+        return decoder(data) if success and data else None
+
+    return {
+        "symbol": decoded(results[0], decode_string),
+        "decimals": decoded(results[1], decode_uint),
+        "name": decoded(results[2], decode_string),
+    }
+
+
+async def _fetch_token_metadata_multicall(chain_data, token_list):
+    """Fetch metadata for tokens in one aggregate3 batch"""
+    calls = []
+    for token_addr in token_list:
+        calls.extend(_token_metadata_calls(token_addr))
+
+    results = await multicall3_batch(chain_data, calls)
+
+    return {
+        token_addr: _parse_token_metadata(results[i * 3 : i * 3 + 3])
+        for i, token_addr in enumerate(token_list)
+    }
+
+
+async def _fetch_token_metadata_sequential(chain_data, token_list):
+    """
+    Fallback: fetch metadata with one eth_call per field, sent in JSON-RPC batches.
+
+    Returns:
+        Tuple (metadata, transient) where transient holds the tokens that hit
+        a non-revert error and must not be cached
+    """
+    SEQUENTIAL_FALLBACKS.labels(chain_data["key"], "token_metadata").inc()
+    calls = []
+    for token_addr in token_list:
+        calls.extend(_token_metadata_calls(token_addr))
+
+    results = await _try_eth_calls(chain_data, calls)
+
+    metadata = {}
+    transient = set()
+
+    for i, token_addr in enumerate(token_list):
+        token_results = results[i * 3 : i * 3 + 3]
+        for result in token_results:
+            if isinstance(result, Exception):
+                print(f"Error fetching metadata for token {token_addr}: {result}")
+                transient.add(token_addr)
+
+        metadata[token_addr] = _parse_token_metadata(
+            [
+                (False, b"") if isinstance(result, Exception) else result
+                for result in token_results
+            ]
+        )
+
+    return metadata, transient
+
+
+async def fetch_token_metadata(chain_data, token_list):
+    """
+    Get symbol/decimals/name for tokens, hitting the RPC only for cache misses.
+
+    Args:
+        chain_data: Chain info dict
+        token_list: Checksum token addresses
+
+    Returns:
+        Dict address -> {"symbol", "decimals", "name"} (None for reverted calls)
+    """
+    chain_id = chain_data["config"]["chainId"]
+    metadata = token_cache.get_many(chain_id, token_list)
+    missing = [t for t in token_list if t not in metadata]
+    if not missing:
+        return metadata
+
+    with span("token_metadata", tokens=len(missing)):
+        if chain_data.get("multicall"):
+            fetched = await _fetch_token_metadata_multicall(chain_data, missing)
+            cacheable = fetched
+        else:
+            fetched, transient = await _fetch_token_metadata_sequential(
+                chain_data, missing
+            )
+            cacheable = {t: m for t, m in fetched.items() if t not in transient}
+
+    token_cache.put_many(chain_id, cacheable)
+    metadata.update(fetched)
+    return metadata
+
+
+def _token_display(metadata):
+    """Apply the API's defaults to token metadata"""
+    return {
+        "symbol": metadata["symbol"] or "UNKNOWN",
+        "decimals": 18 if metadata["decimals"] is None else metadata["decimals"],
+        "name": metadata["name"] or "Unknown Token",
+    }
+
+
+def _build_lock_tokens(tokens_data, token_metadata):
+    """Lock token entries (non-zero amounts only) enriched with metadata"""
+    lock_tokens = []
+    for token_amount in tokens_data:
+        token_addr = Web3.to_checksum_address(token_amount[0])
+        amount = token_amount[1]
+
+        if amount > 0:
+            info = _token_display(token_metadata[token_addr])
+            lock_tokens.append(
+                {
+                    "token": token_addr,
+                    "tokenSymbol": info["symbol"],
+                    "tokenName": info["name"],
+                    "tokenDecimals": info["decimals"],
+                    "amount": str(amount),
+                }
+            )
+    return lock_tokens
 
 
 @app.route("/")
 def index():
     default_chain = config["default"]
-    default_route = chains[default_chain]["config"]["route"]
+    default_route = chains.config(default_chain)["route"]
     return redirect(f"/{default_route}")
 
 
+@app.route("/metrics")
+def serve_metrics():
+    """Prometheus metrics in the text exposition format"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # serve.py workers: aggregate the samples every worker has written
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), content_type=CONTENT_TYPE_LATEST)
+
+
 @app.route("/api/openapi.json")
 def serve_openapi_spec():
     """Serve OpenAPI specification in JSON format"""
+    return static_json("openapi", _openapi_spec).response()
+
+
+def _openapi_spec():
     yaml_path = os.path.join(os.path.dirname(__file__), "openapi.yaml")
     with open(yaml_path, "r") as f:
-        spec = yaml.safe_load(f)
-    return jsonify(spec)
+        return yaml.safe_load(f)
 
 
 @app.route("/<chain_route>")
 def chain_index(chain_route):
-    chain_key, chain_data = get_chain_data(chain_route)
-    if not chain_data:
+    if chains.key_for_route(chain_route) is None:
         return "Chain not found", 404
-    return render_template("index.html", chain=chain_route)
+    # Revalidated on every load; the assets it links are cached for good
+    body = render_template("index.html", chain=chain_route).encode()
+    return conditional_response(
+        body,
+        hashlib.sha256(body).hexdigest()[:32],
+        "no-cache",
+        mimetype="text/html",
+    )
+
+
+@app.route("/assets/<path:path>")
+def serve_asset(path):
+    """Fingerprinted static asset, precompressed, cacheable forever"""
+    return asset_response(assets, path)
 
 
 @app.route("/api/chains")
 def get_available_chains():
     """Get list of available chains with valid deployments"""
+    return static_json("chains", _available_chains).response()
+
+
+def _available_chains():
     available = []
-    for chain_key, chain_info in chains.items():
-        chain_config = chain_info["config"]
+    for chain_key, chain_config in chains.configs():
         # Only include chains with valid deployment addresses
         if chain_config.get("deployment"):
             available.append(
@@ -161,30 +691,34 @@ def get_available_chains():
                     "chainName": chain_config["chainName"],
                 }
             )
-    return jsonify({"success": True, "chains": available})
+    return {"success": True, "chains": available}
 
 
 @app.route("/api/<chain_route>/config")
 def get_config(chain_route):
-    chain_key, chain_data = get_chain_data(chain_route)
-    if not chain_data:
+    chain_key = chains.key_for_route(chain_route)
+    if chain_key is None:
         return jsonify({"success": False, "error": "Chain not found"}), 404
 
-    chain_config = chain_data["config"]
-    block_explorer = chain_config.get("blockExplorerUrl", "https://etherscan.io")
+    return static_json(
+        ("config", chain_key), lambda: _chain_config(chain_key)
+    ).response()
 
-    return jsonify(
-        {
-            "chainId": chain_config["chainId"],
-            "chainName": chain_config["chainName"],
-            "contractAddress": chain_config.get("deployment", ""),
-            "testTokenAddress": chain_config.get("testerc20", ""),
-            "rpc": chain_config["rpc"],
-            "blockExplorerUrl": block_explorer,
-            "abi": abi,
-            "isNFT": True,  # Flag to indicate NFT-based contract
-        }
-    )
+
+def _chain_config(chain_key):
+    chain_config = chains.config(chain_key)
+    block_explorer = chain_config.get("blockExplorerUrl", "https://etherscan.io")
+    return {
+        "chainId": chain_config["chainId"],
+        "chainName": chain_config["chainName"],
+        "contractAddress": chain_config.get("deployment", ""),
+        "testTokenAddress": chain_config.get("testerc20", ""),
+        "rpc": rpc_urls(chain_config)[0],
+        "rpcUrls": rpc_urls(chain_config),
+        "blockExplorerUrl": block_explorer,
+        "abi": abi,
+        "isNFT": True,  # Flag to indicate NFT-based contract
+    }
 
 
 @app.route("/api/<chain_route>/token-info/<token>")
@@ -194,20 +728,23 @@ def get_token_info(chain_route, token):
         return jsonify({"success": False, "error": "Chain not found"}), 404
 
     try:
-        w3 = chain_data["w3"]
         token_addr = Web3.to_checksum_address(token)
-        token_contract = w3.eth.contract(address=token_addr, abi=ERC20_ABI)
+        metadata = run_local(fetch_token_metadata(chain_data, [token_addr]))[token_addr]
 
-        symbol = token_contract.functions.symbol().call()
-        decimals = token_contract.functions.decimals().call()
+        if metadata["symbol"] is None or metadata["decimals"] is None:
+            error = "Not an ERC20 token" if not is_erc20(metadata) else (
+                "Failed to read token symbol/decimals"
+            )
+            return jsonify({"success": False, "error": error}), 400
 
-        try:
-            name = token_contract.functions.name().call()
-        except:
-            name = symbol
+        symbol = metadata["symbol"]
+        decimals = metadata["decimals"]
+        name = metadata["name"] or symbol
 
-        return jsonify(
-            {"success": True, "symbol": symbol, "decimals": decimals, "name": name}
+        # Token metadata never changes, so clients and CDNs may keep it
+        return json_response(
+            {"success": True, "symbol": symbol, "decimals": decimals, "name": name},
+            TOKEN_INFO_CACHE_CONTROL,
         )
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
@@ -220,14 +757,29 @@ def get_token_balance(chain_route, token, address):
         return jsonify({"success": False, "error": "Chain not found"}), 404
 
     try:
-        w3 = chain_data["w3"]
         token_addr = Web3.to_checksum_address(token)
         user_addr = Web3.to_checksum_address(address)
-        token_contract = w3.eth.contract(address=token_addr, abi=ERC20_ABI)
 
-        balance = token_contract.functions.balanceOf(user_addr).call()
+        block = run_local(pin_block(chain_data))
+        cache_key = ("token-balance", token_addr, user_addr)
+        payload = response_cache.get(chain_key, block, cache_key)
+        if payload is not None:
+            return jsonify(payload)
 
-        return jsonify({"success": True, "balance": str(balance)})
+        balance = decode_uint(
+            run_local(
+                contract_call(
+                    chain_data,
+                    token_addr,
+                    ERC20_BALANCE_OF.encode(user_addr),
+                    block,
+                )
+            )
+        )
+
+        payload = {"success": True, "balance": str(balance)}
+        response_cache.put(chain_key, block, cache_key, payload)
+        return jsonify(payload)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
@@ -244,6 +796,7 @@ def get_tokens_batch(chain_route):
     }
 
     Returns info for all tokens in 1 RPC call (4 calls per token batched).
+    At most TOKENS_BATCH_MAX tokens are accepted per request.
     """
     chain_key, chain_data = get_chain_data(chain_route)
     if not chain_data:
@@ -256,126 +809,131 @@ def get_tokens_batch(chain_route):
 
         if not tokens:
             return jsonify({"success": True, "tokens": {}})
+        if len(tokens) > TOKENS_BATCH_MAX:
+            raise ValueError(f"At most {TOKENS_BATCH_MAX} tokens per request")
 
         # Validate addresses
         token_list = [Web3.to_checksum_address(t) for t in tokens]
         if user_addr:
             user_addr = Web3.to_checksum_address(user_addr)
 
+        block = run_local(pin_block(chain_data))
+        cache_key = ("tokens-batch", tuple(token_list), user_addr)
+        payload = response_cache.get(chain_key, block, cache_key)
+        if payload is not None:
+            return jsonify(payload)
+
         multicall = chain_data.get("multicall")
-        w3 = chain_data["w3"]
 
         if multicall and len(token_list) > 1:
             # Use Multicall3 for batching
-            return _get_tokens_batch_multicall(w3, multicall, token_list, user_addr)
+            payload = run_local(
+                _get_tokens_batch_multicall(chain_data, token_list, user_addr, block)
+            )
         else:
             # Fallback to sequential calls
-            return _get_tokens_batch_sequential(w3, token_list, user_addr)
+            payload = run_local(
+                _get_tokens_batch_sequential(chain_data, token_list, user_addr, block)
+            )
+
+        response_cache.put(chain_key, block, cache_key, payload)
+        return jsonify(payload)
 
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
 
-def _get_tokens_batch_multicall(w3, multicall, token_list, user_addr):
-    """Fetch token info for multiple tokens using Multicall3"""
-    erc20 = w3.eth.contract(address=token_list[0], abi=ERC20_ABI)
+async def _get_tokens_batch_multicall(chain_data, token_list, user_addr, block):
+    """Fetch token info for multiple tokens using Multicall3
+
+    Cached metadata is reused; only cache misses and balances go into the batch.
+    """
+    chain_id = chain_data["config"]["chainId"]
+    metadata = token_cache.get_many(chain_id, token_list)
+    missing = [t for t in token_list if t not in metadata]
 
     calls = []
-    for token_addr in token_list:
+    for token_addr in missing:
         # symbol(), decimals(), name()
-        calls.append((token_addr, erc20.functions.symbol()._encode_transaction_data()))
-        calls.append(
-            (token_addr, erc20.functions.decimals()._encode_transaction_data())
-        )
-        calls.append((token_addr, erc20.functions.name()._encode_transaction_data()))
+        calls.extend(_token_metadata_calls(token_addr))
 
-        # balanceOf(user) if user provided
-        if user_addr:
-            calls.append(
-                (
-                    token_addr,
-                    erc20.functions.balanceOf(user_addr)._encode_transaction_data(),
-                )
-            )
+    # balanceOf(user) if user provided
+    if user_addr:
+        balance_call = ERC20_BALANCE_OF.encode(user_addr)
+        for token_addr in token_list:
+            calls.append((token_addr, balance_call))
 
     # Execute batch call
-    results = multicall.functions.aggregate3(
-        [(target, True, data) for target, data in calls]
-    ).call()
+    results = await multicall3_batch(chain_data, calls, block) or []
 
     # Parse results
+    fetched = {
+        token_addr: _parse_token_metadata(results[i * 3 : i * 3 + 3])
+        for i, token_addr in enumerate(missing)
+    }
+    token_cache.put_many(chain_id, fetched)
+    metadata.update(fetched)
+
+    balance_offset = len(missing) * 3
     tokens_info = {}
-    calls_per_token = 4 if user_addr else 3
 
     for i, token_addr in enumerate(token_list):
-        base_idx = i * calls_per_token
-
-        symbol_success, symbol_data = results[base_idx]
-        decimals_success, decimals_data = results[base_idx + 1]
-        name_success, name_data = results[base_idx + 2]
-
-        symbol = decode_string(symbol_data) if symbol_success else "UNKNOWN"
-        decimals = decode_uint(decimals_data) if decimals_success else 18
-        name = decode_string(name_data) if name_success else "Unknown Token"
-
-        token_info = {
-            "symbol": symbol or "UNKNOWN",
-            "decimals": decimals,
-            "name": name or "Unknown Token",
-        }
+        token_info = _token_display(metadata[token_addr])
 
         if user_addr:
-            balance_success, balance_data = results[base_idx + 3]
+            balance_success, balance_data = results[balance_offset + i]
             balance = decode_uint(balance_data) if balance_success else 0
             token_info["balance"] = str(balance)
 
         tokens_info[token_addr] = token_info
 
-    return jsonify({"success": True, "tokens": tokens_info})
+    return {"success": True, "tokens": tokens_info}
+
 
+async def _get_tokens_batch_sequential(chain_data, token_list, user_addr, block):
+    """Fallback: fetch token info with individual calls, sent in JSON-RPC batches"""
+    SEQUENTIAL_FALLBACKS.labels(chain_data["key"], "tokens_batch").inc()
+    balance_calls = (
+        [(t, ERC20_BALANCE_OF.encode(user_addr)) for t in token_list]
+        if user_addr
+        else []
+    )
+    metadata, balances = await asyncio.gather(
+        fetch_token_metadata(chain_data, token_list),
+        contract_calls(chain_data, balance_calls, block),
+        return_exceptions=True,
+    )
+    if isinstance(metadata, Exception):
+        raise metadata
+    if isinstance(balances, Exception):
+        balances = [balances] * len(balance_calls)
 
-def _get_tokens_batch_sequential(w3, token_list, user_addr):
-    """Fallback: fetch token info sequentially"""
     tokens_info = {}
 
-    for token_addr in token_list:
+    for i, token_addr in enumerate(token_list):
         try:
-            token_contract = w3.eth.contract(address=token_addr, abi=ERC20_ABI)
-
-            try:
-                symbol = token_contract.functions.symbol().call()
-            except Exception:
-                symbol = "UNKNOWN"
-
-            try:
-                decimals = token_contract.functions.decimals().call()
-            except Exception:
-                decimals = 18
-
-            try:
-                name = token_contract.functions.name().call()
-            except Exception:
-                name = symbol
+            token_metadata = metadata[token_addr]
+            symbol = token_metadata["symbol"] or "UNKNOWN"
+            decimals = token_metadata["decimals"]
 
             token_info = {
                 "symbol": symbol,
-                "decimals": decimals,
-                "name": name,
+                "decimals": 18 if decimals is None else decimals,
+                "name": token_metadata["name"] or symbol,
             }
 
             if user_addr:
-                try:
-                    balance = token_contract.functions.balanceOf(user_addr).call()
-                    token_info["balance"] = str(balance)
-                except Exception:
+                if isinstance(balances[i], Exception):
                     token_info["balance"] = "0"
+                else:
+                    token_info["balance"] = str(decode_uint(balances[i]))
 
             tokens_info[token_addr] = token_info
         except Exception as e:
             print(f"Error fetching token {token_addr}: {e}")
             continue
 
-    return jsonify({"success": True, "tokens": tokens_info})
+    return {"success": True, "tokens": tokens_info}
 
 
 @app.route("/api/<chain_route>/all-locks/<address>")
@@ -392,152 +950,419 @@ def get_all_user_locks(chain_route, address):
 
     try:
         user = Web3.to_checksum_address(address)
-        contract = chain_data["contract"]
-        contract_addr = chain_data["contract_address"]
 
-        # Get all lock NFT token IDs for user
-        lock_token_ids = contract.functions.getOwnerLocks(user).call()
-
-        if not lock_token_ids:
-            return jsonify({"success": True, "locks": [], "tokenCount": 0})
+        # summary=false keeps the full response, like leaving it out
+        paged = "limit" in request.args or "cursor" in request.args
+        if paged or _query_flag("summary"):
+            return jsonify(
+                run_local(_get_all_locks_page(chain_key, chain_data, user))
+            )
 
-        # Check if multicall is available
-        multicall = chain_data.get("multicall")
+        if _wants_ndjson():
+            return _stream_all_locks(chain_key, chain_data, user)
 
-        if multicall:
-            # ===== MULTICALL PATH (optimized) =====
-            return _get_all_locks_multicall(
-                chain_data, lock_token_ids, contract, contract_addr
-            )
-        else:
-            # ===== FALLBACK PATH (sequential calls) =====
-            return _get_all_locks_sequential(chain_data, lock_token_ids, contract)
+        return jsonify(run_local(_get_all_locks(chain_key, chain_data, user)))
 
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
 
-def _get_all_locks_multicall(chain_data, lock_token_ids, contract, contract_addr):
-    """Fetch all locks using Multicall3 batching (2 RPC calls total)"""
-    multicall = chain_data["multicall"]
+async def _get_all_locks(chain_key, chain_data, user):
+    """All unclaimed locks of a wallet on one chain, sorted by unlock time"""
+    contract_addr = chain_data["contract_address"]
 
-    # Batch 1: Get lock details for all token IDs
-    lock_calls = []
-    for token_id in lock_token_ids:
-        call_data = contract.functions.getLockDetails(
-            token_id
-        )._encode_transaction_data()
-        lock_calls.append((contract_addr, call_data))
-
-    lock_results = multicall.functions.aggregate3(
-        [(target, True, data) for target, data in lock_calls]
-    ).call()
-
-    # Parse lock results and collect unique tokens
-    parsed_locks = []
-    unique_tokens = set()
+    # Serve from the local event index when it is up to date
+    index = get_fresh_lock_index(chain_key, chain_data)
+    if index:
+        indexed_locks = index.get_owner_locks(
+            chain_data["config"]["chainId"], user
+        )
+        if indexed_locks is not None:
+            return await _build_all_locks_response(chain_data, indexed_locks)
+
+    # Every call below reads the same block
+    block = await pin_block(chain_data)
+    cache_key = ("all-locks", user)
+    payload = response_cache.get(chain_key, block, cache_key)
+    if payload is not None:
+        return payload
+
+    # Get all lock NFT token IDs for user
+    with span("enumerate"):
+        lock_token_ids = decode_uint_array(
+            await contract_call(
+                chain_data,
+                contract_addr,
+                LOCK_GET_OWNER_LOCKS.encode(user),
+                block,
+            )
+        )
 
-    for i, (success, return_data) in enumerate(lock_results):
-        if not success:
-            continue
+    # Check if multicall is available
+    multicall = chain_data.get("multicall")
 
-        token_id = lock_token_ids[i]
+    if not lock_token_ids:
+        payload = {"success": True, "locks": [], "tokenCount": 0}
+    elif multicall:
+        # ===== MULTICALL PATH (optimized) =====
+        with span("locks", locks=len(lock_token_ids), path="multicall"):
+            payload = await _get_all_locks_multicall(
+                chain_data, lock_token_ids, contract_addr, block
+            )
+    else:
+        # ===== FALLBACK PATH (sequential calls) =====
+        with span("locks", locks=len(lock_token_ids), path="sequential"):
+            payload = await _get_all_locks_sequential(
+                chain_data, lock_token_ids, block
+            )
 
-        try:
-            # Decode getLockDetails return: (TokenAmount[], uint256, bool)
-            decoded = contract.functions.getLockDetails(token_id).call()
-            tokens_data, unlock_time, claimed = decoded
+    response_cache.put(chain_key, block, cache_key, payload)
+    return payload
 
-            # Actually re-decode from return_data for true batching
-            # For now, use decoded since ABI decoding of complex types is tricky
-            if claimed:
-                continue
 
-            for token_amount in tokens_data:
-                token_addr = token_amount[0]
-                if token_amount[1] > 0:
-                    unique_tokens.add(Web3.to_checksum_address(token_addr))
+def _encode_cursor(unlock_time, token_id):
+    """Opaque cursor pointing just past the lock with this sort key"""
+    raw = f"{unlock_time}:{token_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
-            parsed_locks.append(
-                {
-                    "token_id": token_id,
-                    "tokens_data": tokens_data,
-                    "unlock_time": unlock_time,
-                }
-            )
-        except Exception as e:
-            print(f"Error parsing lock {token_id}: {e}")
-            continue
 
-    if not unique_tokens:
-        return jsonify({"success": True, "locks": [], "tokenCount": 0})
+def _decode_cursor(cursor):
+    """
+    Returns:
+        (unlock_time, token_id) sort key of the last lock already served
 
-    # Batch 2: Get token info for all unique tokens
-    token_list = list(unique_tokens)
-    token_calls = []
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        unlock_time, token_id = raw.split(":")
+        return int(unlock_time), int(token_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
 
-    # Create ERC20 contract for encoding
-    w3 = chain_data["w3"]
-    erc20 = w3.eth.contract(address=token_list[0], abi=ERC20_ABI)
 
-    for token_addr in token_list:
-        symbol_data = erc20.functions.symbol()._encode_transaction_data()
-        decimals_data = erc20.functions.decimals()._encode_transaction_data()
-        name_data = erc20.functions.name()._encode_transaction_data()
+def _page_after(summaries, cursor, limit):
+    """
+    Slice one page out of summaries sorted by (unlockTime, tokenId).
 
-        token_calls.append((token_addr, symbol_data))
-        token_calls.append((token_addr, decimals_data))
-        token_calls.append((token_addr, name_data))
+    Keyset pagination: a page starts after the cursor's sort key, so locks
+    created or claimed between requests do not shift later pages.
 
-    token_results = multicall.functions.aggregate3(
-        [(target, True, data) for target, data in token_calls]
-    ).call()
+    Returns:
+        Tuple (page, next_cursor); next_cursor is None on the last page
+    """
+    start = 0
+    if cursor:
+        keys = [(s["unlockTime"], s["tokenId"]) for s in summaries]
+        start = bisect.bisect_right(keys, _decode_cursor(cursor))
 
-    # Parse token info results
-    token_info = {}
-    for i, token_addr in enumerate(token_list):
-        base_idx = i * 3
+    page = summaries[start : start + limit]
+    next_cursor = None
+    if start + limit < len(summaries):
+        last = page[-1]
+        next_cursor = _encode_cursor(last["unlockTime"], last["tokenId"])
+    return page, next_cursor
 
-        symbol_success, symbol_data = token_results[base_idx]
-        decimals_success, decimals_data = token_results[base_idx + 1]
-        name_success, name_data = token_results[base_idx + 2]
 
-        symbol = decode_string(symbol_data) if symbol_success else "UNKNOWN"
-        decimals = decode_uint(decimals_data) if decimals_success else 18
-        name = decode_string(name_data) if name_success else "Unknown Token"
+async def _get_owner_lock_summaries(chain_data, user, block):
+    """
+    Summaries of a wallet's locks from one getOwnerLocksDetails call.
 
-        token_info[token_addr] = {
-            "symbol": symbol or "UNKNOWN",
-            "decimals": decimals,
-            "name": name or "Unknown Token",
-        }
+    Returns:
+        List of {"tokenId", "unlockTime", "tokenCount"} sorted by unlock time
+    """
+    with span("enumerate"):
+        ids, unlock_times, token_counts = decode_outputs(
+            OWNER_LOCKS_DETAILS_TYPES,
+            await contract_call(
+                chain_data,
+                chain_data["contract_address"],
+                LOCK_GET_OWNER_LOCKS_DETAILS.encode(user),
+                block,
+            ),
+        )
+    summaries = [
+        {"tokenId": token_id, "unlockTime": unlock_time, "tokenCount": token_count}
+        for token_id, unlock_time, token_count in zip(ids, unlock_times, token_counts)
+    ]
+    summaries.sort(key=lambda s: (s["unlockTime"], s["tokenId"]))
+    return summaries
 
-    # Build final lock list
-    all_locks = []
-    for lock in parsed_locks:
-        lock_tokens = []
-        for token_amount in lock["tokens_data"]:
-            token_addr = Web3.to_checksum_address(token_amount[0])
-            amount = token_amount[1]
-
-            if amount > 0:
-                info = token_info.get(
-                    token_addr, {"symbol": "UNKNOWN", "decimals": 18, "name": "Unknown"}
-                )
-                lock_tokens.append(
-                    {
-                        "token": token_addr,
-                        "tokenSymbol": info["symbol"],
-                        "tokenName": info["name"],
-                        "tokenDecimals": info["decimals"],
-                        "amount": str(amount),
-                    }
-                )
 
-        if lock_tokens:
-            all_locks.append(
-                {
-                    "tokenId": lock["token_id"],
+async def _get_all_locks_page(chain_key, chain_data, user):
+    """
+    One page of a wallet's locks, ordered by unlock time.
+
+    Only the lock summaries are read for the whole wallet; full lock details
+    and token metadata are fetched for the requested page alone. With
+    ?summary=true, the page holds just tokenId, unlockTime and tokenCount.
+
+    Query args:
+        limit: Locks per page (default 50, max 200)
+        cursor: nextCursor of the previous page
+        summary: Return summaries without lock details
+    """
+    limit = min(
+        max(1, int(request.args.get("limit", ALL_LOCKS_PAGE_SIZE))),
+        ALL_LOCKS_MAX_PAGE_SIZE,
+    )
+    cursor = request.args.get("cursor")
+    summary_only = _query_flag("summary")
+
+    index = get_fresh_lock_index(chain_key, chain_data)
+    indexed_locks = (
+        index.get_owner_locks(chain_data["config"]["chainId"], user)
+        if index
+        else None
+    )
+
+    if indexed_locks is not None:
+        block = None
+        indexed_by_id = {lock["token_id"]: lock for lock in indexed_locks}
+        summaries = sorted(
+            (
+                {
+                    "tokenId": lock["token_id"],
+                    "unlockTime": lock["unlock_time"],
+                    "tokenCount": len(lock["tokens_data"]),
+                }
+                for lock in indexed_locks
+            ),
+            key=lambda s: (s["unlockTime"], s["tokenId"]),
+        )
+    else:
+        block = await pin_block(chain_data)
+        cache_key = ("all-locks-page", user, cursor, limit, summary_only)
+        payload = response_cache.get(chain_key, block, cache_key)
+        if payload is not None:
+            return payload
+        summaries = await _get_owner_lock_summaries(chain_data, user, block)
+
+    page, next_cursor = _page_after(summaries, cursor, limit)
+
+    if summary_only:
+        payload = {"success": True, "locks": page}
+    elif indexed_locks is not None:
+        payload = await _build_all_locks_response(
+            chain_data, [indexed_by_id[s["tokenId"]] for s in page]
+        )
+    elif not page:
+        payload = {"success": True, "locks": [], "tokenCount": 0}
+    elif chain_data.get("multicall"):
+        payload = await _get_all_locks_multicall(
+            chain_data,
+            [s["tokenId"] for s in page],
+            chain_data["contract_address"],
+            block,
+        )
+    else:
+        payload = await _get_all_locks_sequential(
+            chain_data, [s["tokenId"] for s in page], block
+        )
+
+    payload["total"] = len(summaries)
+    payload["nextCursor"] = next_cursor
+
+    if block is not None:
+        response_cache.put(chain_key, block, cache_key, payload)
+    return payload
+
+
+@app.route("/api/portfolio/<address>")
+def get_portfolio(address):
+    """
+    All locks of a wallet across every chain with a deployment.
+
+    Chains are queried concurrently, each with its own timeout, so the
+    response takes as long as the slowest chain. Locks from all chains are
+    merged in unlock-time order; chains that failed or timed out are
+    reported under "chains" without failing the whole request.
+    """
+    try:
+        user = Web3.to_checksum_address(address)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    timeout = PORTFOLIO_CHAIN_TIMEOUT
+    chain_keys = [
+        chain_key
+        for chain_key, chain_config in chains.configs()
+        if chain_config.get("deployment")
+    ]
+
+    async def fetch_chain(chain_key):
+        chain_data = chains.get(chain_key)
+        return await asyncio.wait_for(
+            _get_all_locks(chain_key, chain_data, user), timeout
+        )
+
+    async def fetch_chains():
+        return await asyncio.gather(
+            *(fetch_chain(chain_key) for chain_key in chain_keys),
+            return_exceptions=True,
+        )
+
+    results = run_local(fetch_chains())
+
+    all_locks = []
+    chain_status = {}
+    for chain_key, result in zip(chain_keys, results):
+        chain_config = chains.config(chain_key)
+        if isinstance(result, Exception):
+            error = (
+                f"Timed out after {timeout}s"
+                if isinstance(result, asyncio.TimeoutError)
+                else str(result)
+            )
+            print(f"Portfolio fetch failed for {chain_key}: {error}")
+            chain_status[chain_key] = {"success": False, "error": error}
+            continue
+
+        for lock in result["locks"]:
+            all_locks.append(
+                dict(lock, chain=chain_key, chainId=chain_config["chainId"])
+            )
+        chain_status[chain_key] = {
+            "success": True,
+            "lockCount": len(result["locks"]),
+            "tokenCount": result["tokenCount"],
+        }
+
+    if chain_keys and not any(status["success"] for status in chain_status.values()):
+        return jsonify(
+            {"success": False, "error": "All chains failed", "chains": chain_status}
+        ), 502
+
+    all_locks.sort(key=lambda lock: lock["unlockTime"])
+
+    return jsonify({"success": True, "locks": all_locks, "chains": chain_status})
+
+
+def _query_flag(name):
+    """True if a boolean query arg is set to 1, true or yes"""
+    return request.args.get(name, "").lower() in ("1", "true", "yes")
+
+
+def _wants_ndjson():
+    """True if the client asked for a streamed, one-lock-per-line response"""
+    if request.args.get("format") == "ndjson":
+        return True
+    return request.accept_mimetypes.best == "application/x-ndjson"
+
+
+def _stream_all_locks(chain_key, chain_data, user):
+    """
+    Stream a wallet's locks as NDJSON, one lock per line.
+
+    Lock ids are split into chunks that are fetched concurrently (at most
+    STREAM_WINDOW at a time) and written out as each chunk resolves, so
+    memory stays bounded by the window rather than the wallet size. With
+    ?sorted=true chunks are written in unlock-time order instead. The last
+    line is {"success": true, "done": true, "total", "tokenCount"}, or
+    {"success": false, "error"} if the stream failed part-way.
+    """
+    ordered = _query_flag("sorted")
+
+    index = get_fresh_lock_index(chain_key, chain_data)
+    indexed_locks = (
+        index.get_owner_locks(chain_data["config"]["chainId"], user)
+        if index
+        else None
+    )
+
+    if indexed_locks is not None:
+        indexed_locks.sort(key=lambda lock: (lock["unlock_time"], lock["token_id"]))
+        chunks = [
+            indexed_locks[i : i + STREAM_CHUNK_SIZE]
+            for i in range(0, len(indexed_locks), STREAM_CHUNK_SIZE)
+        ]
+
+        def fetch_chunk(chunk):
+            return _build_all_locks_response(chain_data, chunk)
+
+    else:
+        block = run_local(pin_block(chain_data))
+        summaries = run_local(_get_owner_lock_summaries(chain_data, user, block))
+        chunks = [
+            [s["tokenId"] for s in summaries[i : i + STREAM_CHUNK_SIZE]]
+            for i in range(0, len(summaries), STREAM_CHUNK_SIZE)
+        ]
+
+        def fetch_chunk(lock_ids):
+            if chain_data.get("multicall"):
+                return _get_all_locks_multicall(
+                    chain_data, lock_ids, chain_data["contract_address"], block
+                )
+            return _get_all_locks_sequential(chain_data, lock_ids, block)
+
+    def generate():
+        # Chunks run on this thread's loop, so decoding and token cache access
+        # stay here; only their RPC requests go to the shared RPC loop
+        loop = local_loop()
+        pending = []
+        next_chunk = 0
+        total = 0
+        tokens = set()
+        try:
+            while pending or next_chunk < len(chunks):
+                while next_chunk < len(chunks) and len(pending) < STREAM_WINDOW:
+                    pending.append(loop.create_task(fetch_chunk(chunks[next_chunk])))
+                    next_chunk += 1
+
+                if ordered:
+                    task = pending.pop(0)
+                else:
+                    done, _ = run_local(
+                        asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    )
+                    task = next(iter(done))
+                    pending.remove(task)
+
+                for lock in run_local(task)["locks"]:
+                    total += 1
+                    tokens.update(token["token"] for token in lock["tokens"])
+                    yield dumps_bytes(lock) + b"\n"
+
+            yield dumps_bytes(
+                {"success": True, "done": True, "total": total, "tokenCount": len(tokens)}
+            ) + b"\n"
+        except Exception as e:
+            print(f"Error streaming locks for {user}: {e}")
+            yield dumps_bytes({"success": False, "error": str(e)}) + b"\n"
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                run_local(asyncio.gather(*pending, return_exceptions=True))
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+async def _build_all_locks_response(chain_data, parsed_locks):
+    """
+    Build the all-locks response from parsed, unclaimed locks.
+
+    Args:
+        chain_data: Chain info dict
+        parsed_locks: List of dicts {"token_id", "tokens_data", "unlock_time"}
+    """
+    unique_tokens = {
+        Web3.to_checksum_address(token_addr)
+        for lock in parsed_locks
+        for token_addr, amount in lock["tokens_data"]
+        if amount > 0
+    }
+    token_metadata = await fetch_token_metadata(chain_data, list(unique_tokens))
+
+    all_locks = []
+    for lock in parsed_locks:
+        lock_tokens = _build_lock_tokens(lock["tokens_data"], token_metadata)
+
+        if lock_tokens:
+            all_locks.append(
+                {
+                    "tokenId": lock["token_id"],
                     "tokens": lock_tokens,
                     "unlockTime": lock["unlock_time"],
                     "tokenCount": len(lock_tokens),
@@ -546,79 +1371,179 @@ def _get_all_locks_multicall(chain_data, lock_token_ids, contract, contract_addr
 
     all_locks.sort(key=lambda x: x["unlockTime"])
 
-    return jsonify(
-        {"success": True, "locks": all_locks, "tokenCount": len(unique_tokens)}
-    )
+    return {"success": True, "locks": all_locks, "tokenCount": len(unique_tokens)}
 
 
-def _get_all_locks_sequential(chain_data, lock_token_ids, contract):
-    """Fallback: fetch all locks with sequential RPC calls"""
-    all_locks = []
-    unique_tokens = set()
+async def _get_all_locks_multicall(
+    chain_data, lock_token_ids, contract_addr, block
+):
+    """Fetch all locks using Multicall3 batching (2 RPC calls total)
+
+    Lock details are decoded straight from the aggregate3 return data, so the
+    cost stays constant regardless of how many locks the wallet owns.
+    """
+    # Batch 1: Get lock details for all token IDs
+    lock_calls = [
+        (contract_addr, LOCK_GET_DETAILS.encode(token_id)) for token_id in lock_token_ids
+    ]
+
+    lock_results = await multicall3_batch(chain_data, lock_calls, block)
+
+    # Parse lock results
+    parsed_locks = []
+
+    for i, (success, return_data) in enumerate(lock_results):
+        if not success:
+            continue
+
+        token_id = lock_token_ids[i]
 
-    for token_id in lock_token_ids:
         try:
-            tokens_data, unlock_time, claimed = contract.functions.getLockDetails(
-                token_id
-            ).call()
+            # Decode getLockDetails return: (TokenAmount[], uint256, bool)
+            tokens_data, unlock_time, claimed = decode_lock_details(
+                LOCK_DETAILS_TYPES, return_data
+            )
 
             if claimed:
                 continue
 
-            lock_tokens = []
-            for token_amount in tokens_data:
-                token_addr = token_amount[0]
-                amount = token_amount[1]
+            parsed_locks.append(
+                {
+                    "token_id": token_id,
+                    "tokens_data": tokens_data,
+                    "unlock_time": unlock_time,
+                }
+            )
+        except Exception as e:
+            print(f"Error parsing lock {token_id}: {e}")
+            continue
 
-                if amount > 0:
-                    token_contract = chain_data["w3"].eth.contract(
-                        address=token_addr, abi=ERC20_ABI
-                    )
-                    try:
-                        symbol = token_contract.functions.symbol().call()
-                        decimals = token_contract.functions.decimals().call()
-                        name = token_contract.functions.name().call()
-                    except Exception:
-                        symbol = "UNKNOWN"
-                        decimals = 18
-                        name = "Unknown Token"
-
-                    unique_tokens.add(token_addr)
-
-                    lock_tokens.append(
-                        {
-                            "token": token_addr,
-                            "tokenSymbol": symbol,
-                            "tokenName": name,
-                            "tokenDecimals": decimals,
-                            "amount": str(amount),
-                        }
-                    )
+    # Batch 2: Get token info for unique tokens not already cached
+    return await _build_all_locks_response(chain_data, parsed_locks)
+
+
+async def _get_all_locks_sequential(chain_data, lock_token_ids, block):
+    """Fallback: fetch all locks with individual calls, sent in JSON-RPC batches"""
+    SEQUENTIAL_FALLBACKS.labels(chain_data["key"], "all_locks").inc()
+    contract_addr = chain_data["contract_address"]
+    results = await contract_calls(
+        chain_data,
+        [
+            (contract_addr, LOCK_GET_DETAILS.encode(token_id))
+            for token_id in lock_token_ids
+        ],
+        block,
+    )
 
-            if lock_tokens:
-                all_locks.append(
-                    {
-                        "tokenId": token_id,
-                        "tokens": lock_tokens,
-                        "unlockTime": unlock_time,
-                        "tokenCount": len(lock_tokens),
-                    }
-                )
+    parsed_locks = []
 
+    for token_id, return_data in zip(lock_token_ids, results):
+        try:
+            if isinstance(return_data, Exception):
+                raise return_data
+            tokens_data, unlock_time, claimed = decode_lock_details(
+                LOCK_DETAILS_TYPES, return_data
+            )
         except Exception as e:
             print(f"Error fetching lock {token_id}: {e}")
             continue
 
-    all_locks.sort(key=lambda x: x["unlockTime"])
+        if claimed:
+            continue
 
-    return jsonify(
-        {"success": True, "locks": all_locks, "tokenCount": len(unique_tokens)}
+        parsed_locks.append(
+            {
+                "token_id": token_id,
+                "tokens_data": tokens_data,
+                "unlock_time": unlock_time,
+            }
+        )
+
+    return await _build_all_locks_response(chain_data, parsed_locks)
+
+
+async def _fetch_lock_states(chain_data, lock_ids, block):
+    """
+    getLockDetails and ownerOf for several locks in one batched round trip.
+
+    Both calls of every lock go into a single Multicall3 aggregate3 (chunked
+    by the executor), or into JSON-RPC batch requests on chains without it.
+
+    Returns:
+        Dict token_id -> {"tokens_data", "unlock_time", "claimed", "owner"}
+        for every lock whose details could be read; owner is None once the
+        NFT is burned (or was never minted)
+
+    Raises:
+        RpcError or aiohttp.ClientError if the details or owner could not be
+        fetched (a node error must not read as a burned NFT)
+    """
+    contract_addr = chain_data["contract_address"]
+    calls = []
+    for token_id in lock_ids:
+        calls.append((contract_addr, LOCK_GET_DETAILS.encode(token_id)))
+        calls.append((contract_addr, LOCK_OWNER_OF.encode(token_id)))
+
+    if chain_data.get("multicall"):
+        results = await multicall3_batch(chain_data, calls, block)
+    else:
+        results = await _try_eth_calls(chain_data, calls, block)
+
+    states = {}
+    for i, token_id in enumerate(lock_ids):
+        details, owner = results[2 * i], results[2 * i + 1]
+        if isinstance(details, Exception):
+            raise details
+        if isinstance(owner, Exception):
+            raise owner
+        success, details_data = details
+        if not success or not details_data:
+            continue
+
+        tokens_data, unlock_time, claimed = decode_lock_details(
+            LOCK_DETAILS_TYPES, details_data
+        )
+        # ownerOf reverts once the NFT is burned
+        has_owner = owner[0] and owner[1]
+        states[token_id] = {
+            "tokens_data": tokens_data,
+            "unlock_time": unlock_time,
+            "claimed": claimed,
+            "owner": decode_address(owner[1]) if has_owner else None,
+        }
+    return states
+
+
+def _lock_tokens_needed(states):
+    """Checksum addresses of all tokens with a non-zero amount in the locks"""
+    return list(
+        {
+            Web3.to_checksum_address(token_addr)
+            for state in states
+            for token_addr, amount in state["tokens_data"]
+            if amount > 0
+        }
     )
 
 
+def _lock_payload(token_id, state, token_metadata):
+    return {
+        "tokenId": token_id,
+        "owner": state["owner"],
+        "tokens": _build_lock_tokens(state["tokens_data"], token_metadata),
+        "unlockTime": state["unlock_time"],
+        "claimed": state["claimed"],
+    }
+
+
 @app.route("/api/<chain_route>/lock/<token_id>")
 def get_lock_details(chain_route, token_id):
-    """Get details for a specific lock NFT"""
+    """
+    Get details for a specific lock NFT.
+
+    Lock details and owner are read in one batched round trip, and token
+    metadata in at most one more (only for tokens not in the metadata cache).
+    """
     chain_key, chain_data = get_chain_data(chain_route)
     if not chain_data:
         return jsonify({"success": False, "error": "Chain not found"}), 404
@@ -630,58 +1555,233 @@ def get_lock_details(chain_route, token_id):
 
     try:
         nft_id = int(token_id)
-        tokens_data, unlock_time, claimed = (
-            chain_data["contract"].functions.getLockDetails(nft_id).call()
+
+        index = get_fresh_lock_index(chain_key, chain_data)
+        state = (
+            index.get_lock(chain_data["config"]["chainId"], nft_id)
+            if index
+            else None
         )
+        indexed = state is not None
 
-        # Get owner
-        try:
-            owner = chain_data["contract"].functions.ownerOf(nft_id).call()
-        except:
-            owner = None
-
-        lock_tokens = []
-        for token_amount in tokens_data:
-            token_addr = token_amount[0]
-            amount = token_amount[1]
-
-            if amount > 0:
-                token_contract = chain_data["w3"].eth.contract(
-                    address=token_addr, abi=ERC20_ABI
-                )
-                try:
-                    symbol = token_contract.functions.symbol().call()
-                    decimals = token_contract.functions.decimals().call()
-                    name = token_contract.functions.name().call()
-                except:
-                    symbol = "UNKNOWN"
-                    decimals = 18
-                    name = "Unknown Token"
-
-                lock_tokens.append(
-                    {
-                        "token": token_addr,
-                        "tokenSymbol": symbol,
-                        "tokenName": name,
-                        "tokenDecimals": decimals,
-                        "amount": str(amount),
-                    }
-                )
+        if not indexed:
+            block = run_local(pin_block(chain_data))
+            cache_key = ("lock", nft_id)
+            payload = response_cache.get(chain_key, block, cache_key)
+            if payload is not None:
+                return jsonify(payload)
+
+            state = run_local(_fetch_lock_states(chain_data, [nft_id], block)).get(
+                nft_id
+            )
+            if state is None:
+                raise ValueError(f"Could not read lock {nft_id}")
+
+        token_metadata = run_local(
+            fetch_token_metadata(chain_data, _lock_tokens_needed([state]))
+        )
+        payload = {"success": True, **_lock_payload(nft_id, state, token_metadata)}
+        if not indexed:
+            response_cache.put(chain_key, block, cache_key, payload)
+        return jsonify(payload)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
+@app.route("/api/<chain_route>/locks-batch", methods=["POST"])
+def get_locks_batch(chain_route):
+    """
+    Get details for many lock NFTs by token ID.
+
+    Request body:
+    {
+        "tokenIds": [1, 2, 3]
+    }
+
+    All locks are resolved in a constant number of batched calls: one
+    (chunked) round trip for details and owners, one for uncached metadata.
+    Locks are returned in request order; IDs that were never minted are
+    listed in notFound.
+    """
+    chain_key, chain_data = get_chain_data(chain_route)
+    if not chain_data:
+        return jsonify({"success": False, "error": "Chain not found"}), 404
 
+    if not chain_data["contract"]:
         return jsonify(
-            {
-                "success": True,
-                "tokenId": nft_id,
-                "owner": owner,
-                "tokens": lock_tokens,
-                "unlockTime": unlock_time,
-                "claimed": claimed,
-            }
+            {"success": False, "error": "Contract not deployed on this chain"}
+        ), 400
+
+    try:
+        data = request.get_json() or {}
+        token_ids = data.get("tokenIds", [])
+        if not isinstance(token_ids, list):
+            raise ValueError("tokenIds must be a list")
+        # Deduplicated, in request order
+        lock_ids = list(dict.fromkeys(int(token_id) for token_id in token_ids))
+        if len(lock_ids) > LOCKS_BATCH_MAX:
+            raise ValueError(f"At most {LOCKS_BATCH_MAX} tokenIds per request")
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    if not lock_ids:
+        return jsonify({"success": True, "locks": [], "notFound": []})
+
+    try:
+        states = {}
+        index = get_fresh_lock_index(chain_key, chain_data)
+        if index:
+            chain_id = chain_data["config"]["chainId"]
+            for lock_id in lock_ids:
+                indexed_lock = index.get_lock(chain_id, lock_id)
+                if indexed_lock:
+                    states[lock_id] = indexed_lock
+
+        missing = [lock_id for lock_id in lock_ids if lock_id not in states]
+        if missing:
+            block = run_local(pin_block(chain_data))
+            cache_key = ("locks-batch", tuple(lock_ids))
+            payload = response_cache.get(chain_key, block, cache_key)
+            if payload is not None:
+                return jsonify(payload)
+            states.update(run_local(_fetch_lock_states(chain_data, missing, block)))
+
+        token_metadata = run_local(
+            fetch_token_metadata(chain_data, _lock_tokens_needed(states.values()))
         )
+
+        locks = []
+        not_found = []
+        for lock_id in lock_ids:
+            state = states.get(lock_id)
+            # Never minted: no owner and not burned by a claim
+            if state is None or (state["owner"] is None and not state["claimed"]):
+                not_found.append(lock_id)
+            else:
+                locks.append(_lock_payload(lock_id, state, token_metadata))
+
+        payload = {"success": True, "locks": locks, "notFound": not_found}
+        if missing:
+            response_cache.put(chain_key, block, cache_key, payload)
+        return jsonify(payload)
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
 
+@app.route("/api/<chain_route>/events")
+def stream_events(chain_route):
+    """
+    Server-sent events for one chain (see events.py).
+
+    Query args:
+        address: Wallet to report lock changes for (optional)
+        tx: Comma-separated transaction hashes to report receipts for (optional)
+
+    Every client gets newHead events; receipts and lock changes come from one
+    shared upstream poll per block, however many clients are connected. An
+    open stream occupies a request thread, so each process serves at most
+    events.maxSubscribers streams and answers 503 beyond that.
+    """
+    chain_key, chain_data = get_chain_data(chain_route)
+    if not chain_data:
+        return jsonify({"success": False, "error": "Chain not found"}), 404
+
+    try:
+        address = request.args.get("address")
+        if address:
+            address = Web3.to_checksum_address(address)
+        tx_hashes = [h for h in request.args.get("tx", "").split(",") if h]
+        for tx_hash in tx_hashes:
+            if not re.fullmatch(r"0x[0-9a-fA-F]{64}", tx_hash):
+                raise ValueError(f"Invalid transaction hash: {tx_hash}")
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    if not event_stream_slots.acquire(blocking=False):
+        return jsonify(
+            {"success": False, "error": "Too many event subscribers, retry later"}
+        ), 503
+
+    events = chain_data["events"]
+    subscription = events.subscribe(address, tx_hashes)
+
+    def generate():
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                event, data = subscription.queue.get(timeout=EVENTS_KEEPALIVE)
+            except queue.Empty:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    def close():
+        events.unsubscribe(subscription)
+        event_stream_slots.release()
+
+    response = Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Runs when the server closes the response, even if it was never iterated
+    response.call_on_close(close)
+    return response
+
+
+@app.route("/api/<chain_route>/upcoming-unlocks")
+def get_upcoming_unlocks(chain_route):
+    """
+    Unclaimed locks across the whole contract that unlock in a time range.
+
+    Answered from the unlock scanner's schedule in SQLite, without RPC calls.
+
+    Query args:
+        from: Range start as a unix timestamp (default now)
+        to: Range end, exclusive (default from + 24 hours)
+        limit: Maximum locks returned (default 100, max 1000)
+    """
+    chain_key, chain_data = get_chain_data(chain_route)
+    if not chain_data:
+        return jsonify({"success": False, "error": "Chain not found"}), 404
+
+    schedule = get_unlock_schedule(chain_key, chain_data)
+    if not schedule:
+        return jsonify(
+            {"success": False, "error": "Unlock scanner is not enabled on this chain"}
+        ), 404
+    last_scan = schedule.last_scan()
+    if not last_scan:
+        return jsonify(
+            {"success": False, "error": "Unlock schedule is still being built"}
+        ), 503
+
+    try:
+        start = int(request.args.get("from", time.time()))
+        end = int(request.args.get("to", start + UPCOMING_UNLOCKS_WINDOW))
+        limit = min(
+            max(1, int(request.args.get("limit", UPCOMING_UNLOCKS_LIMIT))),
+            UPCOMING_UNLOCKS_MAX_LIMIT,
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    locks, total = schedule.between(start, end, limit)
+    scanned_block, scanned_at = last_scan
+    return jsonify(
+        {
+            "success": True,
+            "from": start,
+            "to": end,
+            "locks": locks,
+            "total": total,
+            "scannedBlock": scanned_block,
+            "scannedAt": int(scanned_at),
+        }
+    )
+
+
 @app.route("/api/<chain_route>/encode/approve", methods=["POST"])
 def encode_approve(chain_route):
     chain_key, chain_data = get_chain_data(chain_route)
@@ -694,22 +1794,52 @@ def encode_approve(chain_route):
         ), 400
 
     try:
-        w3 = chain_data["w3"]
         data = request.json
         token = Web3.to_checksum_address(data["token"])
         amount = int(data["amount"])
 
-        token_contract = w3.eth.contract(address=token, abi=ERC20_ABI)
-        contract_address = Web3.to_checksum_address(chain_data["contract_address"])
-        tx_data = token_contract.functions.approve(
-            contract_address, amount
-        )._encode_transaction_data()
+        tx_data = ERC20_APPROVE.encode(chain_data["contract"].address, amount)
 
         return jsonify({"success": True, "data": tx_data, "to": token})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
 
+def _parse_lock_request(data):
+    """
+    Validate a lock request body (single token or multi-token format).
+
+    Returns:
+        Tuple (token_addresses, amounts, lock_period, beneficiary)
+
+    Raises:
+        ValueError: if the token and amount lists are invalid
+    """
+    # Handle both single token and multi-token format
+    if "token" in data:
+        # Single token format (backward compatible)
+        token_addresses = [Web3.to_checksum_address(data["token"])]
+        amounts = [int(data["amount"])]
+    else:
+        # Multi-token format
+        token_addresses = [
+            Web3.to_checksum_address(addr) for addr in data["tokenAddresses"]
+        ]
+        amounts = [int(amt) for amt in data["amounts"]]
+
+    lock_period = int(data["lockPeriod"])
+    beneficiary = Web3.to_checksum_address(data["beneficiary"])
+
+    # Validate arrays
+    if len(token_addresses) != len(amounts):
+        raise ValueError("tokenAddresses and amounts arrays must have the same length")
+
+    if len(token_addresses) == 0 or len(token_addresses) > 10:
+        raise ValueError("Must provide 1-10 tokens")
+
+    return token_addresses, amounts, lock_period, beneficiary
+
+
 @app.route("/api/<chain_route>/encode/lock", methods=["POST"])
 def encode_lock_tokens(chain_route):
     """Encode lock transaction - unified for single and multi-token locks"""
@@ -723,54 +1853,131 @@ def encode_lock_tokens(chain_route):
         ), 400
 
     try:
-        data = request.json
+        token_addresses, amounts, lock_period, beneficiary = _parse_lock_request(
+            request.json
+        )
 
-        # Handle both single token and multi-token format
-        if "token" in data:
-            # Single token format (backward compatible)
-            token_addresses = [Web3.to_checksum_address(data["token"])]
-            amounts = [int(data["amount"])]
-        else:
-            # Multi-token format
-            token_addresses = [
-                Web3.to_checksum_address(addr) for addr in data["tokenAddresses"]
-            ]
-            amounts = [int(amt) for amt in data["amounts"]]
+        tx_data = LOCK_LOCK_TOKENS.encode(
+            token_addresses, amounts, lock_period, beneficiary
+        )
 
-        lock_period = int(data["lockPeriod"])
-        beneficiary = Web3.to_checksum_address(data["beneficiary"])
+        return jsonify(
+            {
+                "success": True,
+                "data": tx_data,
+                "to": chain_data["contract"].address,
+                "tokenCount": len(token_addresses),
+            }
+        )
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
 
-        # Validate arrays
-        if len(token_addresses) != len(amounts):
-            return jsonify(
-                {
-                    "success": False,
-                    "error": "tokenAddresses and amounts arrays must have the same length",
-                }
-            ), 400
 
-        if len(token_addresses) == 0 or len(token_addresses) > 10:
-            return jsonify({"success": False, "error": "Must provide 1-10 tokens"}), 400
+@app.route("/api/<chain_route>/encode/lock-plan", methods=["POST"])
+def encode_lock_plan(chain_route):
+    """
+    Encode a whole lock workflow in one response.
 
-        tx_data = (
-            chain_data["contract"]
-            .functions.lockTokens(token_addresses, amounts, lock_period, beneficiary)
-            ._encode_transaction_data()
-        )
-        contract_address = Web3.to_checksum_address(chain_data["contract_address"])
+    Returns the ordered approve transactions followed by the lockTokens
+    transaction. When "owner" is given, current allowances are read in one
+    Multicall3 batch and approvals that already cover the amount are skipped.
+    """
+    chain_key, chain_data = get_chain_data(chain_route)
+    if not chain_data:
+        return jsonify({"success": False, "error": "Chain not found"}), 404
 
+    if not chain_data["contract"]:
         return jsonify(
+            {"success": False, "error": "Contract not deployed on this chain"}
+        ), 400
+
+    try:
+        data = request.json
+        token_addresses, amounts, lock_period, beneficiary = _parse_lock_request(data)
+        owner = data.get("owner")
+        contract_address = chain_data["contract"].address
+
+        # A token listed twice needs one approval covering both amounts
+        required = {}
+        for token_addr, amount in zip(token_addresses, amounts):
+            required[token_addr] = required.get(token_addr, 0) + amount
+
+        allowances = {}
+        if owner:
+            allowances = run_local(
+                _fetch_allowances(
+                    chain_data,
+                    list(required),
+                    Web3.to_checksum_address(owner),
+                    contract_address,
+                )
+            )
+
+        transactions = []
+        skipped = []
+        for token_addr, amount in required.items():
+            allowance = allowances.get(token_addr)
+            if allowance is not None and allowance >= amount:
+                skipped.append(token_addr)
+                continue
+            transactions.append(
+                {
+                    "type": "approve",
+                    "token": token_addr,
+                    "amount": str(amount),
+                    "data": ERC20_APPROVE.encode(contract_address, amount),
+                    "to": token_addr,
+                }
+            )
+
+        transactions.append(
             {
-                "success": True,
-                "data": tx_data,
+                "type": "lock",
+                "data": LOCK_LOCK_TOKENS.encode(
+                    token_addresses, amounts, lock_period, beneficiary
+                ),
                 "to": contract_address,
                 "tokenCount": len(token_addresses),
             }
         )
+
+        return jsonify(
+            {"success": True, "transactions": transactions, "skippedApprovals": skipped}
+        )
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
 
+async def _fetch_allowances(chain_data, token_list, owner, spender):
+    """
+    Current allowance(owner, spender) for each token in one Multicall3 batch.
+
+    Tokens whose allowance could not be read are left out, so their
+    approvals are always included.
+    """
+    call_data = ERC20_ALLOWANCE.encode(owner, spender)
+    calls = [(token_addr, call_data) for token_addr in token_list]
+
+    try:
+        block = await pin_block(chain_data)
+        if chain_data.get("multicall"):
+            results = await multicall3_batch(chain_data, calls, block)
+        else:
+            results = [
+                (False, b"") if isinstance(result, Exception) else result
+                for result in await _try_eth_calls(chain_data, calls, block)
+            ]
+    except Exception as e:
+        print(f"Error fetching allowances for {owner}: {e}")
+        return {}
+
+    return {
+        token_addr: decode_uint(return_data)
+        for token_addr, (success, return_data) in zip(token_list, results)
+        if success and return_data
+    }
+
+
 @app.route("/api/<chain_route>/encode/claim", methods=["POST"])
 def encode_claim_tokens(chain_route):
     """Encode claim transaction using NFT token ID"""
@@ -787,14 +1994,11 @@ def encode_claim_tokens(chain_route):
         data = request.json
         token_id = int(data["tokenId"])
 
-        tx_data = (
-            chain_data["contract"]
-            .functions.claimTokens(token_id)
-            ._encode_transaction_data()
-        )
-        contract_address = Web3.to_checksum_address(chain_data["contract_address"])
+        tx_data = LOCK_CLAIM_TOKENS.encode(token_id)
 
-        return jsonify({"success": True, "data": tx_data, "to": contract_address})
+        return jsonify(
+            {"success": True, "data": tx_data, "to": chain_data["contract"].address}
+        )
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
@@ -806,20 +2010,130 @@ def encode_mint_tokens(chain_route):
         return jsonify({"success": False, "error": "Chain not found"}), 404
 
     try:
-        w3 = chain_data["w3"]
         data = request.json
         token = Web3.to_checksum_address(data["token"])
-
-        with open("ABIs/HODLMONSTERTOKEN_ABI.json", "r") as f:
-            token_abi = json.load(f)
-
-        token_contract = w3.eth.contract(address=token, abi=token_abi)
-        tx_data = token_contract.functions.mint()._encode_transaction_data()
+        tx_data = TOKEN_MINT.encode()
 
         return jsonify({"success": True, "data": tx_data, "to": token})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 400
 
 
+# Contract-wide unlock schedule, one scanner thread per deployed chain
+unlock_scanner_config = config.get("unlockScanner", {})
+unlock_scanners = {}
+unlock_schedules = {}
+
+
+def get_unlock_schedule(chain_key, chain_data):
+    """
+    A chain's unlock schedule, if the unlock scanner is enabled for it.
+
+    Each process opens its own connection; the schedule itself is written by
+    whichever process runs the scanners.
+    """
+    if not unlock_scanner_config.get("enabled") or not chain_data["contract_address"]:
+        return None
+    if chain_key not in unlock_schedules:
+        unlock_schedules[chain_key] = UnlockSchedule(
+            unlock_scanner_config.get("path", "cache/unlocks.sqlite3"),
+            chain_data["config"]["chainId"],
+        )
+    return unlock_schedules[chain_key]
+
+
+def start_unlock_scanners():
+    """Start one unlock scanner thread per deployed chain"""
+    for chain_key, chain_config in chains.configs():
+        if not chain_config.get("deployment"):
+            continue
+        chain_data = chains.get(chain_key)
+        unlock_scanners[chain_key] = UnlockScanner(
+            chain_data,
+            _fetch_lock_states,
+            get_unlock_schedule(chain_key, chain_data),
+            sweep_size=unlock_scanner_config.get("sweepSize", 2000),
+            interval=unlock_scanner_config.get("interval", 60),
+        )
+        unlock_scanners[chain_key].start()
+
+
+def start_background_services():
+    """Lock indexers and unlock scanners, as enabled in config"""
+    if indexer_config.get("enabled"):
+        start_lock_indexers()
+    if unlock_scanner_config.get("enabled"):
+        start_unlock_scanners()
+
+
+def warm_up_chains():
+    """Build every chain up front, if chainRegistry.warmUp is set"""
+    if registry_config.get("warmUp"):
+        chains.warm_up(health_check=registry_config.get("healthCheck", False))
+
+
+# serve.py workers compete for this lock; the holder runs the background
+# services until it exits, then another worker takes over
+BACKGROUND_LOCK_PATH = "cache/background.lock"
+background_lock_file = None
+
+
+def _lead_background_services():
+    """Wait for the background lock, then start the background services"""
+    global background_lock_file
+    os.makedirs(os.path.dirname(BACKGROUND_LOCK_PATH), exist_ok=True)
+    lock_file = open(BACKGROUND_LOCK_PATH, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+    except OSError as e:
+        print(f"Background lock failed, services not started: {e}")
+        lock_file.close()
+        return
+    # Released by the OS when this process exits, even if it crashes
+    background_lock_file = lock_file
+    print(f"Worker {os.getpid()} runs the background services")
+    start_background_services()
+
+
+def preload():
+    """
+    Build read-only state in the serve.py master before it forks.
+
+    The serialized OpenAPI spec, chain list and per-chain configs (which carry
+    the contract ABI) are then inherited by every worker instead of being
+    rebuilt in each one.
+    """
+    static_json("openapi", _openapi_spec)
+    static_json("chains", _available_chains)
+    for chain_key in chains.keys():
+        static_json(("config", chain_key), lambda: _chain_config(chain_key))
+
+
+def init_worker():
+    """
+    Reset per-process state in a worker forked by serve.py.
+
+    Drops chain objects (RPC sessions, head trackers) and the SQLite
+    connection inherited from the master. Lock indexers and unlock scanners
+    run in a single worker, which writes their results to SQLite for all
+    workers to read.
+    """
+    chains.reset()
+    token_cache.reopen()
+    warm_up_chains()
+    if indexer_config.get("enabled") or unlock_scanner_config.get("enabled"):
+        threading.Thread(
+            target=_lead_background_services, daemon=True, name="background-lock"
+        ).start()
+
+
+if not PREFORK:
+    warm_up_chains()
+    start_background_services()
+
+
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=5000)
+    # Development server; use serve.py for the preforked production server
+    app.run(
+        host="0.0.0.0", port=5000, debug=os.environ.get("FLASK_DEBUG") == "1"
+    )
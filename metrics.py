@@ -0,0 +1,81 @@
+"""
+Prometheus metrics shared by the API and its RPC layer.
+
+Exposed by the /metrics route. Label values are kept to bounded sets (route
+templates, chain keys, JSON-RPC method names) so cardinality stays small.
+"""
+
+from prometheus_client import Counter, Histogram
+
+REQUEST_LATENCY = Histogram(
+    "hodl_http_request_duration_seconds",
+    "API request latency by route template",
+    ["route", "method", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+RPC_REQUESTS = Counter(
+    "hodl_rpc_requests_total",
+    "Upstream JSON-RPC requests by chain, method and outcome",
+    ["chain", "method", "outcome"],
+)
+
+RPC_LATENCY = Histogram(
+    "hodl_rpc_request_duration_seconds",
+    "Upstream JSON-RPC request latency",
+    ["chain", "method"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20),
+)
+
+RPC_COALESCED = Counter(
+    "hodl_rpc_coalesced_total",
+    "eth_calls answered by an identical request already in flight",
+    ["chain"],
+)
+
+RPC_BATCH_SIZE = Histogram(
+    "hodl_rpc_batch_size",
+    "Requests per JSON-RPC batch array sent upstream",
+    ["chain"],
+    buckets=(1, 2, 5, 10, 25, 50, 100, 200, 500),
+)
+
+MULTICALL_BATCH_SIZE = Histogram(
+    "hodl_multicall_batch_size",
+    "Subcalls per aggregate3 request sent upstream",
+    ["chain"],
+    buckets=(1, 5, 10, 25, 50, 100, 200, 300, 500, 1000),
+)
+
+MULTICALL_FAILED_SUBCALLS = Histogram(
+    "hodl_multicall_failed_subcalls",
+    "Failed subcalls per aggregate3 request",
+    ["chain"],
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100),
+)
+
+MULTICALL_SPLITS = Counter(
+    "hodl_multicall_splits_total",
+    "aggregate3 chunks split in half after the node rejected them as too large",
+    ["chain"],
+)
+
+CACHE_REQUESTS = Counter(
+    "hodl_cache_requests_total",
+    "Cache lookups by cache and result (hit/miss)",
+    ["cache", "result"],
+)
+
+SEQUENTIAL_FALLBACKS = Counter(
+    "hodl_sequential_fallbacks_total",
+    "Requests served by a sequential (non-Multicall3) path",
+    ["chain", "path"],
+)
+
+
+def record_cache_lookups(cache, hits, misses=0):
+    """Count hits and misses of one cache lookup (or a batch of lookups)"""
+    if hits:
+        CACHE_REQUESTS.labels(cache, "hit").inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels(cache, "miss").inc(misses)
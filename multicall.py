@@ -0,0 +1,328 @@
+"""
+Chunked, parallel Multicall3 executor.
+
+A single unbounded aggregate3 runs into RPC gas caps and response-size limits
+for large wallets. MulticallExecutor splits calls into chunks that fit a
+per-chain budget (call count, calldata bytes, estimated gas), dispatches the
+chunks concurrently, and splits a chunk in half again whenever the node
+rejects it as too large. Results are always returned in the original order.
+
+Chains without Multicall3 use RpcBatchExecutor instead: the same eth_calls
+are packed into JSON-RPC batch arrays, chunked and dispatched the same way,
+so they still cost one HTTP round trip per chunk rather than one per call.
+"""
+
+import asyncio
+import time
+
+import aiohttp
+from eth_abi import decode as abi_decode
+from eth_abi import encode as abi_encode
+from eth_utils import function_signature_to_4byte_selector
+
+from metrics import MULTICALL_BATCH_SIZE, MULTICALL_FAILED_SUBCALLS, MULTICALL_SPLITS
+from rpc import RpcError, is_rate_limited, is_unknown_block, on_rpc_loop
+from tracing import cpu_timed, span
+
+AGGREGATE3_SELECTOR = function_signature_to_4byte_selector(
+    "aggregate3((address,bool,bytes)[])"
+)
+
+# Error fragments nodes use when a call is too big to execute or return
+TOO_LARGE_MARKERS = (
+    "gas",
+    "too large",
+    "too big",
+    "size",
+    "exceed",
+)
+
+# Invalid request / method not found: how nodes without batch support
+# commonly answer a batch array
+BATCH_UNSUPPORTED_CODES = (-32600, -32601)
+BATCH_UNSUPPORTED_MARKERS = ("not supported", "unsupported", "disabled", "not allowed")
+
+
+@cpu_timed("abi_encode")
+def encode_aggregate3(calls):
+    """aggregate3 calldata for (target, call_data) pairs with allowFailure=True"""
+    structs = [
+        (target, True, bytes.fromhex(data[2:]) if isinstance(data, str) else data)
+        for target, data in calls
+    ]
+    return AGGREGATE3_SELECTOR + abi_encode(["(address,bool,bytes)[]"], [structs])
+
+
+@cpu_timed("abi_decode")
+def decode_aggregate3(return_data):
+    """List of (success, returnData) tuples from aggregate3 return data"""
+    (results,) = abi_decode(["(bool,bytes)[]"], return_data)
+    return list(results)
+
+
+def _is_too_large(error):
+    """
+    True if a failed aggregate3 looks like a size/gas rejection worth splitting.
+
+    Timeouts do not count: a slow or overloaded node is not helped by twice
+    as many requests, so they fail (or fail over to another endpoint) instead.
+    """
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status == 413
+    if isinstance(error, RpcError):
+        # Rate limiting is not fixed by sending more, smaller requests
+        if is_rate_limited(error):
+            return False
+        message = (error.message or "").lower()
+        return any(marker in message for marker in TOO_LARGE_MARKERS)
+    return False
+
+
+def _batch_unsupported(error):
+    """True if a whole-batch error says the node does not accept batch requests"""
+    if not isinstance(error, RpcError) or is_rate_limited(error):
+        return False
+    if error.code in BATCH_UNSUPPORTED_CODES:
+        return True
+    message = (error.message or "").lower()
+    return "batch" in message and any(
+        marker in message for marker in BATCH_UNSUPPORTED_MARKERS
+    )
+
+
+def _call_size(data):
+    return (len(data) - 2) // 2 if isinstance(data, str) else len(data)
+
+
+class MulticallExecutor:
+    """Multicall3 aggregate3 with adaptive chunking for one chain"""
+
+    def __init__(
+        self,
+        rpc,
+        address,
+        max_calls=300,
+        max_calldata_bytes=64_000,
+        max_gas=30_000_000,
+        gas_per_call=60_000,
+        max_parallel=8,
+    ):
+        self.rpc = rpc
+        self.address = address
+        self.max_calls = max_calls
+        self.max_calldata_bytes = max_calldata_bytes
+        self.max_gas = max_gas
+        self.gas_per_call = gas_per_call
+        self.max_parallel = max_parallel
+        self._semaphore = None
+
+    def chunk(self, calls):
+        """Split calls into consecutive chunks that fit the budget"""
+        calls_per_gas = max(1, self.max_gas // self.gas_per_call)
+        max_calls = max(1, min(self.max_calls, calls_per_gas))
+
+        chunks = []
+        current = []
+        current_bytes = 0
+        for call in calls:
+            size = _call_size(call[1])
+            if current and (
+                len(current) >= max_calls or current_bytes + size > self.max_calldata_bytes
+            ):
+                chunks.append(current)
+                current = []
+                current_bytes = 0
+            current.append(call)
+            current_bytes += size
+        if current:
+            chunks.append(current)
+        return chunks
+
+    async def aggregate3(self, calls, block="latest"):
+        """
+        Execute calls through aggregate3.
+
+        Args:
+            calls: List of (target_address, call_data) tuples
+            block: Block tag or number all chunks are executed against
+
+        Returns:
+            List of (success, returnData) tuples in the order of calls
+        """
+        if not calls:
+            return []
+        return await on_rpc_loop(self._aggregate3(calls, block))
+
+    async def _aggregate3(self, calls, block):
+        chunk_results = await asyncio.gather(
+            *(self._execute(chunk, block) for chunk in self.chunk(calls))
+        )
+        return [result for results in chunk_results for result in results]
+
+    async def _execute(self, calls, block):
+        # Runs on the RPC loop, so the semaphore binds to it on first use
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_parallel)
+
+        try:
+            async with self._semaphore:
+                call_data = encode_aggregate3(calls)
+                with span(
+                    "aggregate3",
+                    "multicall",
+                    calls=len(calls),
+                    calldata_bytes=len(call_data),
+                ):
+                    return_data = await self.rpc.eth_call(
+                        self.address, call_data, block
+                    )
+        except Exception as e:
+            if len(calls) == 1 or not _is_too_large(e):
+                raise
+            MULTICALL_SPLITS.labels(self.rpc.name).inc()
+            # Node rejected the chunk as too large: split it and retry both halves
+            middle = len(calls) // 2
+            first, second = await asyncio.gather(
+                self._execute(calls[:middle], block),
+                self._execute(calls[middle:], block),
+            )
+            return first + second
+
+        results = decode_aggregate3(return_data)
+        MULTICALL_BATCH_SIZE.labels(self.rpc.name).observe(len(calls))
+        MULTICALL_FAILED_SUBCALLS.labels(self.rpc.name).observe(
+            sum(1 for success, _ in results if not success)
+        )
+        return results
+
+
+class RpcBatchExecutor:
+    """Independent eth_calls packed into JSON-RPC batch requests for one chain"""
+
+    def __init__(self, rpc, max_calls=50, max_parallel=8, batch_cooldown=300):
+        self.rpc = rpc
+        self.max_calls = max_calls
+        self.max_parallel = max_parallel
+        # Batching is switched off for batch_cooldown seconds whenever the
+        # node answers that it does not support batches, then tried again
+        self.batch_cooldown = batch_cooldown
+        self.batch_disabled_until = 0
+        self._semaphore = None
+        # (calls, block) -> in-flight task, touched only on the RPC loop
+        self._inflight = {}
+
+    @property
+    def batch_supported(self):
+        return time.monotonic() >= self.batch_disabled_until
+
+    async def eth_calls(self, calls, block="latest"):
+        """
+        Execute eth_calls, max_calls per batch request, chunks in parallel.
+
+        Args:
+            calls: List of (target_address, call_data) tuples
+            block: Block tag or number all calls are executed against
+
+        Returns:
+            List with, per call, its raw return bytes or the exception it
+            failed with (RpcError for reverts), in the order of calls
+        """
+        if not calls:
+            return []
+        if isinstance(block, int):
+            block = hex(block)
+        return await on_rpc_loop(self._eth_calls(calls, block))
+
+    async def _eth_calls(self, calls, block):
+        chunks = [
+            calls[i : i + self.max_calls] for i in range(0, len(calls), self.max_calls)
+        ]
+        chunk_results = await asyncio.gather(
+            *(self._coalesced(chunk, block) for chunk in chunks)
+        )
+        return [result for results in chunk_results for result in results]
+
+    async def _coalesced(self, calls, block):
+        # Identical chunks in flight at the same time share one batch request,
+        # like AsyncRpcClient does for single eth_calls
+        key = (tuple(calls), block)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._execute(calls, block))
+            self._inflight[key] = task
+
+            def forget(done, key=key):
+                if self._inflight.get(key) is done:
+                    del self._inflight[key]
+
+            task.add_done_callback(forget)
+        return await asyncio.shield(task)
+
+    async def _execute_singly(self, calls, block):
+        # Plain eth_calls still benefit from in-flight coalescing
+        return await asyncio.gather(
+            *(self.rpc.eth_call(target, data, block) for target, data in calls),
+            return_exceptions=True,
+        )
+
+    async def _execute(self, calls, block):
+        if len(calls) == 1 or not self.batch_supported:
+            return await self._execute_singly(calls, block)
+
+        # Runs on the RPC loop, so the semaphore binds to it on first use
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_parallel)
+
+        requests = [
+            (
+                "eth_call",
+                [
+                    {
+                        "to": target,
+                        "data": data if isinstance(data, str) else "0x" + data.hex(),
+                    },
+                    block,
+                ],
+            )
+            for target, data in calls
+        ]
+        try:
+            async with self._semaphore:
+                results = await self.rpc._batch(requests)
+        except Exception as e:
+            if isinstance(e, RpcError) and is_unknown_block(e):
+                # Single eth_calls retry and fail over until a node has the block
+                return await self._execute_singly(calls, block)
+            if _batch_unsupported(e) and not _is_too_large(e):
+                if self.batch_supported:
+                    print(
+                        f"JSON-RPC batches not supported by {self.rpc.name}, "
+                        f"retrying in {self.batch_cooldown}s: {e}"
+                    )
+                    self.batch_disabled_until = time.monotonic() + self.batch_cooldown
+                return await self._execute_singly(calls, block)
+            if not _is_too_large(e):
+                return [e] * len(calls)
+            # Node rejected the batch as too large: split and retry both halves
+            middle = len(calls) // 2
+            first, second = await asyncio.gather(
+                self._execute(calls[:middle], block),
+                self._execute(calls[middle:], block),
+            )
+            return first + second
+
+        results = [
+            result if isinstance(result, Exception) else bytes.fromhex(result[2:])
+            for result in results
+        ]
+        # Calls answered by a backend behind the pinned block go again singly
+        lagging = [
+            i
+            for i, result in enumerate(results)
+            if isinstance(result, RpcError) and is_unknown_block(result)
+        ]
+        if lagging:
+            retried = await self._execute_singly([calls[i] for i in lagging], block)
+            for i, result in zip(lagging, retried):
+                results[i] = result
+        return results
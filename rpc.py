@@ -0,0 +1,508 @@
+"""
+Pooled async JSON-RPC client.
+
+Every chain gets one AsyncRpcClient holding a keep-alive aiohttp session. All
+sessions live on a single background event loop, so connections are reused
+across requests no matter which thread or event loop the caller runs in:
+coroutines awaited from another loop are handed over to the RPC loop
+transparently, and sync code can use run_sync(). The Flask views are plain
+WSGI views that drive their coroutines with run_local(), on a loop kept by
+the request thread: the calls of one request run concurrently here, but
+every request still occupies a server thread while it waits.
+
+Identical eth_calls that are in flight at the same time are coalesced
+(single-flight): concurrent callers share one upstream request and all get
+its result or error. Nothing is kept once the request completes, so this
+never serves stale data.
+
+Independent requests can also be sent together as one JSON-RPC batch array
+(batch()); replies are matched back to their requests by id.
+
+A chain configured with several endpoints gets an RpcPool instead: it keeps a
+moving latency and error-rate score per endpoint, routes each request to the
+best healthy one, fails over on transport errors, rate limiting and unknown
+blocks, and can hedge slow reads with a duplicate request to the next
+endpoint.
+
+Requests pin their calls to the highest head seen, which a load-balanced
+backend or a lagging pool endpoint may not have yet. Such an eth_call is
+retried briefly (and failed over) instead of failing the request.
+"""
+
+import asyncio
+import collections
+import itertools
+import json
+import os
+import threading
+import time
+
+import aiohttp
+
+from metrics import RPC_BATCH_SIZE, RPC_COALESCED, RPC_LATENCY, RPC_REQUESTS
+from tracing import span
+
+# Read-only methods that are safe to send to two endpoints at once
+HEDGEABLE_METHODS = {
+    "eth_call",
+    "eth_blockNumber",
+    "eth_chainId",
+    "eth_getLogs",
+    "eth_getBlockByNumber",
+    "eth_getBalance",
+    "eth_getTransactionReceipt",
+}
+
+# Node answers (error codes and messages) for rate-limited requests
+RATE_LIMIT_CODES = (-32005, 429)
+RATE_LIMIT_MARKERS = ("rate limit", "rate-limit", "too many requests")
+
+# Node answers for a block it has not seen yet
+UNKNOWN_BLOCK_MARKERS = ("header not found", "unknown block", "block not found")
+# Retries (after 0.25 s, then 0.5 s) of an eth_call pinned to such a block
+UNKNOWN_BLOCK_RETRIES = 2
+UNKNOWN_BLOCK_RETRY_DELAY = 0.25
+
+_loop = None
+_loop_lock = threading.Lock()
+# Per-thread loops of run_local()
+_thread_loops = threading.local()
+
+
+def get_rpc_loop():
+    """Shared event loop running in a daemon thread (started on first use)"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever, name="rpc-loop", daemon=True
+            ).start()
+    return _loop
+
+
+def _reset_after_fork():
+    # The loop thread does not survive fork; a child starts its own on first use
+    global _loop, _loop_lock, _thread_loops
+    _loop = None
+    _loop_lock = threading.Lock()
+    _thread_loops = threading.local()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+async def on_rpc_loop(coro):
+    """Await a coroutine on the shared RPC loop from any event loop"""
+    loop = get_rpc_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+def run_sync(coro):
+    """Run a coroutine on the shared RPC loop and block until it completes"""
+    return asyncio.run_coroutine_threadsafe(coro, get_rpc_loop()).result()
+
+
+def run_local(coro):
+    """
+    Run a coroutine on the calling thread's own event loop until it completes.
+
+    Unlike run_sync(), the coroutine's own work (decoding, cache lookups) stays
+    in the calling thread and only the RPC requests it awaits go to the shared
+    loop. The loop is created on a thread's first call and reused afterwards.
+    """
+    return local_loop().run_until_complete(coro)
+
+
+def local_loop():
+    """Event loop of the calling thread used by run_local()"""
+    loop = getattr(_thread_loops, "loop", None)
+    if loop is None:
+        loop = _thread_loops.loop = asyncio.new_event_loop()
+    return loop
+
+
+class RpcError(Exception):
+    """JSON-RPC error response"""
+
+    def __init__(self, code, message, data=None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+    @property
+    def is_revert(self):
+        """True if the error is an EVM revert rather than a node/transport problem"""
+        return self.code == 3 or "revert" in (self.message or "").lower()
+
+
+class AsyncRpcClient:
+    """Keep-alive, connection-pooled JSON-RPC client for one endpoint"""
+
+    def __init__(self, url, pool_size=100, timeout=20, name=None):
+        self.url = url
+        # Metrics label; defaults to the URL, which may embed an API key
+        self.name = name or url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._session = None
+        self._ids = itertools.count(1)
+        # (to, calldata, block) -> in-flight eth_call task, touched only on the RPC loop
+        self._inflight = {}
+
+    def _get_session(self):
+        # Created lazily so it binds to the RPC loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def _post(self, payload):
+        async with self._get_session().post(self.url, json=payload) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def request(self, method, params):
+        """
+        Send a single JSON-RPC request.
+
+        Returns:
+            The "result" field
+
+        Raises:
+            RpcError: if the node answered with an error
+        """
+        return await on_rpc_loop(self._request(method, params))
+
+    async def _request(self, method, params):
+        reply = await self._send(
+            method,
+            {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params},
+        )
+        if "error" in reply:
+            error = reply["error"]
+            raise RpcError(error.get("code"), error.get("message"), error.get("data"))
+        return reply["result"]
+
+    async def _send(self, method, payload):
+        """POST a request or batch, recording metrics and a trace span"""
+        started = time.perf_counter()
+        # Anything that ends the request without an outcome is a cancellation
+        outcome = "cancelled"
+        try:
+            with span(method, "rpc", chain=self.name) as current:
+                if current:
+                    current.attrs["request_bytes"] = len(json.dumps(payload))
+                reply = await self._post(payload)
+                if isinstance(reply, dict) and "error" in reply:
+                    outcome = "rpc_error"
+                    if current:
+                        current.attrs["error"] = reply["error"].get("message")
+                else:
+                    outcome = "ok"
+                if current and isinstance(reply, dict):
+                    if isinstance(reply.get("result"), str):
+                        current.attrs["result_bytes"] = (len(reply["result"]) - 2) // 2
+                return reply
+        except Exception:
+            if outcome == "cancelled":
+                outcome = "transport_error"
+            raise
+        finally:
+            RPC_REQUESTS.labels(self.name, method, outcome).inc()
+            RPC_LATENCY.labels(self.name, method).observe(
+                time.perf_counter() - started
+            )
+
+    async def batch(self, calls):
+        """
+        Send several requests in one JSON-RPC batch array (one HTTP round trip).
+
+        Args:
+            calls: List of (method, params) tuples
+
+        Returns:
+            List with the "result" of each call, or the RpcError it answered
+            with, in the order of calls (replies are matched by id)
+
+        Raises:
+            RpcError: if the node rejected the batch as a whole
+        """
+        return await on_rpc_loop(self._batch(calls))
+
+    async def _batch(self, calls):
+        ids = [next(self._ids) for _ in calls]
+        reply = await self._send(
+            "batch",
+            [
+                {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+                for request_id, (method, params) in zip(ids, calls)
+            ],
+        )
+        if not isinstance(reply, list):
+            # Nodes without batch support answer with a single error object
+            error = reply.get("error") or {}
+            raise RpcError(
+                error.get("code"),
+                error.get("message") or "Batch request rejected",
+                error.get("data"),
+            )
+        RPC_BATCH_SIZE.labels(self.name).observe(len(calls))
+
+        by_id = {message.get("id"): message for message in reply}
+        results = []
+        for request_id in ids:
+            message = by_id.get(request_id)
+            if message is None:
+                results.append(RpcError(-32603, "No reply for batched request"))
+            elif "error" in message:
+                error = message["error"]
+                results.append(
+                    RpcError(error.get("code"), error.get("message"), error.get("data"))
+                )
+            else:
+                results.append(message["result"])
+        return results
+
+    async def eth_call(self, to, data, block="latest"):
+        """
+        eth_call returning raw bytes.
+
+        Args:
+            to: Target address
+            data: Calldata (hex string or bytes)
+            block: Block tag or number
+        """
+        if isinstance(data, (bytes, bytearray)):
+            data = "0x" + bytes(data).hex()
+        if isinstance(block, int):
+            block = hex(block)
+        result = await on_rpc_loop(self._coalesced_call(to, data, block))
+        return bytes.fromhex(result[2:])
+
+    async def _coalesced_call(self, to, data, block):
+        key = (to.lower(), data.lower(), block)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._pinned_call(to, data, block))
+            self._inflight[key] = task
+
+            def forget(done, key=key):
+                if self._inflight.get(key) is done:
+                    del self._inflight[key]
+
+            task.add_done_callback(forget)
+        else:
+            RPC_COALESCED.labels(self.name).inc()
+
+        # Shielded so one cancelled caller does not cancel the shared request
+        return await asyncio.shield(task)
+
+    async def _pinned_call(self, to, data, block):
+        """eth_call, retried if the node has not caught up with block yet"""
+        for attempt in range(UNKNOWN_BLOCK_RETRIES + 1):
+            try:
+                return await self._request("eth_call", [{"to": to, "data": data}, block])
+            except RpcError as e:
+                if (
+                    attempt == UNKNOWN_BLOCK_RETRIES
+                    or not block.startswith("0x")
+                    or not is_unknown_block(e)
+                ):
+                    raise
+            # A load balancer may route the retry to a backend that is synced
+            await asyncio.sleep(UNKNOWN_BLOCK_RETRY_DELAY * (attempt + 1))
+
+    async def block_number(self):
+        return int(await self.request("eth_blockNumber", []), 16)
+
+
+def is_rate_limited(error):
+    """True if an RpcError is the node refusing to serve more requests"""
+    message = (error.message or "").lower()
+    return error.code in RATE_LIMIT_CODES or any(
+        marker in message for marker in RATE_LIMIT_MARKERS
+    )
+
+
+def is_unknown_block(error):
+    """True if an RpcError says the node has not seen the requested block yet"""
+    message = (error.message or "").lower()
+    return any(marker in message for marker in UNKNOWN_BLOCK_MARKERS)
+
+
+def _should_fail_over(error):
+    """True if another endpoint might succeed where this one failed"""
+    if isinstance(error, RpcError):
+        # The node executed the request; only rate limiting and lagging
+        # behind the pinned block are endpoint-specific
+        return is_rate_limited(error) or is_unknown_block(error)
+    return True
+
+
+class RpcEndpoint:
+    """One upstream endpoint of an RpcPool and its moving health scores"""
+
+    def __init__(
+        self, client, alpha=0.2, error_penalty=2.0, cooldown=30, max_errors=3
+    ):
+        self.client = client
+        self.alpha = alpha
+        self.error_penalty = error_penalty
+        self.cooldown = cooldown
+        self.max_errors = max_errors
+        self.latency = None
+        self.error_rate = 0.0
+        self.consecutive_errors = 0
+        self.cooldown_until = 0
+        self.samples = collections.deque(maxlen=200)
+
+    @property
+    def url(self):
+        return self.client.url
+
+    def is_healthy(self):
+        return time.monotonic() >= self.cooldown_until
+
+    def score(self):
+        """Expected cost in seconds (lower is better); unmeasured endpoints go first"""
+        return (self.latency or 0.0) + self.error_penalty * self.error_rate
+
+    def p95(self):
+        if len(self.samples) < 20:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def record_success(self, elapsed):
+        self.samples.append(elapsed)
+        self.latency = (
+            elapsed
+            if self.latency is None
+            else self.alpha * elapsed + (1 - self.alpha) * self.latency
+        )
+        self.error_rate *= 1 - self.alpha
+        self.consecutive_errors = 0
+
+    def record_error(self):
+        self.error_rate = self.alpha + (1 - self.alpha) * self.error_rate
+        self.consecutive_errors += 1
+        if self.consecutive_errors >= self.max_errors:
+            self.cooldown_until = time.monotonic() + self.cooldown
+
+
+class RpcPool(AsyncRpcClient):
+    """
+    AsyncRpcClient over several endpoints of the same chain.
+
+    Requests go to the healthy endpoint with the lowest latency/error score
+    and fail over down the ranking. With hedge enabled, a read still pending
+    after the endpoint's p95 latency is duplicated to the next endpoint and
+    the first answer wins.
+    """
+
+    def __init__(
+        self, urls, pool_size=100, timeout=20, hedge=False, cooldown=30, name=None
+    ):
+        super().__init__(urls[0], pool_size=pool_size, timeout=timeout, name=name)
+        self.hedge = hedge
+        self.endpoints = [
+            RpcEndpoint(
+                AsyncRpcClient(
+                    url, pool_size=pool_size, timeout=timeout, name=self.name
+                ),
+                cooldown=cooldown,
+            )
+            for url in urls
+        ]
+
+    def ranked(self):
+        """Endpoints in the order they should be tried"""
+        healthy = [e for e in self.endpoints if e.is_healthy()]
+        cooling = [e for e in self.endpoints if not e.is_healthy()]
+        healthy.sort(key=lambda e: e.score())
+        cooling.sort(key=lambda e: e.cooldown_until)
+        return healthy + cooling
+
+    async def _attempt(self, endpoint, method, params):
+        started = time.monotonic()
+        try:
+            result = await endpoint.client._request(method, params)
+        except Exception as e:
+            if _should_fail_over(e):
+                endpoint.record_error()
+            else:
+                endpoint.record_success(time.monotonic() - started)
+            raise
+        endpoint.record_success(time.monotonic() - started)
+        return result
+
+    async def _request(self, method, params):
+        endpoints = self.ranked()
+        hedgeable = self.hedge and method in HEDGEABLE_METHODS
+        last_error = None
+        tasks = set()
+        next_endpoint = 0
+
+        def start(endpoint):
+            tasks.add(asyncio.ensure_future(self._attempt(endpoint, method, params)))
+
+        try:
+            while next_endpoint < len(endpoints) or tasks:
+                if not tasks:
+                    primary = endpoints[next_endpoint]
+                    next_endpoint += 1
+                    start(primary)
+
+                    hedge_after = primary.p95() if hedgeable else None
+                    if hedge_after is not None and next_endpoint < len(endpoints):
+                        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                        if not done:
+                            start(endpoints[next_endpoint])
+                            next_endpoint += 1
+
+                done, tasks = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        return task.result()
+                    if not _should_fail_over(error):
+                        raise error
+                    last_error = error
+        finally:
+            for task in tasks:
+                if task.done():
+                    task.exception()
+                else:
+                    task.cancel()
+
+        raise last_error
+
+    async def _batch(self, calls):
+        # Batches are not hedged: fail over down the ranking only
+        last_error = None
+        for endpoint in self.ranked():
+            started = time.monotonic()
+            try:
+                results = await endpoint.client._batch(calls)
+            except Exception as e:
+                if not _should_fail_over(e):
+                    endpoint.record_success(time.monotonic() - started)
+                    raise
+                endpoint.record_error()
+                last_error = e
+                continue
+            endpoint.record_success(time.monotonic() - started)
+            return results
+        raise last_error
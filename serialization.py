@@ -0,0 +1,107 @@
+"""
+Response serialization.
+
+FastJSONProvider replaces Flask's JSON provider (app.json), so every
+jsonify() in the API goes through it. JSON is encoded with orjson when it is
+installed (falling back to the standard library), with sorted keys and the
+same document structure as before. Clients whose Accept header prefers
+MessagePack get the same payload as application/msgpack instead, if msgpack
+is installed. Token amounts and balances stay decimal strings in both
+representations, so openapi.yaml describes either one.
+"""
+
+import json
+
+from flask import has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/msgpack"
+# Older name still sent by some MessagePack clients
+MSGPACK_MIMETYPES = (MSGPACK_MIMETYPE, "application/x-msgpack")
+
+if orjson is not None:
+    # Dates and dataclasses go through Flask's default() like before
+    ORJSON_OPTIONS = (
+        orjson.OPT_SORT_KEYS
+        | orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+
+
+def dumps_bytes(obj):
+    """Compact JSON encoding of obj with sorted keys, as UTF-8 bytes"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                obj, default=DefaultJSONProvider.default, option=ORJSON_OPTIONS
+            )
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which only the json module encodes
+            pass
+    return json.dumps(
+        obj, default=DefaultJSONProvider.default, sort_keys=True, separators=(",", ":")
+    ).encode()
+
+
+def dumps_msgpack(obj):
+    """
+    MessagePack encoding of obj.
+
+    Returns:
+        bytes, or None if msgpack is not installed or obj holds a value
+        MessagePack cannot represent (integers beyond 64 bits)
+    """
+    if msgpack is None:
+        return None
+    try:
+        return msgpack.packb(obj, default=DefaultJSONProvider.default)
+    except OverflowError:
+        return None
+
+
+def wants_msgpack():
+    """True if the current request's Accept header prefers MessagePack to JSON"""
+    if msgpack is None or not has_request_context():
+        return False
+    accept = request.accept_mimetypes
+    quality = max(accept.quality(mimetype) for mimetype in MSGPACK_MIMETYPES)
+    return quality > accept.quality(JSON_MIMETYPE)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider using orjson and negotiating MessagePack responses"""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs or orjson is None:
+            return super().dumps(obj, **kwargs)
+        return dumps_bytes(obj).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+
+        body = dumps_msgpack(obj) if wants_msgpack() else None
+        if body is not None:
+            response = self._app.response_class(body, mimetype=MSGPACK_MIMETYPE)
+        elif (self.compact is None and self._app.debug) or self.compact is False:
+            # Indented output for debugging
+            response = super().response(obj)
+        else:
+            response = self._app.response_class(
+                dumps_bytes(obj) + b"\n", mimetype=self.mimetype
+            )
+
+        if msgpack is not None:
+            response.vary.add("Accept")
+        return response
@@ -0,0 +1,134 @@
+"""
+Production server.
+
+Runs the API under gunicorn with the app preloaded in the master process:
+config, ABIs, encoders and the serialized static responses are built once
+and inherited by a pool of forked worker processes. Each worker then resets
+what must not cross fork (RPC sessions, SQLite connections); one of them
+runs the lock indexers and unlock scanners for all. Token metadata,
+block-pinned responses and chain heads go through a SharedCache mapped by
+the master, so workers reuse each other's results instead of each holding
+and fetching its own copy.
+
+Settings come from the "server" section of config.json; command line
+options override them.
+
+Usage:
+    python serve.py
+    python serve.py --workers 8 --bind 0.0.0.0:8000
+"""
+
+import argparse
+import gc
+import json
+import os
+import shutil
+import sys
+
+from gunicorn.app.base import BaseApplication
+
+with open(os.environ.get("HODL_CONFIG", "config.json"), "r") as f:
+    config = json.load(f)
+server_config = config.get("server", {})
+events_config = config.get("events", {})
+
+
+class HodlApplication(BaseApplication):
+    """gunicorn application serving main.app with the given settings"""
+
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        import main
+
+        return main.app
+
+
+def when_ready(server):
+    import main
+
+    main.preload()
+    # Keep the preloaded objects out of the garbage collector's reach, so
+    # collections in the workers do not copy their pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import main
+
+    main.init_worker()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--bind", default=server_config.get("bind", "0.0.0.0:5000"), help="host:port"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=server_config.get("workers", os.cpu_count() or 1),
+        help="Worker processes (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=server_config.get("threads", 32),
+        help="Request threads per worker",
+    )
+    args = parser.parse_args()
+
+    # Workers write their Prometheus samples here; /metrics aggregates them.
+    # prometheus_client reads this when first imported, so nothing importing
+    # metrics.py may run before it is set.
+    metrics_dir = server_config.get("metricsDir", "cache/prometheus")
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+    os.environ["HODL_PREFORK"] = "1"
+
+    from events import DEFAULT_MAX_SUBSCRIBERS
+
+    # Every open event stream holds one of a worker's threads
+    max_streams = events_config.get("maxSubscribers", DEFAULT_MAX_SUBSCRIBERS)
+    if max_streams > args.threads // 2:
+        parser.error(
+            f"events.maxSubscribers ({max_streams}) must be at most half of "
+            f"--threads ({args.threads}), or event streams can starve API requests"
+        )
+
+    HodlApplication(
+        {
+            "bind": args.bind,
+            "workers": args.workers,
+            "threads": args.threads,
+            # Views block their request thread while awaiting RPC (see README),
+            # so threads, not the RPC loop, bound concurrent requests per worker
+            "worker_class": "gthread",
+            "preload_app": True,
+            # Event streams stay open; gthread workers heartbeat from their
+            # main thread, so this only catches hung workers
+            "timeout": server_config.get("timeout", 30),
+            "keepalive": server_config.get("keepAlive", 5),
+            "when_ready": when_ready,
+            "post_fork": post_fork,
+            "child_exit": child_exit,
+        }
+    ).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,160 @@
+"""
+Cross-process cache in a shared memory map.
+
+SharedCache is created in the serve.py master before it forks, so every
+worker maps the same pages: a value stored by one worker (token metadata, a
+block-pinned response, the chain head) is served to all of them without a
+second copy or a second RPC call.
+
+The map holds a small hash index in front of a ring buffer of records.
+Writes append to the ring and point the key's index slot at the new record;
+once the ring wraps, the oldest records are overwritten and their slots
+become stale, so the cache never needs explicit eviction. Keys are stored as
+fixed-size BLAKE2b digests, so a key of any length fits a record; values are
+pickled, and a process-shared lock serializes access to the map.
+"""
+
+import hashlib
+import mmap
+import multiprocessing
+import pickle
+import struct
+
+from metrics import record_cache_lookups
+
+# Total bytes ever appended to the ring (its write position modulo ring size)
+HEADER = struct.Struct("<Q")
+# Index slot: key hash, ring position + 1 (0 = empty), record length
+SLOT = struct.Struct("<QQI4x")
+# Record header (value length), followed by the key digest and the pickled value
+RECORD = struct.Struct("<I")
+KEY_DIGEST_SIZE = 32
+
+# Neighbouring slots tried for one key before the oldest is replaced
+PROBES = 4
+
+
+def _key_digest(key):
+    key = key if isinstance(key, bytes) else repr(key).encode()
+    return hashlib.blake2b(key, digest_size=KEY_DIGEST_SIZE).digest()
+
+
+def _key_hash(digest):
+    return int.from_bytes(digest[:8], "little")
+
+
+class SharedCache:
+    """Fixed-size pickled key/value store in an anonymous shared mmap"""
+
+    def __init__(self, size_bytes=64 * 1024 * 1024, slots=65536):
+        """
+        Args:
+            size_bytes: Size of the map (index plus ring buffer)
+            slots: Index slots; at most this many keys are reachable at once
+        """
+        self.slots = slots
+        self._data_offset = HEADER.size + slots * SLOT.size
+        self.ring_size = size_bytes - self._data_offset
+        if self.ring_size <= 0:
+            raise ValueError(f"{size_bytes} bytes cannot hold {slots} index slots")
+        # Larger values would evict too much of the ring at once
+        self.max_record_bytes = self.ring_size // 8
+        # Anonymous maps are MAP_SHARED, so forked children see the same pages
+        self._map = mmap.mmap(-1, size_bytes)
+        self._lock = multiprocessing.Lock()
+
+    def _slot_offsets(self, key_hash):
+        first = key_hash % self.slots
+        return [
+            HEADER.size + ((first + i) % self.slots) * SLOT.size for i in range(PROBES)
+        ]
+
+    def _is_live(self, position, written):
+        # A record survives until the ring has wrapped past its start
+        return position > 0 and written <= position - 1 + self.ring_size
+
+    def get(self, key):
+        """
+        Look up a value.
+
+        Args:
+            key: bytes, or a tuple of str/int values (encoded with repr)
+
+        Returns:
+            The stored value, or None if missing or already overwritten
+        """
+        key = _key_digest(key)
+        key_hash = _key_hash(key)
+        data = None
+
+        with self._lock:
+            (written,) = HEADER.unpack_from(self._map, 0)
+            for offset in self._slot_offsets(key_hash):
+                slot_hash, position, _ = SLOT.unpack_from(self._map, offset)
+                if slot_hash != key_hash or not self._is_live(position, written):
+                    continue
+                start = self._data_offset + (position - 1) % self.ring_size
+                (value_len,) = RECORD.unpack_from(self._map, start)
+                start += RECORD.size
+                if self._map[start : start + KEY_DIGEST_SIZE] != key:
+                    continue
+                start += KEY_DIGEST_SIZE
+                data = self._map[start : start + value_len]
+                break
+
+        record_cache_lookups("shared", data is not None, data is None)
+        return None if data is None else pickle.loads(data)
+
+    def put(self, key, value):
+        """
+        Store a value, replacing any previous value for key.
+
+        Returns:
+            False if the pickled value is too large to be shared
+        """
+        key = _key_digest(key)
+        key_hash = _key_hash(key)
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        # Keep records 8-byte aligned
+        length = (RECORD.size + len(key) + len(data) + 7) & ~7
+        if length > self.max_record_bytes:
+            return False
+
+        with self._lock:
+            (written,) = HEADER.unpack_from(self._map, 0)
+            start = written % self.ring_size
+            if start + length > self.ring_size:
+                # Records never wrap; skip the tail of the ring
+                written += self.ring_size - start
+                start = 0
+
+            offset = self._data_offset + start
+            RECORD.pack_into(self._map, offset, len(data))
+            offset += RECORD.size
+            self._map[offset : offset + len(key)] = key
+            offset += len(key)
+            self._map[offset : offset + len(data)] = data
+
+            # Reuse the key's slot, else a free or stale one, else the oldest.
+            # The key must end up in exactly one slot, or a later get could
+            # find a superseded copy further along the probe sequence.
+            end = written + length
+            slots = [
+                (slot_offset, *SLOT.unpack_from(self._map, slot_offset))
+                for slot_offset in self._slot_offsets(key_hash)
+            ]
+            matching = [slot[0] for slot in slots if slot[1] == key_hash]
+            if matching:
+                target = matching[0]
+                for slot_offset in matching[1:]:
+                    SLOT.pack_into(self._map, slot_offset, 0, 0, 0)
+            else:
+                free = [slot[0] for slot in slots if not self._is_live(slot[2], end)]
+                if free:
+                    target = free[0]
+                else:
+                    target = min(slots, key=lambda slot: slot[2])[0]
+
+            SLOT.pack_into(self._map, target, key_hash, written + 1, length)
+            HEADER.pack_into(self._map, 0, written + length)
+        return True
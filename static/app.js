@@ -343,7 +343,7 @@ async function switchNetwork() {
                             symbol: 'ETH',
                             decimals: 18
                         },
-                        rpcUrls: [config.rpc],
+                        rpcUrls: config.rpcUrls || [config.rpc],
                         blockExplorerUrls: [config.blockExplorerUrl]
                     }],
                 });
@@ -627,6 +627,7 @@ async function lockTokens(e) {
         await waitForTransaction(txHash);
 
         showTxStatus('Tokens locked successfully! An NFT has been minted to represent your lock.', 'success');
+        refreshShownLocks();
 
         document.getElementById('lockForm').reset();
         document.getElementById('lockBtn').disabled = true;
@@ -847,39 +848,53 @@ async function batchApproveAllTokens() {
     }
 
     try {
-        showTxStatus(`Approving ${approvals.length} token(s)...`);
-
-        for (let i = 0; i < approvals.length; i++) {
-            const approval = approvals[i];
-            showTxStatus(`Approving ${approval.symbol} (${i + 1}/${approvals.length})...`);
-
-            const response = await fetch(`/api/${currentChain}/encode/approve`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    token: approval.tokenAddress,
-                    amount: approval.amount
-                })
-            });
+        showTxStatus('Checking current allowances...');
 
-            const result = await response.json();
+        // One request encodes every approval still needed for the lock plan
+        const beneficiary = document.getElementById('batchBeneficiary').value || userAddress;
+        const periodValue = parseInt(document.getElementById('batchLockPeriodValue').value) || 0;
+        const periodUnit = parseInt(document.getElementById('batchLockPeriodUnit').dataset.value) || 1;
 
-            if (!result.success) {
-                throw new Error(result.error);
-            }
+        const response = await fetch(`/api/${currentChain}/encode/lock-plan`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                tokenAddresses: approvals.map(a => a.tokenAddress),
+                amounts: approvals.map(a => a.amount),
+                lockPeriod: periodValue * periodUnit,
+                beneficiary: beneficiary,
+                owner: userAddress
+            })
+        });
+
+        const result = await response.json();
+
+        if (!result.success) {
+            throw new Error(result.error);
+        }
+
+        const approveTxs = result.transactions.filter(tx => tx.type === 'approve');
+        const symbols = {};
+        for (const approval of approvals) {
+            symbols[approval.tokenAddress.toLowerCase()] = approval.symbol;
+        }
+
+        for (let i = 0; i < approveTxs.length; i++) {
+            const tx = approveTxs[i];
+            const symbol = symbols[tx.token.toLowerCase()] || tx.token;
 
-            showTxStatus(`Please confirm ${approval.symbol} approval in your wallet...`);
+            showTxStatus(`Please confirm ${symbol} approval in your wallet (${i + 1}/${approveTxs.length})...`);
 
             const txHash = await window.ethereum.request({
                 method: 'eth_sendTransaction',
                 params: [{
                     from: userAddress,
-                    to: result.to,
-                    data: result.data
+                    to: tx.to,
+                    data: tx.data
                 }]
             });
 
-            showTxStatus(`${approval.symbol} approval submitted! Waiting for confirmation...`);
+            showTxStatus(`${symbol} approval submitted! Waiting for confirmation...`);
             await waitForTransaction(txHash);
         }
 
@@ -978,6 +993,7 @@ async function batchLockMultipleTokens(e) {
         await waitForTransaction(txHash);
 
         showTxStatus(`${tokenAddresses.length} token(s) locked successfully! An NFT has been minted.`, 'success');
+        refreshShownLocks();
 
         // Reset form
         document.getElementById('batchLockForm').reset();
@@ -1025,14 +1041,53 @@ async function viewLocks() {
     list.innerHTML = '';
 
     try {
-        const response = await fetch(`/api/${currentChain}/all-locks/${userAddress}`);
-        const result = await response.json();
+        // Stream one lock per line (NDJSON) and render as locks arrive
+        const response = await fetch(`/api/${currentChain}/all-locks/${userAddress}?format=ndjson&sorted=true`);
 
-        if (!result.success) {
+        if (!response.ok) {
+            const result = await response.json();
             throw new Error(result.error);
         }
 
-        displayAllLocks(result.locks, result.tokenCount);
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        const locks = [];
+        const tokens = new Set();
+        let buffer = '';
+        let finished = false;
+
+        while (!finished) {
+            const { value, done } = await reader.read();
+            buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                const item = JSON.parse(line);
+
+                if (item.success === false) {
+                    throw new Error(item.error);
+                }
+                if (item.done) {
+                    finished = true;
+                    break;
+                }
+
+                locks.push(item);
+                item.tokens.forEach(token => tokens.add(token.token.toLowerCase()));
+            }
+
+            if (locks.length > 0 || finished) {
+                displayAllLocks(locks, tokens.size);
+            }
+            if (done) break;
+        }
+
+        if (!finished) {
+            throw new Error('Lock stream ended unexpectedly');
+        }
 
     } catch (error) {
         console.error('Failed to fetch locks:', error);
@@ -1145,7 +1200,6 @@ async function claimLock(tokenId) {
 
         showTxStatus('Tokens claimed successfully! The lock NFT has been burned.', 'success');
 
-        // Refresh the locks view
         viewLocks();
 
     } catch (error) {
@@ -1154,7 +1208,45 @@ async function claimLock(tokenId) {
     }
 }
 
+// Event streams hold a server thread each, so one is open only while a
+// transaction is pending and views are refreshed once it is mined
 async function waitForTransaction(txHash) {
+    // The server pushes the receipt from its shared per-chain head poller
+    if (!window.EventSource) {
+        return pollForReceipt(txHash);
+    }
+
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(`/api/${currentChain}/events?tx=${txHash}`);
+
+        source.addEventListener('receipt', (event) => {
+            const receipt = JSON.parse(event.data);
+            if (receipt.txHash !== txHash.toLowerCase()) return;
+
+            source.close();
+            if (receipt.status === 'success') {
+                resolve(receipt);
+            } else {
+                reject(new Error('Transaction failed'));
+            }
+        });
+
+        source.onerror = () => {
+            // Closed for good (e.g. server refused the stream): poll the wallet instead
+            if (source.readyState === EventSource.CLOSED) {
+                pollForReceipt(txHash).then(resolve, reject);
+            }
+        };
+    });
+}
+
+function refreshShownLocks() {
+    if (document.getElementById('locksSummary').classList.contains('show')) {
+        viewLocks();
+    }
+}
+
+async function pollForReceipt(txHash) {
     return new Promise((resolve, reject) => {
         const checkReceipt = async () => {
             try {
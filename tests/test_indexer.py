@@ -0,0 +1,230 @@
+import json
+from types import SimpleNamespace
+
+from web3 import Web3
+
+from indexer import (
+    TOKENS_CLAIMED_TOPIC,
+    TOKENS_LOCKED_TOPIC,
+    TRANSFER_TOPIC,
+    ZERO_ADDRESS,
+    LockIndex,
+    LockIndexer,
+)
+
+CHAIN_ID = 1
+ALICE = Web3.to_checksum_address("0x" + "a1" * 20)
+BOB = Web3.to_checksum_address("0x" + "b2" * 20)
+TOKEN = Web3.to_checksum_address("0x" + "c3" * 20)
+
+with open("ABIs/HODLMONSTERNFT_ABI.json", "r") as f:
+    ABI = json.load(f)
+
+
+def _address_topic(address):
+    return bytes(12) + bytes.fromhex(address[2:])
+
+
+def _uint_topic(value):
+    return value.to_bytes(32, "big")
+
+
+def _log(block_number, log_index, topics, data=b""):
+    return {
+        "blockNumber": block_number,
+        "logIndex": log_index,
+        "topics": topics,
+        "data": data,
+        "transactionHash": bytes(32),
+    }
+
+
+def mint(block_number, log_index, to, token_id):
+    return _log(
+        block_number,
+        log_index,
+        [TRANSFER_TOPIC, _address_topic(ZERO_ADDRESS), _address_topic(to), _uint_topic(token_id)],
+    )
+
+
+def transfer(block_number, log_index, sender, to, token_id):
+    return _log(
+        block_number,
+        log_index,
+        [TRANSFER_TOPIC, _address_topic(sender), _address_topic(to), _uint_topic(token_id)],
+    )
+
+
+def locked(block_number, log_index, beneficiary, token_id, unlock_time, token_count=1):
+    return _log(
+        block_number,
+        log_index,
+        [TOKENS_LOCKED_TOPIC, _address_topic(beneficiary), _uint_topic(token_id)],
+        _uint_topic(unlock_time) + _uint_topic(token_count),
+    )
+
+
+def claimed(block_number, log_index, claimer, token_id, token_count=1):
+    return _log(
+        block_number,
+        log_index,
+        [TOKENS_CLAIMED_TOPIC, _address_topic(claimer), _uint_topic(token_id)],
+        _uint_topic(token_count),
+    )
+
+
+def _owned(index, owner):
+    return sorted(lock["token_id"] for lock in index.get_owner_locks(CHAIN_ID, owner))
+
+
+def test_apply_logs_tracks_locks_owners_and_claims(tmp_path):
+    index = LockIndex(str(tmp_path / "locks.sqlite3"))
+    index.apply_logs(
+        CHAIN_ID,
+        [
+            # Out of order on purpose; apply_logs sorts by block and log index
+            locked(10, 1, ALICE, 1, 1000),
+            mint(10, 0, ALICE, 1),
+            mint(11, 0, ALICE, 2),
+            locked(11, 1, ALICE, 2, 2000),
+        ],
+        11,
+        "0x11",
+    )
+    assert index.get_cursor(CHAIN_ID) == (11, "0x11")
+    assert index.pending_details(CHAIN_ID, 10) == [1, 2]
+    # Not served until token amounts are loaded
+    assert index.get_owner_locks(CHAIN_ID, ALICE) is None
+
+    index.store_details(CHAIN_ID, {1: [(TOKEN, 5)], 2: [(TOKEN, 7)]})
+    assert _owned(index, ALICE) == [1, 2]
+    assert index.get_lock(CHAIN_ID, 2) == {
+        "tokens_data": [(TOKEN, 7)],
+        "unlock_time": 2000,
+        "claimed": False,
+        "owner": ALICE,
+    }
+
+    index.apply_logs(
+        CHAIN_ID,
+        [transfer(12, 0, ALICE, BOB, 2), claimed(13, 0, ALICE, 1)],
+        13,
+        "0x13",
+    )
+    assert _owned(index, ALICE) == []
+    assert _owned(index, BOB) == [2]
+    assert index.get_lock(CHAIN_ID, 1)["claimed"] is True
+
+
+def test_rewind_undoes_blocks_above_the_target(tmp_path):
+    index = LockIndex(str(tmp_path / "locks.sqlite3"))
+    index.apply_logs(CHAIN_ID, [mint(10, 0, ALICE, 1), locked(10, 1, ALICE, 1, 1000)], 10, "0x10")
+    index.apply_logs(
+        CHAIN_ID,
+        [
+            transfer(12, 0, ALICE, BOB, 1),
+            claimed(13, 0, BOB, 1),
+            mint(13, 1, BOB, 2),
+            locked(13, 2, BOB, 2, 2000),
+        ],
+        13,
+        "0x13",
+    )
+    index.store_details(CHAIN_ID, {1: [(TOKEN, 5)], 2: [(TOKEN, 7)]})
+
+    index.rewind(CHAIN_ID, 11)
+
+    assert index.get_cursor(CHAIN_ID)[0] == 11
+    assert index.get_lock(CHAIN_ID, 2) is None
+    lock = index.get_lock(CHAIN_ID, 1)
+    assert lock["claimed"] is False
+    assert lock["owner"] == ALICE
+    assert _owned(index, ALICE) == [1]
+    assert _owned(index, BOB) == []
+
+
+class CannedChain:
+    """Stand-in for w3.eth that serves canned logs and block hashes"""
+
+    def __init__(self):
+        self.block_number = 0
+        self.logs = []
+        self.hashes = {}
+
+    def get_block(self, block_number):
+        return {"hash": self.hashes.get(block_number, _uint_topic(block_number))}
+
+    def get_logs(self, params):
+        return [
+            log
+            for log in self.logs
+            if params["fromBlock"] <= log["blockNumber"] <= params["toBlock"]
+        ]
+
+
+class FakeHead:
+    def __init__(self, block_number):
+        self.block_number = block_number
+
+    def is_fresh(self):
+        return True
+
+
+def _indexer(tmp_path, eth, head, **kwargs):
+    contract = SimpleNamespace(
+        abi=ABI,
+        address=ZERO_ADDRESS,
+        functions=SimpleNamespace(
+            getLockDetails=lambda token_id: SimpleNamespace(
+                call=lambda: ([(TOKEN, token_id)], 0, False)
+            )
+        ),
+    )
+    chain_data = {
+        "config": {"chainId": CHAIN_ID, "route": "test"},
+        "w3": SimpleNamespace(eth=eth),
+        "contract": contract,
+        "head": head,
+    }
+    index = LockIndex(str(tmp_path / "locks.sqlite3"))
+    return LockIndexer(chain_data, index, confirmations=2, **kwargs)
+
+
+def test_sync_rewinds_and_reindexes_after_a_reorg(tmp_path):
+    eth = CannedChain()
+    eth.block_number = 10
+    eth.logs = [
+        mint(5, 0, ALICE, 1),
+        locked(5, 1, ALICE, 1, 1000),
+        mint(9, 0, ALICE, 2),
+        locked(9, 1, ALICE, 2, 2000),
+    ]
+    indexer = _indexer(tmp_path, eth, FakeHead(10))
+    indexer.sync_once()
+    assert _owned(indexer.index, ALICE) == [1, 2]
+
+    # Block 9 is replaced: lock 2 now goes to Bob, and block 10 gets a new hash
+    eth.logs = eth.logs[:2] + [mint(9, 0, BOB, 2), locked(9, 1, BOB, 2, 2000)]
+    eth.hashes = {9: b"\x01" * 32, 10: b"\x02" * 32}
+    eth.block_number = 11
+    indexer.sync_once()
+
+    assert indexer.index.get_cursor(CHAIN_ID)[0] == 11
+    assert _owned(indexer.index, ALICE) == [1]
+    assert _owned(indexer.index, BOB) == [2]
+
+
+def test_is_fresh_compares_the_cursor_with_the_head(tmp_path):
+    eth = CannedChain()
+    eth.block_number = 10
+    head = FakeHead(10)
+    indexer = _indexer(tmp_path, eth, head, max_lag_blocks=1)
+    assert not indexer.is_fresh()
+
+    indexer.sync_once()
+    assert indexer.is_fresh()
+    head.block_number = 11
+    assert indexer.is_fresh()
+    # A new lock in block 12 is not in the index yet
+    head.block_number = 12
+    assert not indexer.is_fresh()
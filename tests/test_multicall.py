@@ -0,0 +1,149 @@
+import asyncio
+
+import aiohttp
+from eth_abi import decode as abi_decode
+from eth_abi import encode as abi_encode
+
+from multicall import MulticallExecutor, RpcBatchExecutor, _is_too_large
+from rpc import RpcError, run_sync
+
+
+def _http_error(status):
+    return aiohttp.ClientResponseError(None, (), status=status)
+
+
+def test_size_and_gas_rejections_are_split():
+    assert _is_too_large(_http_error(413))
+    assert _is_too_large(RpcError(-32000, "out of gas"))
+    assert _is_too_large(RpcError(-32000, "response size exceeded"))
+
+
+def test_timeouts_and_other_errors_are_not_split():
+    assert not _is_too_large(asyncio.TimeoutError())
+    assert not _is_too_large(RpcError(-32000, "request timed out"))
+    assert not _is_too_large(RpcError(429, "rate limit exceeded"))
+    assert not _is_too_large(_http_error(502))
+    assert not _is_too_large(aiohttp.ClientConnectionError())
+
+
+def _calls(count, data_bytes=4):
+    """Distinct calls, each with data_bytes of calldata"""
+    return [
+        ("0x" + f"{i + 1:040x}", "0x" + f"{i:08x}" * (data_bytes // 4))
+        for i in range(count)
+    ]
+
+
+def test_chunks_follow_the_call_count_budget():
+    executor = MulticallExecutor(None, None, max_calls=3)
+    calls = _calls(10)
+    chunks = executor.chunk(calls)
+    assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+    assert [call for chunk in chunks for call in chunk] == calls
+
+
+def test_chunks_follow_the_calldata_budget():
+    executor = MulticallExecutor(None, None, max_calldata_bytes=10)
+    calls = _calls(5) + _calls(1, data_bytes=16) + _calls(2)
+    chunks = executor.chunk(calls)
+    # A call larger than the budget still gets a chunk of its own
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1, 1, 2]
+    assert [call for chunk in chunks for call in chunk] == calls
+
+
+def test_chunks_follow_the_gas_budget():
+    executor = MulticallExecutor(None, None, max_gas=300_000, gas_per_call=60_000)
+    chunks = executor.chunk(_calls(12))
+    assert [len(chunk) for chunk in chunks] == [5, 5, 2]
+
+
+class FakeMulticallRpc:
+    """
+    Multicall3 node that rejects aggregate3 calls over max_calls with 413.
+
+    Each subcall returns its own calldata; smaller chunks answer faster, so
+    split halves complete out of order.
+    """
+
+    name = "fake"
+
+    def __init__(self, max_calls):
+        self.max_calls = max_calls
+        self.requests = 0
+
+    async def eth_call(self, to, data, block="latest"):
+        self.requests += 1
+        (structs,) = abi_decode(["(address,bool,bytes)[]"], data[4:])
+        if len(structs) > self.max_calls:
+            raise _http_error(413)
+        await asyncio.sleep(0.001 * (len(structs) + int(structs[0][2].hex(), 16) % 3))
+        results = [(True, call_data) for _, _, call_data in structs]
+        return abi_encode(["(bool,bytes)[]"], [results])
+
+
+def test_split_chunks_return_results_in_call_order():
+    rpc = FakeMulticallRpc(max_calls=2)
+    executor = MulticallExecutor(rpc, "0x" + "00" * 20, max_calls=8)
+    calls = _calls(16)
+    results = run_sync(executor.aggregate3(calls))
+    assert results == [(True, bytes.fromhex(data[2:])) for _, data in calls]
+    # Two chunks of 8, each split 8 -> 4 + 4 -> 2 + 2 + 2 + 2
+    assert rpc.requests == 2 * (1 + 2 + 4)
+
+
+class FakeBatchRpc:
+    """RPC client whose batch requests fail with a given error"""
+
+    name = "fake"
+
+    def __init__(self, batch_error):
+        self.batch_error = batch_error
+        self.batches = 0
+        self.single_calls = 0
+
+    async def _batch(self, requests):
+        self.batches += 1
+        if self.batch_error:
+            raise self.batch_error
+        return ["0x01"] * len(requests)
+
+    async def eth_call(self, to, data, block="latest"):
+        self.single_calls += 1
+        return b"\x01"
+
+
+CALLS = [("0x" + "00" * 20, "0x12345678")] * 4
+
+
+def test_batches_are_disabled_only_when_unsupported():
+    rpc = FakeBatchRpc(RpcError(-32601, "the method batch does not exist"))
+    executor = RpcBatchExecutor(rpc, batch_cooldown=60)
+    assert run_sync(executor.eth_calls(CALLS)) == [b"\x01"] * 4
+    assert not executor.batch_supported
+
+    # Later requests skip batching until the cooldown has passed
+    run_sync(executor.eth_calls(CALLS))
+    assert rpc.batches == 1
+    executor.batch_disabled_until = 0
+    rpc.batch_error = None
+    run_sync(executor.eth_calls(CALLS))
+    assert rpc.batches == 2
+
+
+def test_other_batch_errors_fail_without_disabling_batches():
+    error = RpcError(-32603, "internal error")
+    rpc = FakeBatchRpc(error)
+    executor = RpcBatchExecutor(rpc)
+    assert run_sync(executor.eth_calls(CALLS)) == [error] * 4
+    assert executor.batch_supported
+    assert rpc.single_calls == 0
+
+
+def test_too_large_batches_are_split():
+    rpc = FakeBatchRpc(_http_error(413))
+    executor = RpcBatchExecutor(rpc)
+    assert run_sync(executor.eth_calls(CALLS)) == [b"\x01"] * 4
+    assert executor.batch_supported
+    # 4 -> 2 + 2 -> singles
+    assert rpc.batches == 3
+    assert rpc.single_calls == 4
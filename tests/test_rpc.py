@@ -0,0 +1,183 @@
+import asyncio
+import time
+
+import aiohttp
+
+import rpc
+from multicall import RpcBatchExecutor
+from rpc import (
+    AsyncRpcClient,
+    RpcEndpoint,
+    RpcError,
+    RpcPool,
+    is_rate_limited,
+    run_sync,
+)
+
+TARGET = "0x" + "00" * 20
+HEADER_NOT_FOUND = {"code": -32000, "message": "header not found"}
+
+
+class FakeClient(AsyncRpcClient):
+    """
+    AsyncRpcClient answering from a list of canned errors, then "0x01".
+
+    An error is a JSON-RPC error object, or an exception to raise instead.
+    """
+
+    def __init__(self, name="fake", errors=(), delay=0):
+        super().__init__(f"http://{name}", name=name)
+        self.errors = list(errors)
+        self.delay = delay
+        self.requests = 0
+
+    async def _post(self, payload):
+        self.requests += 1
+        await asyncio.sleep(self.delay)
+        if self.errors:
+            error = self.errors.pop(0)
+            if isinstance(error, Exception):
+                raise error
+            return {"jsonrpc": "2.0", "id": payload["id"], "error": error}
+        return {"jsonrpc": "2.0", "id": payload["id"], "result": "0x01"}
+
+
+def test_rate_limits_are_matched_by_code_or_phrase():
+    assert is_rate_limited(RpcError(429, "slow down"))
+    assert is_rate_limited(RpcError(-32005, "limit exceeded"))
+    assert is_rate_limited(RpcError(-32000, "Rate limit exceeded"))
+    assert is_rate_limited(RpcError(-32000, "Too Many Requests"))
+    for message in ("cannot generate trace", "iterate", "inaccurate", "separate"):
+        assert not is_rate_limited(RpcError(-32000, message))
+
+
+def _pool(*clients, **kwargs):
+    pool = RpcPool([client.url for client in clients], **kwargs)
+    for endpoint, client in zip(pool.endpoints, clients):
+        endpoint.client = client
+    return pool
+
+
+def test_pinned_call_is_retried_while_the_backend_lags(monkeypatch):
+    monkeypatch.setattr(rpc, "UNKNOWN_BLOCK_RETRY_DELAY", 0)
+    client = FakeClient(errors=[HEADER_NOT_FOUND, HEADER_NOT_FOUND])
+    assert run_sync(client.eth_call(TARGET, "0x12", 100)) == b"\x01"
+    assert client.requests == 3
+
+
+def test_pinned_call_gives_up_after_the_retries(monkeypatch):
+    monkeypatch.setattr(rpc, "UNKNOWN_BLOCK_RETRY_DELAY", 0)
+    client = FakeClient(errors=[HEADER_NOT_FOUND] * 5)
+    try:
+        run_sync(client.eth_call(TARGET, "0x12", 100))
+    except RpcError as e:
+        assert rpc.is_unknown_block(e)
+    else:
+        raise AssertionError("expected an RpcError")
+    assert client.requests == 1 + rpc.UNKNOWN_BLOCK_RETRIES
+
+
+def test_pool_fails_over_from_an_endpoint_behind_the_pinned_block():
+    lagging = FakeClient("lagging", errors=[HEADER_NOT_FOUND])
+    synced = FakeClient("synced")
+    pool = _pool(lagging, synced)
+    assert run_sync(pool.eth_call(TARGET, "0x12", 100)) == b"\x01"
+    assert (lagging.requests, synced.requests) == (1, 1)
+    assert pool.endpoints[0].consecutive_errors == 1
+
+
+class LaggingBatchRpc:
+    """Batch replies with "header not found" items; single calls succeed"""
+
+    name = "fake"
+
+    def __init__(self):
+        self.single_calls = 0
+
+    async def _batch(self, requests):
+        return [RpcError(**HEADER_NOT_FOUND) if i % 2 else "0x02" for i in range(len(requests))]
+
+    async def eth_call(self, to, data, block="latest"):
+        self.single_calls += 1
+        return b"\x01"
+
+
+def test_batch_items_behind_the_pinned_block_are_sent_again():
+    batch_rpc = LaggingBatchRpc()
+    executor = RpcBatchExecutor(batch_rpc)
+    results = run_sync(executor.eth_calls([(TARGET, "0x12")] * 4, 100))
+    assert results == [b"\x02", b"\x01", b"\x02", b"\x01"]
+    assert batch_rpc.single_calls == 2
+
+
+def test_pool_fails_over_on_transport_errors():
+    down = FakeClient("down", errors=[aiohttp.ClientConnectionError()])
+    up = FakeClient("up")
+    pool = _pool(down, up)
+    assert run_sync(pool.request("eth_blockNumber", [])) == "0x01"
+    assert (down.requests, up.requests) == (1, 1)
+    assert pool.endpoints[0].consecutive_errors == 1
+
+
+def test_pool_does_not_fail_over_on_reverts():
+    revert = {"code": 3, "message": "execution reverted"}
+    reverting = FakeClient("reverting", errors=[revert])
+    other = FakeClient("other")
+    pool = _pool(reverting, other)
+    try:
+        run_sync(pool.eth_call(TARGET, "0x12", 100))
+    except RpcError as e:
+        assert e.is_revert
+    else:
+        raise AssertionError("expected an RpcError")
+    assert other.requests == 0
+    # The endpoint answered, so it stays healthy
+    assert pool.endpoints[0].consecutive_errors == 0
+
+
+def test_pool_hedges_reads_slower_than_the_p95():
+    slow = FakeClient("slow", delay=2)
+    fast = FakeClient("fast")
+    pool = _pool(slow, fast, hedge=True)
+    pool.endpoints[0].samples.extend([0.01] * 20)
+
+    started = time.monotonic()
+    assert run_sync(pool.request("eth_blockNumber", [])) == "0x01"
+    assert time.monotonic() - started < 1
+    assert (slow.requests, fast.requests) == (1, 1)
+
+
+def test_pool_does_not_hedge_writes():
+    slow = FakeClient("slow", delay=0.2)
+    fast = FakeClient("fast")
+    pool = _pool(slow, fast, hedge=True)
+    pool.endpoints[0].samples.extend([0.01] * 20)
+    run_sync(pool.request("eth_sendRawTransaction", ["0x00"]))
+    assert fast.requests == 0
+
+
+def test_endpoints_are_ranked_by_score_and_cooled_down_after_errors():
+    first, second, third = (
+        RpcEndpoint(AsyncRpcClient(f"http://{name}")) for name in ("a", "b", "c")
+    )
+    pool = RpcPool(["http://a", "http://b", "http://c"])
+    pool.endpoints = [first, second, third]
+    first.record_success(0.3)
+    second.record_success(0.1)
+    third.record_success(0.2)
+    assert pool.ranked() == [second, third, first]
+
+    # Errors raise the score before the endpoint is taken out of rotation
+    second.record_error()
+    assert second.is_healthy()
+    assert pool.ranked()[-1] is second
+    second.record_error()
+    second.record_error()
+    assert not second.is_healthy()
+    assert pool.ranked() == [third, first, second]
+
+    # A success resets the error streak and decays the error rate
+    error_rate = second.error_rate
+    second.record_success(0.1)
+    assert second.consecutive_errors == 0
+    assert second.error_rate < error_rate
@@ -0,0 +1,95 @@
+import os
+import random
+
+from shared_cache import SharedCache, _key_digest, _key_hash
+
+
+def _key_at(cache, home, prefix):
+    """A key whose first probe is slot home"""
+    for i in range(100000):
+        key = (prefix, i)
+        if _key_hash(_key_digest(key)) % cache.slots == home:
+            return key
+    raise AssertionError("no key found")
+
+
+def test_put_get_roundtrip():
+    cache = SharedCache(1 << 16, slots=64)
+    cache.put(("token", 1, "0xabc"), {"symbol": "X"})
+    assert cache.get(("token", 1, "0xabc")) == {"symbol": "X"}
+    assert cache.get(("token", 1, "0xdef")) is None
+
+
+def test_overwrite_returns_latest_value():
+    cache = SharedCache(1 << 16, slots=64)
+    rng = random.Random(0)
+    latest = {}
+    for version in range(5000):
+        key = ("k", rng.randrange(40))
+        cache.put(key, version)
+        latest[key] = version
+        for known, value in latest.items():
+            # Evicted keys may miss, but never return a superseded value
+            assert cache.get(known) in (None, value)
+
+
+def test_overwrite_never_leaves_a_stale_copy_in_another_slot():
+    cache = SharedCache(1 << 16, slots=64)
+    filler = "f" * 4000
+    key_b = _key_at(cache, 10, "b")
+    key_a = _key_at(cache, 10, "a")
+    fillers = iter(_key_at(cache, home, "filler") for home in range(30, 60))
+
+    cache.put(key_b, "b")
+    for _ in range(8):
+        cache.put(next(fillers), filler)
+    # Slot 10 holds key_b, so key_a lands in slot 11
+    cache.put(key_a, 1)
+    while cache.get(key_b) is not None:
+        cache.put(next(fillers), filler)
+    assert cache.get(key_a) == 1
+
+    # Slot 10 is stale now; the new value must replace key_a's slot 11
+    cache.put(key_a, 2)
+    for home in (7, 8, 9):
+        cache.put(_key_at(cache, home, "n"), "n")
+    # Probes 7..10 are all live: the oldest (slot 10 if key_a is there) goes
+    cache.put(_key_at(cache, 7, "c"), "c")
+    assert cache.get(key_a) in (None, 2)
+
+
+def test_wrap_around_evicts_oldest_records():
+    cache = SharedCache(1 << 16, slots=1024)
+    for i in range(5000):
+        cache.put(("k", i), "v" * (i % 300))
+    assert cache.get(("k", 0)) is None
+    assert cache.get(("k", 4999)) == "v" * (4999 % 300)
+    for i in range(5000):
+        value = cache.get(("k", i))
+        assert value is None or value == "v" * (i % 300)
+
+
+def test_keys_of_any_length_are_stored():
+    cache = SharedCache(1 << 16, slots=64)
+    key = ("tokens-batch", ("0x" + "ab" * 20,) * 2000, None)
+    assert cache.put(key, "v")
+    assert cache.get(key) == "v"
+    assert cache.get(key[:2]) is None
+
+
+def test_rejects_values_larger_than_an_eighth_of_the_ring():
+    cache = SharedCache(1 << 16, slots=64)
+    assert cache.put("big", b"0" * (1 << 14)) is False
+    assert cache.get("big") is None
+
+
+def test_forked_child_shares_the_map():
+    cache = SharedCache(1 << 16, slots=64)
+    cache.put("parent", 1)
+    pid = os.fork()
+    if pid == 0:
+        ok = cache.get("parent") == 1 and cache.put("child", 2)
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert status == 0
+    assert cache.get("child") == 2
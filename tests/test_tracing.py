@@ -0,0 +1,25 @@
+import os
+
+from tracing import finish_trace, span, start_trace
+
+
+def _write_trace(trace_dir, max_files):
+    token = start_trace("GET /api/test")
+    with span("phase"):
+        pass
+    return finish_trace(token, str(trace_dir), max_files)
+
+
+def test_finish_trace_keeps_only_the_newest_files(tmp_path):
+    traces = []
+    for i in range(5):
+        trace = _write_trace(tmp_path, max_files=3)
+        # Distinct mtimes, oldest first
+        os.utime(tmp_path / f"{trace.id}.json", (i, i))
+        traces.append(trace)
+    _write_trace(tmp_path, max_files=3)
+
+    names = set(os.listdir(tmp_path))
+    assert len(names) == 3
+    assert f"{traces[0].id}.json" not in names
+    assert f"{traces[-1].id}.json" in names
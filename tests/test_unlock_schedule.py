@@ -0,0 +1,74 @@
+from unlock_schedule import UnlockSchedule, UnlockScanner
+
+OWNER = "0x" + "a1" * 20
+TOKEN = "0x" + "c3" * 20
+
+
+def _state(unlock_time, claimed=False, owner=OWNER):
+    return {
+        "tokens_data": [(TOKEN, 5)],
+        "unlock_time": unlock_time,
+        "claimed": claimed,
+        "owner": owner,
+    }
+
+
+def test_apply_orders_locks_and_drops_claimed_and_burned(tmp_path):
+    schedule = UnlockSchedule(str(tmp_path / "unlocks.sqlite3"), 1)
+    schedule.apply([1, 2, 3], {1: _state(300), 2: _state(100), 3: _state(200)})
+    locks, total = schedule.between(0, 1000, 10)
+    assert [lock["tokenId"] for lock in locks] == [2, 3, 1]
+    assert total == 3
+
+    schedule.apply([1, 2], {1: _state(300, claimed=True), 2: _state(100, owner=None)})
+    assert schedule.unclaimed_ids() == [3]
+
+
+def test_apply_keeps_locks_whose_read_failed(tmp_path):
+    schedule = UnlockSchedule(str(tmp_path / "unlocks.sqlite3"), 1)
+    schedule.apply([1, 2], {1: _state(100), 2: _state(200)})
+
+    unread = schedule.apply([1, 2], {2: _state(200)})
+
+    assert unread == [1]
+    assert sorted(schedule.unclaimed_ids()) == [1, 2]
+
+
+class FakeHead:
+    async def current_block(self):
+        return 50
+
+
+class FakeRpc:
+    def __init__(self, next_token_id):
+        self.next_token_id = next_token_id
+
+    async def eth_call(self, to, data, block):
+        return self.next_token_id.to_bytes(32, "big")
+
+
+def test_scanner_retries_ids_whose_read_failed(tmp_path):
+    failing = {2}
+    reads = []
+
+    async def fetch_states(chain_data, token_ids, block):
+        reads.append(list(token_ids))
+        return {i: _state(i * 100) for i in token_ids if i not in failing}
+
+    chain_data = {
+        "key": "test",
+        "head": FakeHead(),
+        "rpc": FakeRpc(4),
+        "contract_address": "0x" + "00" * 20,
+    }
+    schedule = UnlockSchedule(str(tmp_path / "unlocks.sqlite3"), 1)
+    scanner = UnlockScanner(chain_data, fetch_states, schedule)
+    assert schedule.last_scan() is None
+    scanner.scan_once()
+    assert sorted(schedule.unclaimed_ids()) == [1, 3]
+    assert schedule.last_scan()[0] == 50
+
+    failing.clear()
+    scanner.scan_once()
+    assert reads[-1] == [1, 2, 3]
+    assert sorted(schedule.unclaimed_ids()) == [1, 2, 3]
@@ -0,0 +1,194 @@
+"""
+Two-tier ERC20 metadata cache.
+
+symbol(), decimals() and name() never change for a deployed token, so they are
+cached per (chainId, address) in a bounded in-process LRU backed by a SQLite
+file that survives restarts. Addresses that are not ERC20 tokens are cached
+too (negatively), with a TTL in case a contract is deployed there later.
+Under serve.py an optional SharedCache sits between the two tiers, so a
+token fetched by one worker is in memory for every worker.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import record_cache_lookups
+
+METADATA_FIELDS = ("symbol", "decimals", "name")
+
+
+def is_erc20(metadata):
+    """A token counts as ERC20 if at least symbol() or decimals() answered"""
+    return metadata["symbol"] is not None or metadata["decimals"] is not None
+
+
+class TokenMetadataCache:
+    """
+    Token metadata cache keyed by (chainId, address).
+
+    Entries are dicts {"symbol", "decimals", "name"}; a field is None when the
+    corresponding call reverted. Lookups hit the in-memory LRU first, then
+    the shared cache (if any), then SQLite; hits in the lower tiers are
+    promoted into the tiers above.
+    """
+
+    def __init__(self, db_path, max_entries=10000, negative_ttl=3600, shared=None):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self.shared = shared
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS token_metadata (
+                chain_id INTEGER NOT NULL,
+                address TEXT NOT NULL,
+                symbol TEXT,
+                decimals INTEGER,
+                name TEXT,
+                is_erc20 INTEGER NOT NULL,
+                updated_at INTEGER NOT NULL,
+                PRIMARY KEY (chain_id, address)
+            )
+            """
+        )
+        self._db.commit()
+
+    def reopen(self):
+        """
+        Open a new SQLite connection.
+
+        Call in a freshly forked worker; SQLite connections must not be used
+        across fork.
+        """
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+
+    def _expired(self, metadata, updated_at):
+        return not is_erc20(metadata) and time.time() - updated_at > self.negative_ttl
+
+    def _remember(self, key, metadata, updated_at):
+        self._lru[key] = (metadata, updated_at)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def get_many(self, chain_id, addresses):
+        """
+        Look up cached metadata.
+
+        Args:
+            chain_id: Chain ID
+            addresses: Token addresses (any case)
+
+        Returns:
+            Dict address -> metadata for every address found in the cache
+        """
+        found = {}
+        pending = []
+
+        with self._lock:
+            for address in addresses:
+                key = (chain_id, address.lower())
+                entry = self._lru.get(key)
+                if entry and not self._expired(*entry):
+                    self._lru.move_to_end(key)
+                    found[address] = dict(entry[0])
+                else:
+                    pending.append(address)
+
+            if pending and self.shared is not None:
+                still_pending = []
+                for address in pending:
+                    entry = self.shared.get(("token", chain_id, address.lower()))
+                    if entry and not self._expired(*entry):
+                        self._remember((chain_id, address.lower()), *entry)
+                        found[address] = dict(entry[0])
+                    else:
+                        still_pending.append(address)
+                pending = still_pending
+
+            if not pending:
+                record_cache_lookups("token_metadata", len(found))
+                return found
+            memory_hits = len(found)
+
+            placeholders = ",".join("?" for _ in pending)
+            rows = self._db.execute(
+                f"""
+                SELECT address, symbol, decimals, name, updated_at
+                FROM token_metadata
+                WHERE chain_id = ? AND address IN ({placeholders})
+                """,
+                [chain_id] + [a.lower() for a in pending],
+            ).fetchall()
+
+            by_address = {row[0]: row for row in rows}
+            for address in pending:
+                row = by_address.get(address.lower())
+                if not row:
+                    continue
+                metadata = dict(zip(METADATA_FIELDS, row[1:4]))
+                if self._expired(metadata, row[4]):
+                    continue
+                self._remember((chain_id, address.lower()), metadata, row[4])
+                if self.shared is not None:
+                    self.shared.put(
+                        ("token", chain_id, address.lower()), (metadata, row[4])
+                    )
+                found[address] = dict(metadata)
+
+        misses = len(pending) - (len(found) - memory_hits)
+        record_cache_lookups("token_metadata", len(found), misses)
+        return found
+
+    def put_many(self, chain_id, entries):
+        """
+        Store metadata for several tokens.
+
+        Args:
+            chain_id: Chain ID
+            entries: Dict address -> {"symbol", "decimals", "name"}
+        """
+        if not entries:
+            return
+
+        now = int(time.time())
+        rows = []
+        with self._lock:
+            for address, metadata in entries.items():
+                metadata = {field: metadata[field] for field in METADATA_FIELDS}
+                self._remember((chain_id, address.lower()), metadata, now)
+                if self.shared is not None:
+                    self.shared.put(
+                        ("token", chain_id, address.lower()), (metadata, now)
+                    )
+                rows.append(
+                    (
+                        chain_id,
+                        address.lower(),
+                        metadata["symbol"],
+                        metadata["decimals"],
+                        metadata["name"],
+                        int(is_erc20(metadata)),
+                        now,
+                    )
+                )
+
+            self._db.executemany(
+                """
+                INSERT OR REPLACE INTO token_metadata
+                    (chain_id, address, symbol, decimals, name, is_erc20, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+            self._db.commit()
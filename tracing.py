@@ -0,0 +1,268 @@
+"""
+Opt-in per-request tracing.
+
+A request is traced when it sends the X-Hodl-Trace header with the
+configured secret, or is picked by the configured sample rate. While a trace is active, every upstream JSON-RPC
+request, Multicall3 chunk and named route phase is recorded as a span, and
+CPU time spent in ABI encoding and decoding is added up. The current trace
+and span live in context variables, so spans opened in tasks on the shared
+RPC loop still attach to the request that caused them.
+
+Finished traces are summarized in a Server-Timing response header and written
+as Chrome trace-event JSON, which Perfetto (ui.perfetto.dev) and
+chrome://tracing open directly. Only the newest trace files are kept.
+"""
+
+import contextlib
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+TRACE_HEADER = "X-Hodl-Trace"
+
+_current_trace = contextvars.ContextVar("hodl_trace", default=None)
+_current_span = contextvars.ContextVar("hodl_span", default=None)
+
+
+class Span:
+    """One timed operation of a trace"""
+
+    def __init__(self, span_id, parent_id, name, category, attrs):
+        self.id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.category = category
+        self.attrs = attrs
+        self.thread = threading.current_thread().name
+        self.start = time.perf_counter()
+        self.end = None
+
+    @property
+    def duration(self):
+        return (self.end or time.perf_counter()) - self.start
+
+
+class Trace:
+    """Spans and ABI CPU time recorded for one request"""
+
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.finished = None
+        self.spans = []
+        # category -> [cpu seconds, calls]
+        self.cpu = defaultdict(lambda: [0.0, 0])
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add_span(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def add_cpu(self, category, seconds):
+        with self._lock:
+            entry = self.cpu[category]
+            entry[0] += seconds
+            entry[1] += 1
+
+    def server_timing(self):
+        """
+        Server-Timing header value: total time, upstream time per span
+        category, each route phase and ABI CPU time, all in milliseconds.
+        """
+        totals = defaultdict(lambda: [0.0, 0])
+        phases = []
+        for span in self.spans:
+            if span.category == "phase":
+                phases.append(span)
+            else:
+                totals[span.category][0] += span.duration
+                totals[span.category][1] += 1
+
+        total = (self.finished or time.perf_counter()) - self.started
+        entries = [f"total;dur={total * 1000:.2f}"]
+        for category, (seconds, count) in sorted(totals.items()):
+            entries.append(
+                f'{category};dur={seconds * 1000:.2f};desc="{count} requests"'
+            )
+        for span in sorted(phases, key=lambda s: s.start):
+            entries.append(f"{span.name};dur={span.duration * 1000:.2f}")
+        for category, (seconds, count) in sorted(self.cpu.items()):
+            entries.append(
+                f'{category};dur={seconds * 1000:.2f};desc="cpu, {count} calls"'
+            )
+        return ", ".join(entries)
+
+    def to_chrome(self):
+        """Trace as a Chrome trace-event document"""
+
+        def micros(t):
+            return round((t - self.started) * 1_000_000, 1)
+
+        events = [
+            {
+                "name": self.name,
+                "cat": "request",
+                "ph": "X",
+                "ts": 0,
+                "dur": micros(self.finished or time.perf_counter()),
+                "pid": 1,
+                "tid": 0,
+                "args": {"trace_id": self.id},
+            }
+        ]
+        # Complete events on one track are drawn nested, so a span shares a
+        # track only with its own parent; concurrent siblings get extra tracks
+        lanes = []
+        for span in sorted(self.spans, key=lambda s: (s.start, -s.duration)):
+            end = span.start + span.duration
+            for lane, stack in enumerate(lanes):
+                while stack and stack[-1][0] <= span.start:
+                    stack.pop()
+                if not stack or (
+                    stack[-1][1] == span.parent_id and stack[-1][0] >= end
+                ):
+                    stack.append((end, span.id))
+                    break
+            else:
+                lanes.append([(end, span.id)])
+                lane = len(lanes) - 1
+
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": micros(span.start),
+                    "dur": round(span.duration * 1_000_000, 1),
+                    "pid": 1,
+                    "tid": lane + 1,
+                    "args": dict(
+                        span.attrs,
+                        span_id=span.id,
+                        parent_id=span.parent_id,
+                        thread=span.thread,
+                    ),
+                }
+            )
+
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "trace_id": self.id,
+                "request": self.name,
+                "started": self.wall_started,
+                "cpu": {
+                    category: {"ms": round(seconds * 1000, 3), "calls": count}
+                    for category, (seconds, count) in self.cpu.items()
+                },
+            },
+        }
+
+
+def start_trace(name):
+    """
+    Make a new trace current for this context.
+
+    Returns:
+        Context token to pass to finish_trace
+    """
+    return _current_trace.set(Trace(name))
+
+
+def finish_trace(token, trace_dir=None, max_files=1000):
+    """
+    End the trace started with token and optionally write it to trace_dir.
+
+    Args:
+        token: Token returned by start_trace
+        trace_dir: Directory to write the trace file to (None: not written)
+        max_files: Trace files kept in trace_dir; older ones are deleted
+
+    Returns:
+        The finished Trace
+    """
+    trace = _current_trace.get()
+    _current_trace.reset(token)
+    trace.finished = time.perf_counter()
+    if trace_dir:
+        os.makedirs(trace_dir, exist_ok=True)
+        with open(os.path.join(trace_dir, f"{trace.id}.json"), "w") as f:
+            json.dump(trace.to_chrome(), f)
+        prune_traces(trace_dir, max_files)
+    return trace
+
+
+def prune_traces(trace_dir, max_files):
+    """Delete the oldest trace files in trace_dir beyond the newest max_files"""
+    files = []
+    for entry in os.scandir(trace_dir):
+        if entry.name.endswith(".json"):
+            try:
+                files.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+    if len(files) <= max_files:
+        return
+    files.sort()
+    for _, path in files[: len(files) - max_files]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Already pruned by another worker
+            pass
+
+
+@contextlib.contextmanager
+def span(name, category="phase", **attrs):
+    """
+    Record the enclosed block as a span of the current trace.
+
+    Yields the Span (so callers can add attributes), or None when no trace is
+    active, in which case nothing is recorded.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    current = Span(next(trace._ids), _current_span.get(), name, category, attrs)
+    token = _current_span.set(current.id)
+    try:
+        yield current
+    except BaseException as e:
+        current.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        current.end = time.perf_counter()
+        _current_span.reset(token)
+        trace.add_span(current)
+
+
+def cpu_timed(category):
+    """Decorator adding the thread CPU time of each call to the current trace"""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = _current_trace.get()
+            if trace is None:
+                return fn(*args, **kwargs)
+            started = time.thread_time()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                trace.add_cpu(category, time.thread_time() - started)
+
+        return wrapper
+
+    return decorator
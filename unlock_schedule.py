@@ -0,0 +1,246 @@
+"""
+Contract-wide unlock schedule.
+
+UnlockScanner reads nextTokenId() and sweeps getLockDetails/ownerOf over the
+whole lock ID range in Multicall3 chunks (which the chain's executor sends in
+parallel). Later rounds read only IDs minted since the previous round plus
+the locks that were still unclaimed (and any ID whose read failed), so
+claims and transfers are picked up without re-reading the full history.
+Unclaimed locks are kept in UnlockSchedule, a SQLite table indexed by unlock
+time, so time-range queries are answered without any RPC, and every
+serve.py worker reads the schedule written by the one running the scanner.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from abi_codec import FunctionEncoder, decode_uint
+from rpc import run_sync
+
+NEXT_TOKEN_ID = FunctionEncoder("nextTokenId", [])
+
+# Lock IDs are minted from 1 (see HodlMonsterNFT.initialize)
+FIRST_TOKEN_ID = 1
+
+
+class UnlockSchedule:
+    """Unclaimed locks of one contract, ordered by (unlock time, token ID)"""
+
+    def __init__(self, db_path, chain_id):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.chain_id = chain_id
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        # Workers keep reading while the scanner's worker writes
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS unlocks (
+                chain_id INTEGER NOT NULL,
+                token_id INTEGER NOT NULL,
+                owner TEXT NOT NULL,
+                unlock_time INTEGER NOT NULL,
+                tokens TEXT NOT NULL,
+                PRIMARY KEY (chain_id, token_id)
+            );
+            CREATE INDEX IF NOT EXISTS unlocks_time ON unlocks (chain_id, unlock_time, token_id);
+            CREATE TABLE IF NOT EXISTS unlock_scans (
+                chain_id INTEGER PRIMARY KEY,
+                scanned_block INTEGER NOT NULL,
+                scanned_at REAL NOT NULL
+            );
+            """
+        )
+        self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            (count,) = self._db.execute(
+                "SELECT COUNT(*) FROM unlocks WHERE chain_id = ?", (self.chain_id,)
+            ).fetchone()
+        return count
+
+    def unclaimed_ids(self):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT token_id FROM unlocks WHERE chain_id = ?", (self.chain_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def apply(self, token_ids, states):
+        """
+        Update the schedule with freshly read lock states.
+
+        Args:
+            token_ids: Every ID that was read
+            states: Dict token_id -> {"tokens_data", "unlock_time", "claimed",
+                "owner"}; IDs missing here could not be read and keep their
+                current entry
+
+        Returns:
+            IDs that could not be read, to be retried
+        """
+        unread = []
+        with self._lock:
+            db = self._db
+            for token_id in token_ids:
+                state = states.get(token_id)
+                if state is None:
+                    unread.append(token_id)
+                    continue
+                # Claimed locks are burned; no owner means never minted
+                if state["claimed"] or state["owner"] is None:
+                    db.execute(
+                        "DELETE FROM unlocks WHERE chain_id = ? AND token_id = ?",
+                        (self.chain_id, token_id),
+                    )
+                    continue
+                tokens = [
+                    {"token": token, "amount": str(amount)}
+                    for token, amount in state["tokens_data"]
+                    if amount > 0
+                ]
+                db.execute(
+                    """
+                    INSERT OR REPLACE INTO unlocks
+                        (chain_id, token_id, owner, unlock_time, tokens)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (
+                        self.chain_id,
+                        token_id,
+                        state["owner"],
+                        state["unlock_time"],
+                        json.dumps(tokens),
+                    ),
+                )
+            db.commit()
+        return unread
+
+    def record_scan(self, block):
+        """Mark the schedule as complete up to block"""
+        with self._lock:
+            self._db.execute(
+                """
+                INSERT OR REPLACE INTO unlock_scans (chain_id, scanned_block, scanned_at)
+                VALUES (?, ?, ?)
+                """,
+                (self.chain_id, block, time.time()),
+            )
+            self._db.commit()
+
+    def last_scan(self):
+        """
+        Return (scanned_block, scanned_at) of the last complete scan, or None
+        while the whole ID range has not been swept yet
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT scanned_block, scanned_at FROM unlock_scans WHERE chain_id = ?",
+                (self.chain_id,),
+            ).fetchone()
+
+    def between(self, start, end, limit):
+        """
+        Locks unlocking in [start, end), earliest first.
+
+        Returns:
+            Tuple (locks, total) where locks holds at most limit entries and
+            total counts every lock in the range
+        """
+        with self._lock:
+            rows = self._db.execute(
+                """
+                SELECT token_id, owner, unlock_time, tokens FROM unlocks
+                WHERE chain_id = ? AND unlock_time >= ? AND unlock_time < ?
+                ORDER BY unlock_time, token_id LIMIT ?
+                """,
+                (self.chain_id, start, end, limit),
+            ).fetchall()
+            (total,) = self._db.execute(
+                """
+                SELECT COUNT(*) FROM unlocks
+                WHERE chain_id = ? AND unlock_time >= ? AND unlock_time < ?
+                """,
+                (self.chain_id, start, end),
+            ).fetchone()
+
+        locks = [
+            {
+                "tokenId": token_id,
+                "owner": owner,
+                "unlockTime": unlock_time,
+                "tokens": json.loads(tokens),
+            }
+            for token_id, owner, unlock_time, tokens in rows
+        ]
+        return locks, total
+
+
+class UnlockScanner(threading.Thread):
+    """Background thread that keeps an UnlockSchedule current for one chain"""
+
+    def __init__(self, chain_data, fetch_states, schedule, sweep_size=2000, interval=60):
+        """
+        Args:
+            chain_data: Chain info dict (rpc, head, contract_address)
+            fetch_states: Coroutine function (chain_data, token_ids, block)
+                returning lock states by ID, e.g. main._fetch_lock_states
+            schedule: UnlockSchedule of the chain
+            sweep_size: Lock IDs read per step (split into Multicall3 chunks)
+            interval: Seconds between scans
+        """
+        super().__init__(daemon=True, name=f"unlock-scanner-{chain_data['key']}")
+        self.chain_data = chain_data
+        self.fetch_states = fetch_states
+        self.schedule = schedule
+        self.sweep_size = sweep_size
+        self.interval = interval
+        # A new scanner sweeps the whole range again; entries left by an
+        # earlier one are re-read (and replaced or removed) on the way
+        self.next_token_id = FIRST_TOKEN_ID
+        self._unread_ids = set()
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.scan_once()
+            except Exception as e:
+                print(f"Unlock scanner ({self.chain_data['key']}) scan failed: {e}")
+            self._stop_event.wait(self.interval)
+
+    def scan_once(self):
+        """Read new lock IDs and re-read unclaimed ones at the current head"""
+        block = run_sync(self.chain_data["head"].current_block())
+        next_token_id = decode_uint(
+            run_sync(
+                self.chain_data["rpc"].eth_call(
+                    self.chain_data["contract_address"], NEXT_TOKEN_ID.encode(), block
+                )
+            )
+        )
+
+        new_ids = range(self.next_token_id, next_token_id)
+        known_ids = {i for i in self.schedule.unclaimed_ids() if i < self.next_token_id}
+        token_ids = sorted(known_ids | self._unread_ids) + list(new_ids)
+
+        for start in range(0, len(token_ids), self.sweep_size):
+            if self._stop_event.is_set():
+                return
+            sweep = token_ids[start : start + self.sweep_size]
+            states = run_sync(self.fetch_states(self.chain_data, sweep, block))
+            unread = self.schedule.apply(sweep, states)
+            self._unread_ids.difference_update(sweep)
+            self._unread_ids.update(unread)
+
+        self.next_token_id = max(self.next_token_id, next_token_id)
+        self.schedule.record_scan(block)